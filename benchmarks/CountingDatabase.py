@@ -0,0 +1,71 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+import sqlalchemy
+
+from src.database import SQLDatabase, SQLTransaction
+
+class CountingDatabase(SQLDatabase):
+    '''
+    Delegates to another `SQLDatabase`, counting every statement sent so the
+    benchmarks can report database round trips.
+    '''
+    def __init__(self, database: SQLDatabase):
+        self._database = database
+        self.select_queries = database.select_queries
+        self.dml_queries = database.dml_queries
+        self.ddl_queries = database.ddl_queries
+        self._lock = threading.Lock()
+        self.executes: int = 0
+        self.selects: int = 0
+
+    @property
+    def round_trips(self) -> int:
+        return self.executes + self.selects
+
+    def reset(self):
+        with self._lock:
+            self.executes = 0
+            self.selects = 0
+
+    def _build_connection_string(self) -> str:
+        return self._database._build_connection_string()
+
+    def _create_engine(self) -> sqlalchemy.Engine:
+        return self._database._create_engine()
+
+    def get_engine(self) -> sqlalchemy.Engine:
+        return self._database.get_engine()
+
+    def dispose(self):
+        self._database.dispose()
+
+    def execute(self, query: str, args: dict = None) -> int:
+        with self._lock:
+            self.executes = self.executes + 1
+        return self._database.execute(query = query, args = args)
+
+    def execute_batch(self, statements: List[Tuple[str, dict]]) -> int:
+        # A batch shares one transaction but still sends every statement.
+        with self._lock:
+            self.executes = self.executes + len(statements)
+        return self._database.execute_batch(statements = statements)
+
+    def execute_returning(self, query: str, args: dict = None) -> List[dict]:
+        with self._lock:
+            self.executes = self.executes + 1
+        return self._database.execute_returning(query = query, args = args)
+
+    def select(self, query: str, args: dict = None) -> List[dict]:
+        with self._lock:
+            self.selects = self.selects + 1
+        return self._database.select(query = query, args = args)
+
+    @contextmanager
+    def transaction(self) -> Iterator[SQLTransaction]:
+        # Statements inside the transaction are not counted one by one.
+        with self._lock:
+            self.executes = self.executes + 1
+        with self._database.transaction() as tx:
+            yield tx
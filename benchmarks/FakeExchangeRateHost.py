@@ -0,0 +1,134 @@
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+@dataclass
+class FakeServerConfig:
+    latency_ms: float = 20.0
+    latency_jitter_ms: float = 5.0
+    error_rate: float = 0.0
+    currencies: int = 170
+    seed: int = 7
+
+class FakeExchangeRateHost:
+    '''
+    Local stand-in for `api.exchangerate.host` serving `/{date}` and
+    `/timeseries` with deterministic rates, configurable latency, error rate
+    and payload size. Every request is counted.
+    '''
+    def __init__(self, config: FakeServerConfig = None):
+        self._config = config or FakeServerConfig()
+        self._random = random.Random(self._config.seed)
+        self._random_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self.requests: int = 0
+        self.errors: int = 0
+        self.bytes_sent: int = 0
+        self._codes: List[str] = self._build_codes(count = self._config.currencies)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._build_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target = self._server.serve_forever, daemon = True)
+
+    @property
+    def domain(self) -> str:
+        return "127.0.0.1:{0}".format(self._server.server_port)
+
+    def _build_codes(self, count: int) -> List[str]:
+        codes: List[str] = ["USD", "CAD", "JPY", "GBP", "EUR"]
+        letters: str = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        index: int = 0
+        while len(codes) < count:
+            code: str = letters[(index // 676) % 26] + letters[(index // 26) % 26] + letters[index % 26]
+            if code not in codes:
+                codes.append(code)
+            index = index + 1
+        return codes[:count]
+
+    def _rates_for(self, day: str, base: str) -> Dict[str, float]:
+        '''
+        Deterministic pseudo rates; every code has a stable USD value that
+        drifts with the day, then is rebased.
+        '''
+        ordinal: int = datetime.strptime(day, "%Y-%m-%d").toordinal()
+        usd_values: Dict[str, float] = {
+            code: (1.0 + (position % 97) / 10.0) * (1.0 + ((ordinal * (position + 3)) % 101) / 5000.0)
+            for position, code in enumerate(self._codes)
+        }
+        usd_values["USD"] = 1.0
+        divisor: float = usd_values.get(base, 1.0)
+        return { code: round(value / divisor, 6) for code, value in usd_values.items() }
+
+    def _should_fail(self) -> bool:
+        with self._random_lock:
+            return self._random.random() < self._config.error_rate
+
+    def _delay(self) -> float:
+        with self._random_lock:
+            jitter: float = self._random.uniform(-1, 1) * self._config.latency_jitter_ms
+        return max(0.0, self._config.latency_ms + jitter) / 1000.0
+
+    def _payload(self, path: str, query: dict) -> dict:
+        base: str = query.get("base", ["USD"])[0]
+        if path == "/timeseries":
+            start = datetime.strptime(query["start_date"][0], "%Y-%m-%d")
+            end = datetime.strptime(query["end_date"][0], "%Y-%m-%d")
+            rates: dict = {}
+            day = start
+            while day <= end:
+                key: str = day.strftime("%Y-%m-%d")
+                rates[key] = self._rates_for(day = key, base = base)
+                day = day + timedelta(days = 1)
+            return { "success": True, "timeseries": True, "base": base, "rates": rates }
+        day_key: str = path.strip("/")
+        return { "success": True, "base": base, "date": day_key, "rates": self._rates_for(day = day_key, base = base) }
+
+    def _build_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with fake._count_lock:
+                    fake.requests = fake.requests + 1
+                time.sleep(fake._delay())
+                if fake._should_fail():
+                    with fake._count_lock:
+                        fake.errors = fake.errors + 1
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                url = urlparse(self.path)
+                try:
+                    body: bytes = json.dumps(fake._payload(url.path, parse_qs(url.query))).encode("utf-8")
+                except (KeyError, ValueError):
+                    self.send_response(400)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                with fake._count_lock:
+                    fake.bytes_sent = fake.bytes_sent + len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,100 @@
+'''
+Cold start check for cron runs. Imports `main` (which also loads and
+validates the configuration schema) under `python -X importtime` in fresh
+processes and fails when the cumulative import time exceeds the budget, or
+when a heavy dependency is imported before a job has chosen its code path.
+
+    python -m benchmarks.import_budget --budget-ms 250 --runs 5
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT_DIRECTORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only the job code paths that need these may import them.
+DEFERRED_MODULES: List[str] = [
+    "sqlalchemy",
+    "psycopg2",
+    "requests",
+    "urllib3",
+    "numpy",
+    "pyarrow",
+    "pytz"
+]
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = "Import time budget for main.py")
+    parser.add_argument("--budget-ms", type = float, default = 250.0)
+    parser.add_argument("--runs", type = int, default = 5, help = "the fastest run is compared to the budget")
+    parser.add_argument("--top", type = int, default = 10)
+    return parser
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    '''
+    Cumulative microseconds per imported module from `-X importtime` output.
+    '''
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+def _measure() -> dict:
+    completed = subprocess.run(
+        [
+            sys.executable, "-X", "importtime", "-c",
+            "import sys, main; print(','.join(sorted(sys.modules)))"
+        ],
+        cwd = ROOT_DIRECTORY,
+        capture_output = True,
+        text = True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    cumulative: Dict[str, int] = _parse_importtime(stderr = completed.stderr)
+    return {
+        "main_us": cumulative.get("main", 0),
+        "cumulative": cumulative,
+        "modules": set(completed.stdout.strip().split(","))
+    }
+
+def main(argv: List[str]) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    runs: List[dict] = [_measure() for _ in range(max(1, args.runs))]
+    fastest: dict = min(runs, key = lambda x: x["main_us"])
+    loaded: List[str] = [
+        name for name in DEFERRED_MODULES
+        if any(x == name or x.startswith(name + ".") for x in fastest["modules"])
+    ]
+    main_ms: float = fastest["main_us"] / 1000.0
+    top: List[dict] = [
+        { "module": name, "cumulative_ms": round(value / 1000.0, 3) }
+        for name, value in sorted(
+            ((x, y) for x, y in fastest["cumulative"].items() if x != "main"),
+            key = lambda item: item[1],
+            reverse = True
+        )[:args.top]
+    ]
+    report: dict = {
+        "main_import_ms": round(main_ms, 3),
+        "budget_ms": args.budget_ms,
+        "runs_ms": [round(x["main_us"] / 1000.0, 3) for x in runs],
+        "deferred_modules_loaded": loaded,
+        "top_level_imports": top
+    }
+    print(json.dumps(report, indent = 2))
+    if len(loaded) > 0:
+        print("Imported at startup but should be deferred: {0}".format(", ".join(loaded)), file = sys.stderr)
+        return 1
+    if main_ms > args.budget_ms:
+        print("Import time {0:.1f}ms is over the {1:.1f}ms budget.".format(main_ms, args.budget_ms), file = sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
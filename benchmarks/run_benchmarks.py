@@ -0,0 +1,227 @@
+'''
+End-to-end benchmarks for the collector services against a local fake
+exchangerate.host and a local database. Each scenario runs in its own
+process so peak RSS is per scenario. Results are printed (or written) as JSON.
+
+    python -m benchmarks.run_benchmarks --reset --output bench.json
+
+By default each scenario writes to a fresh temporary SQLite file. With
+`--database postgres` the POSTGRES.* variables in `.env` are used instead;
+point them at a scratch database set up by the BOOTSTRAP job: `--reset` deletes the benchmark date range
+before each run.
+'''
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import List
+
+from dotenv import load_dotenv
+
+from benchmarks.CountingDatabase import CountingDatabase
+from benchmarks.FakeExchangeRateHost import FakeExchangeRateHost, FakeServerConfig
+from src.clients.ExchangeRateHost import BaseCurrency, ExchangeRateHost, ExchangeRateHostProxy
+from src.database import PostgresDatabase, SQLConnectionDetails, SQLDatabase, SQLiteConnectionDetails, SQLiteDatabase
+from src.database.Schema import apply_schema
+from src.metrics import metrics
+from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+from src.services.HistoricalRateLoaderService import HistoricalReateLoaderService
+from src.services.NightlyRateCollectorService import NightlyRateCollectorService
+
+SOURCE: str = "EXCHANGE_RATE_HOST"
+END_DATE: date = date(2020, 12, 31)
+SCENARIOS: dict = {
+    "nightly-1": 1,
+    "historical-365": 365,
+    "historical-3650": 3650
+}
+
+TABLES: dict = {
+    "postgres": "dbo.exchange_rates",
+    "sqlite": "exchange_rates"
+}
+COUNT_ROWS_QUERY: str = "SELECT COUNT(*) AS count FROM {table} WHERE source = :source AND date BETWEEN :start_date AND :end_date"
+DELETE_ROWS_QUERY: str = "DELETE FROM {table} WHERE source = :source AND date BETWEEN :start_date AND :end_date"
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = "Exchange rate collection job benchmarks")
+    parser.add_argument("--scenarios", default = ",".join(SCENARIOS.keys()))
+    parser.add_argument("--latency-ms", type = float, default = 20.0)
+    parser.add_argument("--latency-jitter-ms", type = float, default = 5.0)
+    parser.add_argument("--error-rate", type = float, default = 0.0)
+    parser.add_argument("--currencies", type = int, default = 170)
+    parser.add_argument("--batch-size", type = int, default = 500)
+    parser.add_argument("--window-days", type = int, default = 365)
+    parser.add_argument("--workers", type = int, default = 4)
+    parser.add_argument("--database", choices = list(TABLES.keys()), default = "sqlite")
+    parser.add_argument("--reset", action = "store_true", help = "delete the benchmark date range before each run")
+    parser.add_argument("--output", default = None, help = "write the JSON report here instead of stdout")
+    parser.add_argument("--child", default = None, help = argparse.SUPPRESS)
+    return parser
+
+def _build_database(kind: str, directory: str) -> SQLDatabase:
+    if kind == "sqlite":
+        database = SQLiteDatabase(connection_details = SQLiteConnectionDetails(
+            path = os.path.join(directory, "benchmark.sqlite3")
+        ))
+        apply_schema(sql_db = database)
+        return database
+    load_dotenv()
+    return PostgresDatabase(connection_details = SQLConnectionDetails(
+        host = os.getenv("POSTGRES.HOST"),
+        port = int(os.getenv("POSTGRES.PORT", "5432")),
+        database = os.getenv("POSTGRES.DATABASE"),
+        username = os.getenv("POSTGRES.USERNAME"),
+        password = os.getenv("POSTGRES.PASSWORD")
+    ))
+
+def _count_rows(database: SQLDatabase, table: str, start_date: date, end_date: date) -> int:
+    result = database.select(
+        query = COUNT_ROWS_QUERY.format(table = table),
+        args = { "source": SOURCE, "start_date": start_date, "end_date": end_date }
+    )
+    return int(result[0].get("count"))
+
+def run_scenario(name: str, args: argparse.Namespace) -> dict:
+    days: int = SCENARIOS[name]
+    start_date: date = END_DATE - timedelta(days = days - 1)
+    logger = logging.getLogger("benchmark")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    server = FakeExchangeRateHost(config = FakeServerConfig(
+        latency_ms = args.latency_ms,
+        latency_jitter_ms = args.latency_jitter_ms,
+        error_rate = args.error_rate,
+        currencies = args.currencies
+    ))
+    server.start()
+    directory = tempfile.TemporaryDirectory(prefix = "rates-bench-")
+    table: str = TABLES[args.database]
+    database: SQLDatabase = _build_database(kind = args.database, directory = directory.name)
+    if args.reset:
+        database.execute(
+            query = DELETE_ROWS_QUERY.format(table = table),
+            args = { "source": SOURCE, "start_date": start_date, "end_date": END_DATE }
+        )
+    rows_before: int = _count_rows(database = database, table = table, start_date = start_date, end_date = END_DATE)
+    counting_db = CountingDatabase(database = database)
+    repo = ExchangeRateRepo(sql_db = counting_db)
+    client = ExchangeRateHostProxy(
+        logger = logger,
+        client = ExchangeRateHost(
+            base_currency = BaseCurrency.USD,
+            is_secure = False,
+            domain = server.domain,
+            pool_size = max(args.workers, 1),
+            backoff_base = 0.05,
+            backoff_max = 1.0
+        )
+    )
+
+    started: float = time.perf_counter()
+    if name.startswith("nightly"):
+        NightlyRateCollectorService(
+            repo = repo,
+            logger = logger,
+            client = client,
+            base_currency = BaseCurrency.USD
+        ).save_rate(target_date = datetime.combine(END_DATE, datetime.min.time()))
+    else:
+        HistoricalReateLoaderService(
+            logger = logger,
+            repo = repo,
+            client = client,
+            base_currency = BaseCurrency.USD,
+            batch_size = args.batch_size,
+            window_days = args.window_days,
+            max_workers = args.workers
+        ).load(end_date = END_DATE, previous_days = days - 1)
+    wall_seconds: float = time.perf_counter() - started
+
+    rows_written: int = _count_rows(database = database, table = table, start_date = start_date, end_date = END_DATE) - rows_before
+    client.close()
+    database.dispose()
+    directory.cleanup()
+    server.stop()
+    return {
+        "scenario": name,
+        "days": days,
+        "wall_seconds": round(wall_seconds, 6),
+        "rows_written": rows_written,
+        "rows_per_sec": round(rows_written / wall_seconds, 3) if wall_seconds > 0 else None,
+        "http_requests": server.requests,
+        "http_errors": server.errors,
+        "http_bytes": server.bytes_sent,
+        "db_round_trips": counting_db.round_trips,
+        "db_executes": counting_db.executes,
+        "db_selects": counting_db.selects,
+        # Linux reports ru_maxrss in KiB.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "metrics": metrics.summary()
+    }
+
+def _child_command(name: str, argv: List[str]) -> List[str]:
+    passthrough: List[str] = []
+    skip_next: bool = False
+    for value in argv:
+        if skip_next:
+            skip_next = False
+            continue
+        if value in ("--output", "--scenarios", "--child"):
+            skip_next = True
+            continue
+        if value.startswith(("--output=", "--scenarios=", "--child=")):
+            continue
+        passthrough.append(value)
+    return [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", name] + passthrough
+
+def main(argv: List[str]) -> int:
+    args = _build_arg_parser().parse_args(argv)
+    if args.child != None:
+        print(json.dumps(run_scenario(name = args.child, args = args)))
+        return 0
+    results: List[dict] = []
+    for name in [x.strip() for x in args.scenarios.split(",") if x.strip() != ""]:
+        if name not in SCENARIOS:
+            print("Unknown scenario '{0}'. Options: {1}".format(name, ", ".join(SCENARIOS.keys())), file = sys.stderr)
+            return 2
+        completed = subprocess.run(_child_command(name = name, argv = argv), capture_output = True, text = True)
+        if completed.returncode != 0:
+            print(completed.stderr, file = sys.stderr)
+            results.append({ "scenario": name, "error": "exit code {0}".format(completed.returncode) })
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    report: dict = {
+        "generated_at": datetime.now().isoformat(timespec = "seconds"),
+        "python": sys.version.split()[0],
+        "fake_server": {
+            "latency_ms": args.latency_ms,
+            "latency_jitter_ms": args.latency_jitter_ms,
+            "error_rate": args.error_rate,
+            "currencies": args.currencies
+        },
+        "database": args.database,
+        "job": {
+            "batch_size": args.batch_size,
+            "window_days": args.window_days,
+            "workers": args.workers
+        },
+        "results": results
+    }
+    body: str = json.dumps(report, indent = 2)
+    if args.output != None:
+        with open(args.output, "w") as output_file:
+            output_file.write(body + "\n")
+    else:
+        print(body)
+    return 0 if all("error" not in x for x in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
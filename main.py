@@ -1,80 +1,532 @@
-import pytz
 from dotenv import load_dotenv
-from logging import Logger
-from datetime import datetime, timedelta
+from functools import cached_property
+from logging import Handler, Logger
+from datetime import date, datetime, timedelta
+from typing import Callable, List
 
 from src.config.Environment import get_environment_config
-from src.database import PostgresDatabase, SQLConnectionDetails
-from src.enums import JobType
-from src.repositories.ExchangeRateRepo import ExchangeRateRepo
-from src.clients.ExchangeRateHost import ExchangeRateHostProxy
-from src.services.NightlyRateCollectorService import NightlyRateCollectorService
-from src.services.HistoricalRateLoaderService import HistoricalReateLoaderService
-
-# Logging
-from src.logger import (
-    build_json_logging_handler, 
-    build_stdout_logging_handler
-)
-
-load_dotenv()
-env_config: dict = get_environment_config()
-
-timezone = env_config["job"]["timezone"]
-
-logger = Logger(name = env_config["logger"]["name"])
-logger.setLevel(env_config["logger"]["log_level"])
-logger.addHandler(build_stdout_logging_handler())
-logger.addHandler(build_json_logging_handler(
-    file_name = env_config["logger"]["json_file_path"]
-))
-
-sql_details = SQLConnectionDetails(
-    host = env_config["postgres"]["host"],
-    port = env_config["postgres"]["port"],
-    database = env_config["postgres"]["database"],
-    username = env_config["postgres"]["username"],
-    password = env_config["postgres"]["password"],
-)
-postgres = PostgresDatabase(connection_details = sql_details)
-
-exchange_rate_repo = ExchangeRateRepo(sql_db = postgres)
-
-client_proxy = ExchangeRateHostProxy(
-    logger = logger,
-    base_currency = env_config["job"]["base_currency"]
-)
-
-def run_nightly_data_collection():
-    logger.info("Starting Nightly Exchange Rate Collection Job")
-    timezone_obj = pytz.timezone('US/Eastern')
-    curr_timestamp = timezone_obj.fromutc(datetime.now())
-    yesterday_timestamp = curr_timestamp - timedelta(days = 1)
+from src.enums import DatabaseDialect, JobType, StorageFormat
+
+# Only configuration, enums and the standard library are imported up front.
+# sqlalchemy, requests, numpy and pyarrow load inside the builders below, so a
+# run only pays for the modules its job type actually uses.
+
+def build_logger(env_config: dict) -> tuple:
+    '''
+    Responds with the job logger and, when queued logging is enabled, the
+    `QueueListener` that must be stopped to drain it.
+    '''
+    from src.logger import (
+        build_json_logging_handler,
+        build_stdout_logging_handler,
+        build_queue_logging_handler
+    )
+    logger = Logger(name = env_config["logger"]["name"])
+    logger.setLevel(env_config["logger"]["log_level"])
+    log_handlers: List[Handler] = [
+        build_stdout_logging_handler(),
+        build_json_logging_handler(
+            file_name = env_config["logger"]["json_file_path"],
+            max_bytes = env_config["logger"]["json_max_bytes"],
+            backup_count = env_config["logger"]["json_backup_count"],
+            flush_records = env_config["logger"]["flush_records"],
+            flush_interval = env_config["logger"]["flush_interval_seconds"]
+        )
+    ]
+    if env_config["logger"]["queue_enabled"]:
+        # Handlers run on the listener thread, workers only enqueue records.
+        queue_handler, log_listener = build_queue_logging_handler(handlers = log_handlers)
+        logger.addHandler(queue_handler)
+        return logger, log_listener
+    for handler in log_handlers:
+        logger.addHandler(handler)
+    return logger, None
+
+class JobRuntime:
+    '''
+    Collaborators of one job run, each built on first use so a job type
+    never wires (or imports) what it does not need.
+    '''
+    def __init__(self, env_config: dict, logger: Logger):
+        self.env_config = env_config
+        self.logger = logger
+
+    @cached_property
+    def database(self):
+        from src.database import (
+            PostgresDatabase,
+            SQLConnectionDetails,
+            SQLiteConnectionDetails,
+            SQLiteDatabase
+        )
+        env_config: dict = self.env_config
+        if env_config["database"]["dialect"] == DatabaseDialect.SQLITE:
+            from src.database.Schema import apply_schema
+            sqlite = SQLiteDatabase(connection_details = SQLiteConnectionDetails(
+                path = env_config["sqlite"]["path"],
+                cache_size_kb = env_config["sqlite"]["cache_size_kb"],
+                busy_timeout_ms = env_config["sqlite"]["busy_timeout_ms"],
+                synchronous = env_config["sqlite"]["synchronous"]
+            ))
+            # A local file has no DBA step, so make sure the tables exist.
+            apply_schema(sql_db = sqlite)
+            return sqlite
+        return PostgresDatabase(connection_details = SQLConnectionDetails(
+            host = env_config["postgres"]["host"],
+            port = env_config["postgres"]["port"],
+            database = env_config["postgres"]["database"],
+            username = env_config["postgres"]["username"],
+            password = env_config["postgres"]["password"],
+            pool_size = env_config["postgres"]["pool_size"],
+            pool_timeout = env_config["postgres"]["pool_timeout"],
+            max_overflow = env_config["postgres"]["max_overflow"],
+            pool_pre_ping = env_config["postgres"]["pool_pre_ping"],
+            pool_recycle = env_config["postgres"]["pool_recycle"],
+            query_cache_size = env_config["postgres"]["statement_cache_size"]
+        ))
+
+    @cached_property
+    def exchange_rate_repo(self):
+        if self.env_config["storage"]["format"] == StorageFormat.DELTA:
+            from src.repositories.ExchangeRateDeltaRepo import ExchangeRateDeltaRepo
+            return ExchangeRateDeltaRepo(
+                sql_db = self.database, keyframe_days = self.env_config["storage"]["keyframe_days"]
+            )
+        if self.env_config["storage"]["format"] == StorageFormat.ARRAY:
+            from src.repositories.ExchangeRateArrayRepo import ExchangeRateArrayRepo
+            return ExchangeRateArrayRepo(sql_db = self.database)
+        from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+        return ExchangeRateRepo(sql_db = self.database)
+
+    @cached_property
+    def rollup_repo(self):
+        if self.env_config["storage"]["format"] == StorageFormat.DELTA:
+            from src.repositories.ExchangeRateDeltaRepo import ExchangeRateDeltaRollupRepo
+            return ExchangeRateDeltaRollupRepo(sql_db = self.database, rate_repo = self.exchange_rate_repo)
+        from src.repositories.ExchangeRateRollupRepo import ExchangeRateRollupRepo
+        return ExchangeRateRollupRepo(
+            sql_db = self.database, dml_queries = self.exchange_rate_repo.dml_queries
+        )
+
+    @cached_property
+    def write_listeners(self) -> list:
+        listeners: list = []
+        if self.env_config["job"]["maintain_rollups"]:
+            from src.services.RollupRefreshService import RollupRefreshService
+            listeners.append(RollupRefreshService(
+                logger = self.logger,
+                repo = self.rollup_repo
+            ))
+        if self.env_config["export"]["parquet_enabled"]:
+            from src.repositories.ExchangeRateParquetSink import ExchangeRateParquetSink
+            from src.services.ParquetExportService import ParquetExportService
+            listeners.append(ParquetExportService(
+                logger = self.logger,
+                repo = self.exchange_rate_repo,
+                sink = ExchangeRateParquetSink(
+                    directory = self.env_config["export"]["parquet_directory"],
+                    compression = self.env_config["export"]["parquet_compression"]
+                )
+            ))
+        return listeners
+
+    @cached_property
+    def rate_providers(self) -> list:
+        '''
+        Primary provider first, then the hedge and failover providers.
+        '''
+        providers_config: dict = self.env_config["providers"]
+        return [providers_config["primary"]] + [
+            x for x in providers_config["secondary"] if x != providers_config["primary"]
+        ]
+
+    @cached_property
+    def rate_sources(self) -> List[str]:
+        return [x.value for x in self.rate_providers]
+
+    def _adaptive_client(self, client):
+        '''
+        Wraps one provider client in its own concurrency limiter and circuit
+        breaker, so a failing provider does not throttle the others.
+        '''
+        from src.clients.AdaptiveExchangeRateHost import (
+            AdaptiveExchangeRateHost,
+            AimdConcurrencyLimiter,
+            CircuitBreaker
+        )
+        client_config: dict = self.env_config["client"]
+        max_limit: int = client_config["concurrency_max"] or client_config["pool_size"]
+        return AdaptiveExchangeRateHost(
+            logger = self.logger,
+            client = client,
+            limiter = AimdConcurrencyLimiter(
+                name = client.source,
+                initial_limit = min(client_config["concurrency_initial"], max_limit),
+                min_limit = client_config["concurrency_min"],
+                max_limit = max_limit,
+                backoff_ratio = client_config["concurrency_backoff_ratio"],
+                latency_tolerance = client_config["concurrency_latency_tolerance"]
+            ),
+            breaker = CircuitBreaker(
+                logger = self.logger,
+                name = client.source,
+                failure_threshold = client_config["breaker_failure_threshold"],
+                reset_seconds = client_config["breaker_reset_seconds"]
+            )
+        )
+
+    @cached_property
+    def client(self):
+        from src.clients.ExchangeRateHost import ExchangeRateHostProxy
+        from src.clients.ProviderRegistry import provider_registry
+        env_config: dict = self.env_config
+        provider_clients: list = [
+            provider_registry.build(
+                provider = provider,
+                base_currency = env_config["job"]["base_currency"],
+                connect_timeout = env_config["client"]["connect_timeout"],
+                read_timeout = env_config["client"]["read_timeout"],
+                pool_size = env_config["client"]["pool_size"],
+                max_retries = env_config["client"]["max_retries"],
+                backoff_base = env_config["client"]["backoff_base"],
+                backoff_max = env_config["client"]["backoff_max"]
+            ) for provider in self.rate_providers
+        ]
+        if env_config["client"]["adaptive_concurrency"]:
+            provider_clients = [self._adaptive_client(client = x) for x in provider_clients]
+        rates_client = provider_clients[0]
+        if len(provider_clients) > 1:
+            from src.clients.HedgedExchangeRateHost import HedgedExchangeRateHost
+            rates_client = HedgedExchangeRateHost(
+                logger = self.logger,
+                providers = provider_clients,
+                hedge_percentile = env_config["providers"]["hedge_percentile"],
+                initial_delay = env_config["providers"]["hedge_initial_delay_seconds"],
+                min_delay = env_config["providers"]["hedge_min_delay_seconds"],
+                min_samples = env_config["providers"]["hedge_min_samples"]
+            )
+        client_proxy = ExchangeRateHostProxy(logger = self.logger, client = rates_client)
+        if not env_config["cache"]["enabled"]:
+            return client_proxy
+        from src.clients.CachedExchangeRateHost import CachedExchangeRateHost, ResponseDiskCache
+        return CachedExchangeRateHost(
+            logger = self.logger,
+            client = client_proxy,
+            base_currency = env_config["job"]["base_currency"],
+            cache = ResponseDiskCache(
+                directory = env_config["cache"]["directory"],
+                max_bytes = env_config["cache"]["max_bytes"],
+                recent_days = env_config["cache"]["recent_days"],
+                recent_ttl_seconds = env_config["cache"]["recent_ttl_seconds"]
+            )
+        )
+
+    def ensure_partitions(self, start_date: date, end_date: date):
+        '''
+        Makes sure Postgres has partitions for the dates a job is about to
+        write and for `PARTITIONS.FUTURE_PERIODS` ahead of today.
+        '''
+        partitions_config: dict = self.env_config["partitions"]
+        if not partitions_config["managed"] or self.env_config["database"]["dialect"] != DatabaseDialect.POSTGRES:
+            return
+        from src.database.Schema import add_periods, ensure_partitions
+        ensure_partitions(
+            sql_db = self.database,
+            logger = self.logger,
+            interval = partitions_config["interval"],
+            start_date = start_date,
+            end_date = max(end_date, add_periods(
+                interval = partitions_config["interval"],
+                day = date.today(),
+                periods = partitions_config["future_periods"]
+            ))
+        )
+
+    def close(self):
+        '''
+        Releases only the collaborators that were actually built.
+        '''
+        if "client" in self.__dict__:
+            self.client.close()
+        if "database" in self.__dict__:
+            self.database.dispose()
+
+def collect_nightly_rates(runtime: JobRuntime, target_date: datetime):
+    from src.services.NightlyRateCollectorService import NightlyRateCollectorService
+    env_config: dict = runtime.env_config
+    runtime.ensure_partitions(start_date = target_date.date(), end_date = target_date.date())
     nightly_collector = NightlyRateCollectorService(
-        repo = exchange_rate_repo, 
+        repo = runtime.exchange_rate_repo,
+        logger = runtime.logger,
+        client = runtime.client,
+        base_currency = env_config["job"]["base_currency"],
+        derived_bases = env_config["job"]["derived_base_currencies"],
+        listeners = runtime.write_listeners,
+        sources = runtime.rate_sources
+    )
+    nightly_collector.save_rate(target_date = target_date)
+
+def run_nightly_data_collection(runtime: JobRuntime):
+    import pytz
+    runtime.logger.info("Starting Nightly Exchange Rate Collection Job")
+    curr_timestamp = datetime.now(pytz.timezone(runtime.env_config["job"]["timezone"]))
+    yesterday_timestamp = curr_timestamp - timedelta(days = 1)
+    collect_nightly_rates(runtime = runtime, target_date = yesterday_timestamp)
+    runtime.logger.info("Completed Nightly Exchange Rate Collection Job")
+
+def build_historical_loader(runtime: JobRuntime, checkpoints = None):
+    from src.services.HistoricalRateLoaderService import HistoricalReateLoaderService
+    env_config: dict = runtime.env_config
+    return HistoricalReateLoaderService(
+        logger = runtime.logger,
+        repo = runtime.exchange_rate_repo,
+        client = runtime.client,
+        base_currency = env_config["job"]["base_currency"],
+        derived_bases = env_config["job"]["derived_base_currencies"],
+        batch_size = env_config["job"]["historical_batch_size"],
+        window_days = env_config["job"]["historical_window_days"],
+        max_workers = env_config["job"]["historical_fetch_workers"],
+        window_retries = env_config["job"]["historical_window_retries"],
+        listeners = runtime.write_listeners,
+        sources = runtime.rate_sources,
+        checkpoints = checkpoints
+    )
+
+def build_load_checkpoints(runtime: JobRuntime):
+    '''
+    Checkpoint of the HISTORICAL job, scoped to the bases and sources it
+    writes so a changed configuration does not skip days it never loaded.
+    '''
+    from src.repositories.LoadCheckpointRepo import LoadCheckpointRepo
+    env_config: dict = runtime.env_config
+    bases: List[str] = [env_config["job"]["base_currency"].value] + [
+        x.value for x in env_config["job"]["derived_base_currencies"]
+    ]
+    return LoadCheckpointRepo(
+        logger = runtime.logger,
+        path = env_config["job"]["historical_checkpoint_path"],
+        scope = "{0}@{1}".format(",".join(bases), ",".join(runtime.rate_sources))
+    )
+
+def run_historical_data_collection(runtime: JobRuntime):
+    runtime.logger.info("Starting Historical Exchange Rate Collection Job")
+    end_date: date = runtime.env_config["job"]["historical_end_date"]
+    previous_days: int = runtime.env_config["job"]["historical_previous_days"]
+    runtime.ensure_partitions(start_date = end_date - timedelta(days = previous_days), end_date = end_date)
+    historical_collector = build_historical_loader(
+        runtime = runtime, checkpoints = build_load_checkpoints(runtime = runtime)
+    )
+    historical_collector.load(end_date = end_date, previous_days = previous_days)
+    runtime.logger.info("Completed Historical Exchange Rate Collection Job")
+
+def catch_up_rates(runtime: JobRuntime, start_date: date, end_date: date):
+    from src.services.CatchupRateLoaderService import CatchupRateLoaderService
+    env_config: dict = runtime.env_config
+    runtime.ensure_partitions(start_date = start_date, end_date = end_date)
+    catchup_collector = CatchupRateLoaderService(
+        logger = runtime.logger,
+        repo = runtime.exchange_rate_repo,
+        loader = build_historical_loader(runtime = runtime),
+        bases = [env_config["job"]["base_currency"]] + env_config["job"]["derived_base_currencies"],
+        sources = runtime.rate_sources
+    )
+    catchup_collector.run(start_date = start_date, end_date = end_date)
+
+def run_catchup_data_collection(runtime: JobRuntime):
+    import pytz
+    runtime.logger.info("Starting Catchup Exchange Rate Collection Job")
+    yesterday = datetime.now(pytz.timezone(runtime.env_config["job"]["timezone"])).date() - timedelta(days = 1)
+    catch_up_rates(
+        runtime = runtime,
+        start_date = runtime.env_config["job"]["catchup_start_date"],
+        end_date = yesterday
+    )
+    runtime.logger.info("Completed Catchup Exchange Rate Collection Job")
+
+def _run_daemon_step(runtime: JobRuntime, name: str, step: Callable[[], None]):
+    '''
+    One failed collection must not end the daemon.
+    '''
+    try:
+        step()
+    except Exception as step_err:
+        runtime.logger.error("Daemon {0} failed, retrying on the next schedule. {1}".format(
+            name, step_err.args
+        ))
+    finally:
+        write_metrics(env_config = runtime.env_config)
+
+def run_daemon(runtime: JobRuntime):
+    '''
+    Stays up with a warm HTTP session and database pool, collecting the
+    previous day at JOB.DAEMON_RUN_AT in JOB.TIMEZONE. Missing days from the
+    last JOB.DAEMON_CATCHUP_DAYS are backfilled on start, and ticks missed
+    while the host slept are backfilled on wake. SIGTERM and SIGINT stop the
+    daemon once the running collection finishes.
+    '''
+    import signal
+    import pytz
+    from src.services.DailyScheduler import DailyScheduler
+    env_config: dict = runtime.env_config
+    logger: Logger = runtime.logger
+
+    def on_tick(tick: datetime):
+        _run_daemon_step(
+            runtime = runtime,
+            name = "nightly collection",
+            step = lambda: collect_nightly_rates(runtime = runtime, target_date = tick - timedelta(days = 1))
+        )
+
+    def on_missed(tick_dates: List[date]):
+        _run_daemon_step(
+            runtime = runtime,
+            name = "missed tick catchup",
+            step = lambda: catch_up_rates(
+                runtime = runtime,
+                start_date = min(tick_dates) - timedelta(days = 1),
+                end_date = max(tick_dates) - timedelta(days = 1)
+            )
+        )
+
+    scheduler = DailyScheduler(
         logger = logger,
-        client = client_proxy
+        timezone = env_config["job"]["timezone"],
+        run_at = env_config["job"]["daemon_run_at"],
+        on_tick = on_tick,
+        on_missed = on_missed
     )
-    nightly_collector.save_rate(target_date = yesterday_timestamp)
-    logger.info("Completed Nightly Exchange Rate Collection Job")
-
-def run_historical_data_collection():
-    logger.info("Starting Historical Exchange Rate Collection Job")
-    historical_collector = HistoricalReateLoaderService(
-        logger = logger, 
-        repo = exchange_rate_repo,
-        client = client_proxy
+
+    def on_signal(signum, frame):
+        logger.info("Received {0}, stopping after the current collection.".format(signal.Signals(signum).name))
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    logger.info("Starting Exchange Rate Collection Daemon")
+    startup_end: date = datetime.now(pytz.timezone(env_config["job"]["timezone"])).date() - timedelta(days = 1)
+    _run_daemon_step(
+        runtime = runtime,
+        name = "startup catchup",
+        step = lambda: catch_up_rates(
+            runtime = runtime,
+            start_date = startup_end - timedelta(days = env_config["job"]["daemon_catchup_days"] - 1),
+            end_date = startup_end
+        )
     )
-    historical_collector.load(
-        end_date = env_config["job"]["historical_end_date"],
-        previous_days = env_config["job"]["historical_previous_days"]
+    if not scheduler.stopped:
+        scheduler.run()
+    logger.info("Stopped Exchange Rate Collection Daemon")
+
+def run_distributed_backfill(runtime: JobRuntime):
+    '''
+    HISTORICAL backfill shared by every instance running it against the same
+    BACKFILL.QUEUE. Each instance enqueues the date range as work items
+    (idempotently) and then claims and loads items until the queue drains.
+    SIGTERM and SIGINT stop claiming, leases of unfinished items expire.
+    '''
+    import os
+    import signal
+    import socket
+    from src.repositories.WorkQueueRepo import WorkQueueRepo
+    from src.services.BackfillCoordinator import BackfillCoordinator
+    from src.services.BackfillWorker import BackfillWorker
+    runtime.logger.info("Starting Distributed Backfill Job")
+    env_config: dict = runtime.env_config
+    backfill_config: dict = env_config["backfill"]
+    end_date: date = env_config["job"]["historical_end_date"]
+    start_date: date = end_date - timedelta(days = env_config["job"]["historical_previous_days"])
+    runtime.ensure_partitions(start_date = start_date, end_date = end_date)
+    queue_repo = WorkQueueRepo(sql_db = runtime.database)
+    if backfill_config["enqueue"]:
+        BackfillCoordinator(
+            logger = runtime.logger,
+            repo = queue_repo,
+            queue = backfill_config["queue"],
+            item_days = backfill_config["item_days"]
+        ).enqueue(start_date = start_date, end_date = end_date)
+    worker = BackfillWorker(
+        logger = runtime.logger,
+        repo = queue_repo,
+        loader = build_historical_loader(runtime = runtime),
+        queue = backfill_config["queue"],
+        worker_id = "{0}:{1}".format(socket.gethostname(), os.getpid()),
+        lease_seconds = backfill_config["lease_seconds"],
+        heartbeat_seconds = backfill_config["heartbeat_seconds"],
+        max_attempts = backfill_config["max_attempts"],
+        poll_seconds = backfill_config["poll_seconds"],
+        concurrency = backfill_config["workers"]
     )
-    logger.info("Completed Historical Exchange Rate Collection Job")
 
-if __name__ == "__main__":
-    match env_config["job"]["type"]:
-        case JobType.NIGHTLY:
-            run_nightly_data_collection()
-        case JobType.HISTORICAL:
-            run_historical_data_collection()
+    def on_signal(signum, frame):
+        runtime.logger.info("Received {0}, stopping after the current work items.".format(signal.Signals(signum).name))
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    worker.run()
+    runtime.logger.info("Completed Distributed Backfill Job")
 
+def run_schema_bootstrap(runtime: JobRuntime):
+    '''
+    Creates the schema, or migrates a legacy unpartitioned rates table, with
+    partitions from `PARTITIONS.START_DATE` through the future periods.
+    '''
+    from src.database.Schema import add_periods, bootstrap_schema
+    runtime.logger.info("Starting Schema Bootstrap Job")
+    partitions_config: dict = runtime.env_config["partitions"]
+    bootstrap_schema(
+        sql_db = runtime.database,
+        logger = runtime.logger,
+        interval = partitions_config["interval"],
+        start_date = partitions_config["start_date"],
+        end_date = add_periods(
+            interval = partitions_config["interval"],
+            day = date.today(),
+            periods = partitions_config["future_periods"]
+        )
+    )
+    runtime.logger.info("Completed Schema Bootstrap Job")
+
+def write_metrics(env_config: dict):
+    from src.metrics import metrics
+    metrics_config: dict = env_config["metrics"]
+    if metrics_config["prometheus_textfile"] != None:
+        metrics.write_prometheus_textfile(path = metrics_config["prometheus_textfile"])
+    if metrics_config["json_summary_path"] != None:
+        metrics.write_json_summary(path = metrics_config["json_summary_path"])
+
+def main():
+    load_dotenv()
+    # Validation is cheap and exits before any logger, engine or session exists.
+    env_config: dict = get_environment_config()
+    logger, log_listener = build_logger(env_config = env_config)
+    runtime = JobRuntime(env_config = env_config, logger = logger)
+    from src.metrics.Profiling import profiled
+    try:
+        with profiled(
+            mode = env_config["metrics"]["profile"],
+            directory = env_config["metrics"]["profile_directory"],
+            interval = env_config["metrics"]["profile_sample_interval_ms"] / 1000.0
+        ):
+            match env_config["job"]["type"]:
+                case JobType.NIGHTLY:
+                    run_nightly_data_collection(runtime = runtime)
+                case JobType.HISTORICAL:
+                    run_historical_data_collection(runtime = runtime)
+                case JobType.CATCHUP:
+                    run_catchup_data_collection(runtime = runtime)
+                case JobType.DAEMON:
+                    run_daemon(runtime = runtime)
+                case JobType.BOOTSTRAP:
+                    run_schema_bootstrap(runtime = runtime)
+                case JobType.BACKFILL:
+                    run_distributed_backfill(runtime = runtime)
+    finally:
+        runtime.close()
+        write_metrics(env_config = env_config)
+        if log_listener != None:
+            from src.logger import stop_queue_logging
+            stop_queue_logging(listener = log_listener)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import threading
+import time
+import requests
+from datetime import datetime
+from logging import Logger
+from typing import Iterator, List, Optional
+
+from src.clients.ExchangeRateHost import (
+    RETRYABLE_STATUS_CODES,
+    CircuitOpenError,
+    DatedRates,
+    IExchangeRateHost
+)
+from src.metrics import metrics
+
+def _is_overload(err: Exception) -> bool:
+    '''
+    Throttling, transient server errors, timeouts and refused connections
+    mean the provider is overloaded or down. Other errors say nothing about
+    capacity.
+    '''
+    if isinstance(err, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(err, requests.HTTPError) and err.response is not None:
+        return err.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+class AimdConcurrencyLimiter:
+    '''
+    Limits the calls in flight to a provider. The limit grows by one per
+    limit's worth of healthy calls made while it was fully used (additive
+    increase) and is cut by `backoff_ratio` on an overload (multiplicative
+    decrease). A call is healthy when its latency stays within
+    `latency_tolerance` times the smoothed latency. Failures of calls that
+    started before the last cut do not cut again, so one burst backs off once.
+    '''
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 10,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.1
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("concurrency limits must satisfy 1 <= min <= initial <= max")
+        self._name = name
+        self._limit: float = float(initial_limit)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._backoff_ratio = backoff_ratio
+        self._latency_tolerance = latency_tolerance
+        self._smoothing = smoothing
+        self._in_flight: int = 0
+        self._baseline: Optional[float] = None
+        self._decreased_at: float = 0.0
+        self._condition = threading.Condition()
+        metrics.set("concurrency_limit", initial_limit, provider = name)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        '''
+        Blocks until a slot is free, responding with the monotonic start time.
+        '''
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight = self._in_flight + 1
+        return time.monotonic()
+
+    def release(self):
+        with self._condition:
+            self._in_flight = self._in_flight - 1
+            self._condition.notify()
+
+    def _set_limit(self, limit: float):
+        self._limit = limit
+        metrics.set("concurrency_limit", int(limit), provider = self._name)
+        # A raised limit may admit several waiters.
+        self._condition.notify_all()
+
+    def record_success(self, latency: float):
+        with self._condition:
+            if self._baseline == None:
+                self._baseline = latency
+            healthy: bool = latency <= self._baseline * self._latency_tolerance
+            self._baseline = self._baseline + self._smoothing * (latency - self._baseline)
+            if healthy and self._in_flight >= int(self._limit) and self._limit < self._max_limit:
+                self._set_limit(limit = min(float(self._max_limit), self._limit + 1.0 / self._limit))
+
+    def record_overload(self, started: float):
+        with self._condition:
+            if started < self._decreased_at:
+                return
+            self._decreased_at = time.monotonic()
+            self._set_limit(limit = max(float(self._min_limit), self._limit * self._backoff_ratio))
+
+class CircuitBreaker:
+    '''
+    Opens after `failure_threshold` consecutive overload failures and fails
+    calls fast for `reset_seconds`. Then one probe call is let through: its
+    success closes the circuit, its failure opens it again.
+    '''
+    CLOSED: str = "CLOSED"
+    OPEN: str = "OPEN"
+    HALF_OPEN: str = "HALF_OPEN"
+
+    def __init__(
+        self,
+        logger: Logger,
+        name: str,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0
+    ):
+        self._logger = logger
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._state: str = self.CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0.0
+        self._probing: bool = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def _transition(self, state: str):
+        self._state = state
+        metrics.increment("circuit_transitions_total", provider = self._name, state = state)
+
+    def retry_in(self) -> float:
+        return max(0.0, self._opened_at + self._reset_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN and self.retry_in() <= 0:
+                self._transition(state = self.HALF_OPEN)
+                self._probing = False
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._transition(state = self.CLOSED)
+                self._logger.info("Circuit to {0} closed, the probe request succeeded.".format(self._name))
+
+    def record_failure(self):
+        with self._lock:
+            self._failures = self._failures + 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self._failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._transition(state = self.OPEN)
+                self._logger.warning("Circuit to {0} opened after {1} consecutive failures, retrying in {2:.1f}s.".format(
+                    self._name, self._failures, self._reset_seconds
+                ))
+
+    def record_ignored(self):
+        '''
+        A call that failed for a reason unrelated to capacity frees the probe.
+        '''
+        with self._lock:
+            self._probing = False
+
+class AdaptiveExchangeRateHost(IExchangeRateHost):
+    '''
+    Wraps one provider client with an AIMD concurrency limiter and a circuit
+    breaker. Callers beyond the current limit wait for a slot, and while the
+    circuit is open calls raise `CircuitOpenError` without reaching the
+    provider. A streamed range holds its slot until the stream is closed and
+    its latency is the time to the first day.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        client: IExchangeRateHost,
+        limiter: AimdConcurrencyLimiter,
+        breaker: CircuitBreaker
+    ):
+        self._logger = logger
+        self._client = client
+        self._limiter = limiter
+        self._breaker = breaker
+        self.source: str = getattr(client, "source", client.__class__.__name__)
+        # Read by ExchangeRateHostProxy when logging a failure.
+        self._domain: str = getattr(client, "_domain", self.source)
+
+    def _admit(self) -> float:
+        started: float = self._limiter.acquire()
+        if not self._breaker.allow():
+            self._limiter.release()
+            metrics.increment("circuit_rejections_total", provider = self.source)
+            raise CircuitOpenError(domain = self._domain, retry_in = self._breaker.retry_in())
+        return started
+
+    def _record_error(self, err: Exception, started: float):
+        if _is_overload(err = err):
+            self._limiter.record_overload(started = started)
+            self._breaker.record_failure()
+        else:
+            self._breaker.record_ignored()
+
+    def _record_success(self, started: float):
+        self._limiter.record_success(latency = time.monotonic() - started)
+        self._breaker.record_success()
+
+    def get_rate_for_date(self, date: datetime) -> DatedRates:
+        started: float = self._admit()
+        try:
+            rates: DatedRates = self._client.get_rate_for_date(date = date)
+        except Exception as call_err:
+            self._record_error(err = call_err, started = started)
+            raise
+        else:
+            # Recorded while the slot is held, so a saturated limit is seen as such.
+            self._record_success(started = started)
+        finally:
+            self._limiter.release()
+        return rates
+
+    def get_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> List[DatedRates]:
+        return list(self.iter_rates_for_date_range(
+            start_date = start_date, end_date = end_date
+        ))
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        started: float = self._admit()
+        settled: bool = False
+        try:
+            for dated_rates in self._client.iter_rates_for_date_range(
+                start_date = start_date, end_date = end_date
+            ):
+                if not settled:
+                    settled = True
+                    self._record_success(started = started)
+                yield dated_rates
+            if not settled:
+                settled = True
+                self._record_success(started = started)
+        except Exception as call_err:
+            settled = True
+            self._record_error(err = call_err, started = started)
+            raise
+        finally:
+            if not settled:
+                # Closed before the first day, e.g. a losing hedged stream.
+                self._breaker.record_ignored()
+            self._limiter.release()
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from logging import Logger
+from typing import Dict, Iterator, List, Optional
+
+from src.clients.ExchangeRateHost import (
+    IExchangeRateHost,
+    BaseCurrency,
+    DatedRates
+)
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+class ResponseDiskCache:
+    '''
+    Size bounded on-disk cache of rate payloads. Entries for past dates never
+    expire, entries for recent dates live for `recent_ttl_seconds`. When the
+    byte budget is exceeded the least recently used entries are evicted.
+    '''
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        recent_days: int = 3,
+        recent_ttl_seconds: int = 3600
+    ):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._recent_days = recent_days
+        self._recent_ttl_seconds = recent_ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        os.makedirs(self._directory, exist_ok = True)
+        self._load_index()
+
+    def _load_index(self):
+        '''
+        Rebuilds the LRU order from the files on disk, oldest access first.
+        '''
+        found: List[tuple] = []
+        for file_name in os.listdir(self._directory):
+            if not file_name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self._directory, file_name))
+            found.append((stat.st_mtime, file_name, stat.st_size))
+        for _, file_name, size in sorted(found):
+            self._entries[file_name] = size
+            self._total_bytes = self._total_bytes + size
+
+    def _file_name(self, key: str) -> str:
+        return hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json"
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self._directory, file_name)
+
+    def _remove(self, file_name: str):
+        size: int = self._entries.pop(file_name, 0)
+        self._total_bytes = self._total_bytes - size
+        try:
+            os.remove(self._path(file_name))
+        except FileNotFoundError:
+            pass
+
+    def _expiry_for(self, for_date: date) -> Optional[float]:
+        recent_from: date = date.today() - timedelta(days = self._recent_days)
+        if for_date < recent_from:
+            return None
+        return time.time() + self._recent_ttl_seconds
+
+    def contains(self, key: str) -> bool:
+        '''
+        Cheap index lookup that neither reads the entry nor counts a hit.
+        '''
+        with self._lock:
+            return self._file_name(key) in self._entries
+
+    def get(self, key: str) -> Optional[dict]:
+        entry: Optional[dict] = self.get_entry(key = key)
+        return entry.get("payload") if entry != None else None
+
+    def get_entry(self, key: str) -> Optional[dict]:
+        '''
+        Responds with the whole stored entry, payload and the `source` it was
+        put with, or None on a miss.
+        '''
+        file_name: str = self._file_name(key)
+        with self._lock:
+            if file_name not in self._entries:
+                self.misses = self.misses + 1
+                return None
+            try:
+                with open(self._path(file_name), "r") as cache_file:
+                    entry: dict = json.load(cache_file)
+            except (OSError, ValueError):
+                self._remove(file_name)
+                self.misses = self.misses + 1
+                return None
+            expires_at: Optional[float] = entry.get("expires_at")
+            # An empty payload is a failed response that must not be replayed.
+            if entry.get("key") != key or not entry.get("payload") or (
+                expires_at != None and expires_at < time.time()
+            ):
+                self._remove(file_name)
+                self.misses = self.misses + 1
+                return None
+            self._entries.move_to_end(file_name)
+            os.utime(self._path(file_name))
+            self.hits = self.hits + 1
+            return entry
+
+    def put(self, key: str, payload: dict, for_date: date, source: Optional[str] = None):
+        file_name: str = self._file_name(key)
+        body: str = json.dumps({
+            "key": key,
+            "expires_at": self._expiry_for(for_date = for_date),
+            "payload": payload,
+            "source": source
+        })
+        size: int = len(body.encode("utf-8"))
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if file_name in self._entries:
+                self._remove(file_name)
+            temp_path: str = self._path(file_name) + ".tmp"
+            with open(temp_path, "w") as cache_file:
+                cache_file.write(body)
+            os.replace(temp_path, self._path(file_name))
+            self._entries[file_name] = size
+            self._total_bytes = self._total_bytes + size
+            while self._total_bytes > self._max_bytes and len(self._entries) > 1:
+                oldest: str = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions = self.evictions + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
+
+class CachedExchangeRateHost(IExchangeRateHost):
+    '''
+    Decorates any `IExchangeRateHost` with a `ResponseDiskCache`, keyed by
+    endpoint, base currency and date.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        client: IExchangeRateHost,
+        cache: ResponseDiskCache,
+        base_currency: BaseCurrency
+    ):
+        self._logger = logger
+        self._client = client
+        self._cache = cache
+        self._base_currency = base_currency
+
+    def _cache_key(self, endpoint: str, target_date: date) -> str:
+        return "{0}|{1}|{2}".format(
+            endpoint, self._base_currency.value, target_date.strftime("%Y-%m-%d")
+        )
+
+    def _cached(self, endpoint: str, target_date: date) -> Optional[DatedRates]:
+        entry: Optional[dict] = self._cache.get_entry(
+            key = self._cache_key(endpoint = endpoint, target_date = target_date)
+        )
+        if entry == None:
+            return None
+        return DatedRates(date = target_date, rates = entry.get("payload"), source = entry.get("source"))
+
+    def _store(self, endpoint: str, dated_rates: DatedRates):
+        '''
+        Only answers with rates are cached, an error body such as
+        `{"success": false}` parses to no rates and is retried next time.
+        '''
+        if not dated_rates.rates:
+            return
+        self._cache.put(
+            key = self._cache_key(endpoint = endpoint, target_date = dated_rates.date),
+            payload = dated_rates.rates,
+            for_date = dated_rates.date,
+            source = dated_rates.source
+        )
+
+    def get_rate_for_date(self, date: datetime) -> DatedRates:
+        target_date = _as_date(date)
+        cached: Optional[DatedRates] = self._cached(endpoint = "date", target_date = target_date)
+        if cached != None:
+            return cached
+        rates: Optional[DatedRates] = self._client.get_rate_for_date(date = date)
+        if rates != None:
+            self._store(endpoint = "date", dated_rates = rates)
+        return rates
+
+    def get_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> List[DatedRates]:
+        found: Dict[date, DatedRates] = {}
+        missing: List[date] = []
+        day: date = _as_date(start_date)
+        while day <= _as_date(end_date):
+            cached: Optional[DatedRates] = self._cached(endpoint = "timeseries", target_date = day)
+            if cached != None:
+                found[day] = cached
+            else:
+                missing.append(day)
+            day = day + timedelta(days = 1)
+        if len(missing) > 0:
+            # Only the span between the first and last missing day is fetched.
+            fetched: Optional[List[DatedRates]] = self._client.get_rates_for_date_range(
+                start_date = datetime.combine(missing[0], datetime.min.time()),
+                end_date = datetime.combine(missing[-1], datetime.min.time())
+            )
+            if fetched == None:
+                return None
+            for dated_rates in fetched:
+                self._store(endpoint = "timeseries", dated_rates = dated_rates)
+                found[dated_rates.date] = dated_rates
+        return [found[key] for key in sorted(found.keys())]
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        '''
+        Streaming counterpart of `get_rates_for_date_range`: cached days at the
+        edges are served from disk, the span between them is streamed from the
+        wrapped client and cached day by day.
+        '''
+        day: date = _as_date(start_date)
+        last_day: date = _as_date(end_date)
+        while day <= last_day:
+            cached: Optional[DatedRates] = self._cached(endpoint = "timeseries", target_date = day)
+            if cached == None:
+                break
+            yield cached
+            day = day + timedelta(days = 1)
+        if day > last_day:
+            return
+        fetch_end: date = last_day
+        while fetch_end > day and self._cache.contains(
+            key = self._cache_key(endpoint = "timeseries", target_date = fetch_end)
+        ):
+            fetch_end = fetch_end - timedelta(days = 1)
+        for dated_rates in self._client.iter_rates_for_date_range(
+            start_date = datetime.combine(day, datetime.min.time()),
+            end_date = datetime.combine(fetch_end, datetime.min.time())
+        ):
+            self._store(endpoint = "timeseries", dated_rates = dated_rates)
+            yield dated_rates
+        if fetch_end < last_day:
+            # Entries can expire between the index check and the read, the
+            # recursion then fetches whatever is left.
+            yield from self.iter_rates_for_date_range(
+                start_date = fetch_end + timedelta(days = 1), end_date = last_day
+            )
+
+    def log_stats(self):
+        stats: dict = self._cache.stats()
+        self._logger.info(
+            "Response cache: {0} hits, {1} misses, {2} evictions, {3} entries ({4} bytes).".format(
+                stats["hits"], stats["misses"], stats["evictions"], stats["entries"], stats["bytes"]
+            ),
+            extra = { "additional_detail": stats }
+        )
+
+    def close(self):
+        self.log_stats()
+        self._client.close()
@@ -1,25 +1,48 @@
 import requests
+import random
 import time
-from enum import Enum
-from datetime import datetime, date
+from datetime import datetime, date, timezone
+from email.utils import parsedate_to_datetime
 from abc import ABC, abstractmethod
 from logging import Logger
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
 
-class BaseCurrency(Enum):
-    '''
-    Availiable currency types to use as a base for `ExchangeRateHost` base currency.
-    '''
-    USD = "USD"
-    CAD = "CAD"
-    JPY = "JPY"
-    GBP = "GBP"
+from src.clients.TimeseriesStreamParser import iter_timeseries_rates
+# BaseCurrency lives in src.enums so configuration can load without requests,
+# it is still importable from here.
+from src.enums import BaseCurrency
+from src.metrics import metrics
+
+# Responses worth retrying: throttling and transient server side failures.
+RETRYABLE_STATUS_CODES = frozenset({ 429, 500, 502, 503, 504 })
+# Bytes read from the socket per step while streaming /timeseries.
+STREAM_CHUNK_BYTES: int = 64 * 1024
+
+class RatesUnavailableError(Exception):
+    def __init__(self, start_date: date, end_date: date):
+        super().__init__(
+            "No rates were returned for {0} to {1}.".format(
+                start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+            )
+        )
+
+class CircuitOpenError(Exception):
+    def __init__(self, domain: str, retry_in: float):
+        '''
+        Raised instead of calling a provider whose circuit breaker is open.
+        '''
+        super().__init__(
+            "Circuit to {0} is open after repeated failures, retrying in {1:.1f}s.".format(domain, retry_in)
+        )
 
 @dataclass
 class DatedRates:
     date: date
     rates: dict
+    # Provider that supplied the rates, None when the client does not say.
+    source: Optional[str] = None
 
 class IExchangeRateHost(ABC):
 
@@ -37,79 +60,221 @@ class IExchangeRateHost(ABC):
     ) -> List[DatedRates]:
         pass
 
+    def iter_rates_for_date_range(
+        self,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Iterator[DatedRates]:
+        '''
+        Streams the range one day at a time. Clients that cannot stream fall
+        back to the buffered range call; a failed range raises instead of
+        ending early so a partial window is never mistaken for a whole one.
+        '''
+        rates: Optional[List[DatedRates]] = self.get_rates_for_date_range(
+            start_date = start_date, end_date = end_date
+        )
+        if rates == None:
+            raise RatesUnavailableError(start_date = start_date, end_date = end_date)
+        yield from rates
+
+    def close(self):
+        pass
+
 class ExchangeRateHost:
     '''
     API for collecting currency rates from `api.exchangerate.host`.
     '''
+    source: str = "EXCHANGE_RATE_HOST"
+
     def __init__(
         self, 
         base_currency: BaseCurrency, 
         is_secure: bool = True,
-        timeout: int = 10,
-        retry_wait: float = 5.0
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        domain: str = "api.exchangerate.host"
     ):
-        self._domain: str = "api.exchangerate.host"
+        self._domain: str = domain
         self._base_currency: BaseCurrency = base_currency
-        self._timeout = timeout
-        self._retry_wait = retry_wait
+        self._timeout: tuple = (connect_timeout, read_timeout)
+        self._pool_size = pool_size
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._session: requests.Session = self._build_session()
         if is_secure:
             self._protcol = "https"
         else:
             self._protcol = "http"
-    
-    def _create_dated_rates_list(self, rates_obj: dict) -> List[DatedRates]:
+
+    def _build_session(self) -> requests.Session:
         '''
-        From the /timeseries endpoint, the `rates` field is converted to a properly
-        formated object for processing.
+        Builds the keep-alive session shared by every request of this client.
+        Retries are handled by `_request_execute`, not by the adapter.
         '''
-        collection: List[DatedRates] = []
-        for date_str in rates_obj.keys():
-            rates: dict = rates_obj.get(date_str)
-            date_obj: date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            obj = DatedRates(date = date_obj, rates = rates)
-            collection.append(obj)
-        return collection
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections = self._pool_size,
+            pool_maxsize = self._pool_size,
+            max_retries = 0
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({ "Connection": "keep-alive" })
+        return session
 
-    def _request_execute(self, uri: str, params: dict) -> dict:
-        retries: int = 1
+    def _parse_retry_after(self, res: Optional[requests.Response]) -> Optional[float]:
+        if res == None:
+            return None
+        header: Optional[str] = res.headers.get("Retry-After")
+        if header == None:
+            return None
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+        try:
+            retry_at: datetime = parsedate_to_datetime(header)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff_delay(self, attempt: int, res: Optional[requests.Response] = None) -> float:
+        '''
+        Honours a `Retry-After` header when the server sent one, otherwise
+        exponential backoff with full jitter.
+        '''
+        retry_after: Optional[float] = self._parse_retry_after(res = res)
+        if retry_after != None:
+            return min(retry_after, self._backoff_max)
+        ceiling: float = min(self._backoff_max, self._backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def close(self):
+        self._session.close()
+    
+    def _endpoint_label(self, uri: str) -> str:
+        return "timeseries" if uri == "/timeseries" else "date"
+
+    def _request_send(self, uri: str, params: dict, stream: bool = False) -> requests.Response:
+        attempt: int = 0
         url: str = f'{self._protcol}://{self._domain}{uri}'
-        while(retries >= 0):
+        endpoint: str = self._endpoint_label(uri = uri)
+        while(True):
             try:
-                res: requests.Response = requests.get(
-                    url = url,
-                    params = params,
-                    timeout = self._timeout
+                with metrics.timed("http_request_seconds", provider = self.source, endpoint = endpoint) as timing:
+                    res: requests.Response = self._session.get(
+                        url = url,
+                        params = params,
+                        timeout = self._timeout,
+                        stream = stream
+                    )
+                    timing["status"] = res.status_code
+            except (requests.ConnectionError, requests.Timeout) as request_err:
+                if attempt >= self._max_retries:
+                    raise
+                metrics.increment(
+                    "http_retries_total", provider = self.source, endpoint = endpoint, reason = type(request_err).__name__
+                )
+                time.sleep(self._backoff_delay(attempt = attempt))
+                attempt = attempt + 1
+                continue
+            metrics.increment("http_requests_total", provider = self.source, endpoint = endpoint, status = res.status_code)
+            if res.status_code in RETRYABLE_STATUS_CODES and attempt < self._max_retries:
+                metrics.increment(
+                    "http_retries_total", provider = self.source, endpoint = endpoint, reason = str(res.status_code)
                 )
-                retries = -1
-            except requests.ConnectTimeout:
-                retries = retries - 1
-                time.sleep(secs = self._retry_wait)
+                delay: float = self._backoff_delay(attempt = attempt, res = res)
+                res.close()
+                time.sleep(delay)
+                attempt = attempt + 1
+                continue
+            try:
+                res.raise_for_status()
+            except requests.HTTPError:
+                res.close()
+                raise
+            return res
+
+    def _request_execute(self, uri: str, params: dict) -> dict:
+        res: requests.Response = self._request_send(uri = uri, params = params)
+        metrics.increment(
+            "http_response_bytes_total",
+            len(res.content),
+            provider = self.source,
+            endpoint = self._endpoint_label(uri = uri)
+        )
         payload: dict = res.json()
         rates: dict = payload.get('rates')
         return rates
 
+    def _count_chunks(self, chunks: Iterator[bytes], endpoint: str) -> Iterator[bytes]:
+        for chunk in chunks:
+            metrics.increment("http_response_bytes_total", len(chunk), provider = self.source, endpoint = endpoint)
+            yield chunk
+
+    def _date_request(self, target_date: str) -> tuple:
+        '''
+        Responds with the uri and query parameters for one day of rates.
+        '''
+        return f'/{target_date}', { 'base': self._base_currency.value }
+
+    def _range_request(self, start_target_date: str, end_target_date: str) -> tuple:
+        '''
+        Responds with the uri and query parameters for an inclusive range of days.
+        '''
+        return '/timeseries', {
+            'start_date': start_target_date,
+            'end_date': end_target_date,
+            'base': self._base_currency.value
+        }
+
+    def _dated_rates(self, for_date: date, rates: dict) -> DatedRates:
+        return DatedRates(date = for_date, rates = rates, source = self.source)
+
     def get_rate_for_date(self, date: datetime) -> DatedRates:
         target_date: str = date.strftime("%Y-%m-%d")
-        params: dict = { 'base': self._base_currency.value }
-        uri: str = f'/{target_date}'
+        uri, params = self._date_request(target_date = target_date)
         rates: dict = self._request_execute(uri = uri, params = params)
-        obj = DatedRates(date = date.date(), rates = rates)
+        obj = self._dated_rates(for_date = date.date(), rates = rates)
         return obj
 
     def get_rates_for_date_range(
         self, start_date: datetime, end_date: datetime
     ) -> List[DatedRates]:
-        start_target_date: str = start_date.strftime("%Y-%m-%d")
-        end_target_date: str = end_date.strftime("%Y-%m-%d")
-        params: dict = {
-            'start_date': start_target_date,
-            'end_date': end_target_date,
-            'base': self._base_currency.value
-        }
-        uri: str = '/timeseries'
-        rates_raw: dict = self._request_execute(uri = uri, params = params)
-        rates: List[DatedRates] = self._create_dated_rates_list(rates_obj = rates_raw)
-        return rates
+        return list(self.iter_rates_for_date_range(
+            start_date = start_date, end_date = end_date
+        ))
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        '''
+        Streams the range body and yields each day as soon as it is decoded,
+        so memory stays flat however long the range is.
+        '''
+        uri, params = self._range_request(
+            start_target_date = start_date.strftime("%Y-%m-%d"),
+            end_target_date = end_date.strftime("%Y-%m-%d")
+        )
+        res: requests.Response = self._request_send(uri = uri, params = params, stream = True)
+        try:
+            for date_str, rates in iter_timeseries_rates(
+                chunks = self._count_chunks(
+                    chunks = res.iter_content(chunk_size = STREAM_CHUNK_BYTES),
+                    endpoint = self._endpoint_label(uri = uri)
+                )
+            ):
+                yield self._dated_rates(
+                    for_date = datetime.strptime(date_str, '%Y-%m-%d').date(),
+                    rates = rates
+                )
+        finally:
+            res.close()
 
 class ExchangeRateHostProxy(IExchangeRateHost):
 
@@ -131,6 +296,15 @@ class ExchangeRateHostProxy(IExchangeRateHost):
     def _log_connection_error(self, err: requests.ConnectionError):
         self._logger.error(f"Failed to connect to {self._client._domain} for currency convertion rates. {err.args}")
 
+    def _log_http_error(self, err: requests.HTTPError):
+        self._logger.error(f"Request to {self._client._domain} failed with an error response. {err.args}")
+
+    def _log_circuit_open(self, err: CircuitOpenError):
+        self._logger.error(f"Skipped the request to {self._client._domain}. {err.args}")
+
+    def close(self):
+        self._client.close()
+
     def get_rate_for_date(self, date: datetime) -> DatedRates:
         rates: Optional[DatedRates] = None
         try:
@@ -139,7 +313,32 @@ class ExchangeRateHostProxy(IExchangeRateHost):
             self._log_connection_error(conn_err)
         except requests.Timeout as timeout_err:
             self._log_timeout_error(timeout_err)
+        except requests.HTTPError as http_err:
+            self._log_http_error(http_err)
+        except CircuitOpenError as circuit_err:
+            self._log_circuit_open(circuit_err)
         return rates
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        # Errors are logged and re-raised, a stream cut short must not look complete.
+        try:
+            yield from self._client.iter_rates_for_date_range(
+                start_date = start_date, end_date = end_date
+            )
+        except requests.ConnectionError as conn_err:
+            self._log_connection_error(conn_err)
+            raise
+        except requests.Timeout as timeout_err:
+            self._log_timeout_error(timeout_err)
+            raise
+        except requests.HTTPError as http_err:
+            self._log_http_error(http_err)
+            raise
+        except CircuitOpenError as circuit_err:
+            self._log_circuit_open(circuit_err)
+            raise
     
     def get_rates_for_date_range(
         self, start_date: datetime, end_date: datetime
@@ -153,4 +352,8 @@ class ExchangeRateHostProxy(IExchangeRateHost):
             self._log_connection_error(conn_err)
         except requests.Timeout as timeout_err:
             self._log_timeout_error(timeout_err)
+        except requests.HTTPError as http_err:
+            self._log_http_error(http_err)
+        except CircuitOpenError as circuit_err:
+            self._log_circuit_open(circuit_err)
         return rates
\ No newline at end of file
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator, Optional
+
+from src.clients.ExchangeRateHost import BaseCurrency, DatedRates, ExchangeRateHost
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+class FrankfurterHost(ExchangeRateHost):
+    '''
+    API for collecting ECB reference rates from `api.frankfurter.app`. Shares
+    the session, retry and streaming behaviour of `ExchangeRateHost`, only the
+    request shapes differ. Ranges only list working days, the streamed days
+    are filled in to match the calendar days exchangerate.host returns.
+    '''
+    source: str = "FRANKFURTER"
+
+    def __init__(
+        self,
+        base_currency: BaseCurrency,
+        is_secure: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        domain: str = "api.frankfurter.app"
+    ):
+        super().__init__(
+            base_currency = base_currency,
+            is_secure = is_secure,
+            connect_timeout = connect_timeout,
+            read_timeout = read_timeout,
+            pool_size = pool_size,
+            max_retries = max_retries,
+            backoff_base = backoff_base,
+            backoff_max = backoff_max,
+            domain = domain
+        )
+
+    def _endpoint_label(self, uri: str) -> str:
+        return "timeseries" if ".." in uri else "date"
+
+    def _date_request(self, target_date: str) -> tuple:
+        return f'/{target_date}', { 'from': self._base_currency.value }
+
+    def _range_request(self, start_target_date: str, end_target_date: str) -> tuple:
+        return f'/{start_target_date}..{end_target_date}', { 'from': self._base_currency.value }
+
+    def _dated_rates(self, for_date: date, rates: dict) -> DatedRates:
+        # The base is left out of the payload, exchangerate.host lists it at par.
+        if rates != None:
+            rates = { **rates, self._base_currency.value: 1.0 }
+        return super()._dated_rates(for_date = for_date, rates = rates)
+
+    def _fill_days(
+        self, previous: Optional[DatedRates], first_day: date, last_day: date
+    ) -> Iterator[DatedRates]:
+        if previous == None or not previous.rates:
+            return
+        day: date = first_day
+        while day <= last_day:
+            yield DatedRates(date = day, rates = dict(previous.rates), source = self.source)
+            day = day + timedelta(days = 1)
+
+    def _rates_before(self, day: date) -> DatedRates:
+        '''
+        A single date request answers a closed day with the working day before.
+        '''
+        return self.get_rate_for_date(date = datetime.combine(day, datetime.min.time()))
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        '''
+        Yields every calendar day of the range, weekends and holidays carry
+        the rates of the working day before, as a single date request does.
+        Trailing days are filled up to yesterday (UTC) only, today's rates
+        may not be published yet.
+        '''
+        first_day: date = _as_date(start_date)
+        fill_until: date = min(
+            _as_date(end_date), datetime.now(timezone.utc).date() - timedelta(days = 1)
+        )
+        next_day: date = first_day
+        previous: Optional[DatedRates] = None
+        for dated_rates in super().iter_rates_for_date_range(start_date = start_date, end_date = end_date):
+            if dated_rates.date < first_day:
+                # A range opening on a closed day starts at the working day before.
+                previous = dated_rates
+                continue
+            if dated_rates.date > next_day:
+                if previous == None:
+                    previous = self._rates_before(day = first_day)
+                yield from self._fill_days(
+                    previous = previous, first_day = next_day, last_day = dated_rates.date - timedelta(days = 1)
+                )
+            yield dated_rates
+            previous = dated_rates
+            next_day = dated_rates.date + timedelta(days = 1)
+        if next_day <= fill_until:
+            if previous == None:
+                previous = self._rates_before(day = first_day)
+            yield from self._fill_days(previous = previous, first_day = next_day, last_day = fill_until)
@@ -0,0 +1,242 @@
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging import Logger
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.clients.ExchangeRateHost import DatedRates, IExchangeRateHost
+from src.metrics import metrics
+
+def _provider_name(provider: IExchangeRateHost) -> str:
+    return getattr(provider, "source", provider.__class__.__name__)
+
+def _close_stream(stream: Iterator[DatedRates]):
+    close: Optional[Callable[[], None]] = getattr(stream, "close", None)
+    if close != None:
+        close()
+
+class LatencyTracker:
+    '''
+    Rolling window of the most recent latencies of one operation.
+    '''
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen = window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered: List[float] = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class _Attempt:
+    '''
+    Result of one provider call, `error` is set when the call raised.
+    '''
+    def __init__(self, index: int, result: Any = None, error: Optional[Exception] = None):
+        self.index = index
+        self.result = result
+        self.error = error
+
+class HedgedExchangeRateHost(IExchangeRateHost):
+    '''
+    Composite client sending each request to the first provider and, when it
+    has not answered within the `hedge_percentile` of its recent latencies,
+    to the next provider as well. The first valid answer wins and the other
+    calls are discarded; a provider that fails hands over at once. Rows keep
+    the `source` of the provider that answered.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        providers: List[IExchangeRateHost],
+        hedge_percentile: float = 0.95,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        min_samples: int = 20,
+        window: int = 200
+    ):
+        self._logger = logger
+        self._providers = providers
+        self._hedge_percentile = hedge_percentile
+        self._initial_delay = initial_delay
+        self._min_delay = min_delay
+        self._min_samples = min_samples
+        self._latencies: Dict[str, LatencyTracker] = {
+            "date": LatencyTracker(window = window),
+            "timeseries": LatencyTracker(window = window)
+        }
+        # Read by ExchangeRateHostProxy when logging a failure.
+        self._domain: str = ", ".join(getattr(x, "_domain", _provider_name(x)) for x in providers)
+
+    def hedge_delay(self, operation: str) -> float:
+        '''
+        Seconds to wait on the primary before hedging. Until enough samples
+        exist the configured initial delay is used.
+        '''
+        observed: Optional[float] = self._latencies[operation].percentile(
+            q = self._hedge_percentile, min_samples = self._min_samples
+        )
+        if observed == None:
+            return self._initial_delay
+        return max(self._min_delay, observed)
+
+    def _race(
+        self,
+        operation: str,
+        call: Callable[[IExchangeRateHost], Any],
+        is_valid: Callable[[Any], bool],
+        discard: Callable[[Any], None]
+    ) -> Any:
+        '''
+        Runs `call` against the providers in order, hedging after
+        `hedge_delay` and failing over on errors or invalid answers. Responds
+        with the first valid result, else the primary's own answer, else
+        raises the first error seen.
+        '''
+        results: "queue.Queue[_Attempt]" = queue.Queue()
+        settled = threading.Event()
+        settle_lock = threading.Lock()
+        delay: float = self.hedge_delay(operation = operation)
+
+        def attempt(index: int, provider: IExchangeRateHost):
+            started: float = time.perf_counter()
+            try:
+                outcome = _Attempt(index = index, result = call(provider))
+            except Exception as call_err:
+                outcome = _Attempt(index = index, error = call_err)
+            if index == 0 and outcome.error == None:
+                # Recorded even when the primary lost, so slow answers count.
+                self._latencies[operation].record(time.perf_counter() - started)
+            with settle_lock:
+                if not settled.is_set():
+                    results.put(outcome)
+                    return
+            if outcome.error == None:
+                discard(outcome.result)
+
+        launched: int = 0
+        next_hedge_at: float = 0.0
+
+        def launch():
+            nonlocal launched, next_hedge_at
+            provider: IExchangeRateHost = self._providers[launched]
+            threading.Thread(
+                target = attempt,
+                args = (launched, provider),
+                name = "hedged-{0}-{1}".format(operation, _provider_name(provider)),
+                daemon = True
+            ).start()
+            launched = launched + 1
+            next_hedge_at = time.monotonic() + delay
+
+        launch()
+        finished: List[_Attempt] = []
+        winner: Optional[_Attempt] = None
+        while len(finished) < launched:
+            timeout: Optional[float] = None
+            if launched < len(self._providers):
+                timeout = max(0.0, next_hedge_at - time.monotonic())
+            try:
+                outcome: _Attempt = results.get(timeout = timeout)
+            except queue.Empty:
+                metrics.increment(
+                    "hedged_requests_total", operation = operation, provider = _provider_name(self._providers[launched])
+                )
+                self._logger.debug("No {0} answer after {1:.3f}s, hedging to {2}.".format(
+                    operation, delay, _provider_name(self._providers[launched])
+                ))
+                launch()
+                continue
+            finished.append(outcome)
+            if outcome.error == None and is_valid(outcome.result):
+                winner = outcome
+                break
+            self._logger.warning("Provider {0} gave no usable {1} answer. {2}".format(
+                _provider_name(self._providers[outcome.index]),
+                operation,
+                outcome.error.args if outcome.error != None else "Empty response."
+            ))
+            if launched < len(self._providers):
+                launch()
+        with settle_lock:
+            settled.set()
+        # Calls that answered after the winner was picked are released here,
+        # the ones still running discard their own result when they return.
+        while not results.empty():
+            late: _Attempt = results.get_nowait()
+            if late.error == None:
+                discard(late.result)
+        if winner != None:
+            metrics.increment(
+                "provider_answers_total", operation = operation, provider = _provider_name(self._providers[winner.index])
+            )
+            for outcome in finished:
+                if outcome is not winner and outcome.error == None:
+                    discard(outcome.result)
+            return winner.result
+        finished.sort(key = lambda x: x.index)
+        for outcome in finished:
+            if outcome.error == None:
+                for other in finished:
+                    if other is not outcome and other.error == None:
+                        discard(other.result)
+                return outcome.result
+        raise finished[0].error
+
+    def get_rate_for_date(self, date: datetime) -> DatedRates:
+        return self._race(
+            operation = "date",
+            call = lambda provider: provider.get_rate_for_date(date = date),
+            is_valid = lambda result: result != None and bool(result.rates),
+            discard = lambda result: None
+        )
+
+    def get_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> List[DatedRates]:
+        return list(self.iter_rates_for_date_range(
+            start_date = start_date, end_date = end_date
+        ))
+
+    def iter_rates_for_date_range(
+        self, start_date: datetime, end_date: datetime
+    ) -> Iterator[DatedRates]:
+        '''
+        Hedges on the first streamed day, the winning stream is then read to
+        the end and every other stream is closed.
+        '''
+        def first_day(provider: IExchangeRateHost) -> Tuple[Iterator[DatedRates], Optional[DatedRates]]:
+            stream: Iterator[DatedRates] = iter(provider.iter_rates_for_date_range(
+                start_date = start_date, end_date = end_date
+            ))
+            try:
+                return stream, next(stream, None)
+            except Exception:
+                _close_stream(stream = stream)
+                raise
+
+        stream, first = self._race(
+            operation = "timeseries",
+            call = first_day,
+            is_valid = lambda result: result[1] != None and bool(result[1].rates),
+            discard = lambda result: _close_stream(stream = result[0])
+        )
+        try:
+            if first == None:
+                return
+            yield first
+            yield from stream
+        finally:
+            _close_stream(stream = stream)
+
+    def close(self):
+        for provider in self._providers:
+            provider.close()
@@ -0,0 +1,39 @@
+from typing import Callable, Dict, List
+
+from src.clients.ExchangeRateHost import ExchangeRateHost, IExchangeRateHost
+from src.clients.FrankfurterHost import FrankfurterHost
+from src.enums import RateProvider
+
+ProviderFactory = Callable[..., IExchangeRateHost]
+
+class UnknownProviderError(Exception):
+    def __init__(self, provider: RateProvider):
+        '''
+        Raised when no factory was registered for the requested provider.
+        '''
+        super().__init__("No rate provider is registered as '{0}'.".format(provider.value))
+
+class ProviderRegistry:
+    '''
+    Maps each `RateProvider` to a factory building its client. Every factory
+    is called with the same client options (base currency, timeouts, pool
+    and retry settings), so providers are interchangeable in configuration.
+    '''
+    def __init__(self):
+        self._factories: Dict[RateProvider, ProviderFactory] = {}
+
+    def register(self, provider: RateProvider, factory: ProviderFactory):
+        self._factories[provider] = factory
+
+    def providers(self) -> List[RateProvider]:
+        return list(self._factories.keys())
+
+    def build(self, provider: RateProvider, **options) -> IExchangeRateHost:
+        factory: ProviderFactory = self._factories.get(provider)
+        if factory == None:
+            raise UnknownProviderError(provider = provider)
+        return factory(**options)
+
+provider_registry = ProviderRegistry()
+provider_registry.register(RateProvider.EXCHANGE_RATE_HOST, ExchangeRateHost)
+provider_registry.register(RateProvider.FRANKFURTER, FrankfurterHost)
@@ -0,0 +1,113 @@
+import codecs
+import json
+from typing import Iterable, Iterator, Optional, Tuple
+
+_WHITESPACE: str = " \t\n\r"
+
+class TimeseriesParseError(Exception):
+    def __init__(self, message: str):
+        super().__init__(
+            "Failed to parse streamed /timeseries response. {0}".format(message)
+        )
+
+class _ChunkBuffer:
+    '''
+    Text decoded so far from the byte chunks, trimmed as values are consumed.
+    '''
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks: Iterator[bytes] = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self.text: str = ""
+        self.position: int = 0
+        self.exhausted: bool = False
+
+    def fill(self) -> bool:
+        '''
+        Appends the next chunk, dropping the consumed prefix. Responds with
+        False once the stream has ended.
+        '''
+        if self.exhausted:
+            return False
+        chunk: Optional[bytes] = next(self._chunks, None)
+        self.text = self.text[self.position:]
+        self.position = 0
+        if chunk == None:
+            self.exhausted = True
+            self.text = self.text + self._decoder.decode(b"", final = True)
+            return False
+        self.text = self.text + self._decoder.decode(chunk)
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in _WHITESPACE:
+                self.position = self.position + 1
+            if self.position < len(self.text) or not self.fill():
+                return
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.position >= len(self.text):
+            raise TimeseriesParseError("Unexpected end of response.")
+        return self.text[self.position]
+
+    def expect(self, token: str):
+        if self.peek() != token:
+            raise TimeseriesParseError("Expected '{0}' at offset {1}.".format(token, self.position))
+        self.position = self.position + 1
+
+    def decode_value(self):
+        '''
+        Decodes the next complete JSON value, pulling chunks until it is whole.
+        A value ending exactly at the end of the buffer may be a cut number,
+        so it is only accepted once more text or the end of stream follows.
+        '''
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self.text, self.position)
+                if end < len(self.text) or self.exhausted:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError as decode_err:
+                if self.exhausted:
+                    raise TimeseriesParseError(decode_err.args)
+            self.fill()
+
+def iter_timeseries_rates(chunks: Iterable[bytes]) -> Iterator[Tuple[str, dict]]:
+    '''
+    Yields `(date, rates)` pairs from the `rates` object of a /timeseries
+    response as soon as each day is decoded, so only one day is held in
+    memory at a time. Other top level members are decoded and discarded.
+    '''
+    buffer = _ChunkBuffer(chunks = chunks)
+    buffer.expect("{")
+    found_rates: bool = False
+    if buffer.peek() == "}":
+        buffer.position = buffer.position + 1
+    else:
+        while True:
+            key = buffer.decode_value()
+            buffer.expect(":")
+            if key == "rates" and buffer.peek() == "{":
+                found_rates = True
+                buffer.expect("{")
+                if buffer.peek() == "}":
+                    buffer.position = buffer.position + 1
+                else:
+                    while True:
+                        date_str = buffer.decode_value()
+                        buffer.expect(":")
+                        yield date_str, buffer.decode_value()
+                        if buffer.peek() == "}":
+                            buffer.position = buffer.position + 1
+                            break
+                        buffer.expect(",")
+            else:
+                buffer.decode_value()
+            if buffer.peek() == "}":
+                break
+            buffer.expect(",")
+    if not found_rates:
+        raise TimeseriesParseError("Response has no `rates` object.")
@@ -1,10 +1,19 @@
 import sys
 import os
-from marshmallow import fields, Schema, ValidationError
+from datetime import date, time
+from typing import List
+from marshmallow import fields, Schema, ValidationError, validates_schema
 from pprint import pprint
 
-from src.enums import JobType
-from src.clients.ExchangeRateHost import BaseCurrency
+from src.enums import (
+    BaseCurrency,
+    JobType,
+    DatabaseDialect,
+    PartitionInterval,
+    ProfileMode,
+    RateProvider,
+    StorageFormat
+)
 
 class LoggerConfig(Schema):
     log_level = fields.String(
@@ -19,6 +28,26 @@ class LoggerConfig(Schema):
         required = True,
         allow_none = False
     )
+    json_max_bytes = fields.Integer(
+        required = False,
+        load_default = 50 * 1024 * 1024
+    )
+    json_backup_count = fields.Integer(
+        required = False,
+        load_default = 5
+    )
+    flush_records = fields.Integer(
+        required = False,
+        load_default = 64
+    )
+    flush_interval_seconds = fields.Float(
+        required = False,
+        load_default = 1.0
+    )
+    queue_enabled = fields.Boolean(
+        required = False,
+        load_default = True
+    )
 
 class JobConfig(Schema):
     type = fields.Enum(
@@ -34,16 +63,75 @@ class JobConfig(Schema):
     historical_previous_days = fields.Integer(
         required = False
     )
+    catchup_start_date = fields.Date(
+        required = False,
+        allow_none = False
+    )
+    historical_batch_size = fields.Integer(
+        required = False,
+        load_default = 500
+    )
+    historical_window_days = fields.Integer(
+        required = False,
+        load_default = 365
+    )
+    historical_fetch_workers = fields.Integer(
+        required = False,
+        load_default = 4
+    )
+    historical_window_retries = fields.Integer(
+        required = False,
+        load_default = 2
+    )
+    historical_checkpoint_path = fields.String(
+        required = False,
+        load_default = "./checkpoints/historical.json"
+    )
     base_currency = fields.Enum(
         enum = BaseCurrency, 
         by_value = True,
         required = True,
         error_messages = { "required": "job.base_currency is required to launch" }
     )
+    maintain_rollups = fields.Boolean(
+        required = False,
+        load_default = False
+    )
+    derived_base_currencies = fields.List(
+        fields.Enum(enum = BaseCurrency, by_value = True),
+        required = False,
+        load_default = []
+    )
     timezone = fields.String(
         required = True,
         allow_none = False
     )
+    daemon_run_at = fields.Time(
+        required = False,
+        load_default = time(1, 0)
+    )
+    daemon_catchup_days = fields.Integer(
+        required = False,
+        load_default = 7
+    )
+
+    @validates_schema
+    def _validate_job_range(self, data: dict, **kwargs):
+        '''
+        The date range of a job is only required by the job types that read
+        it, so a missing one fails here rather than mid run.
+        '''
+        required: List[str] = []
+        if data["type"] in (JobType.HISTORICAL, JobType.BACKFILL):
+            required = ["historical_end_date", "historical_previous_days"]
+        elif data["type"] == JobType.CATCHUP:
+            required = ["catchup_start_date"]
+        for field_name in required:
+            if data.get(field_name) == None:
+                raise ValidationError(
+                    "job.{0} is required when job.type is {1}".format(field_name, data["type"].value),
+                    field_name = field_name
+                )
 
 class PostgresConfig(Schema):
     host = fields.String(
@@ -65,11 +153,303 @@ class PostgresConfig(Schema):
         required = True,
         allow_none = False
     )
+    pool_size = fields.Integer(
+        required = False,
+        load_default = 5
+    )
+    pool_timeout = fields.Integer(
+        required = False,
+        load_default = 30
+    )
+    max_overflow = fields.Integer(
+        required = False,
+        load_default = 10
+    )
+    pool_pre_ping = fields.Boolean(
+        required = False,
+        load_default = True
+    )
+    pool_recycle = fields.Integer(
+        required = False,
+        load_default = 1800
+    )
+    statement_cache_size = fields.Integer(
+        required = False,
+        load_default = 500
+    )
+
+class DatabaseConfig(Schema):
+    dialect = fields.Enum(
+        enum = DatabaseDialect,
+        by_value = True,
+        required = False,
+        load_default = DatabaseDialect.POSTGRES
+    )
+
+class StorageConfig(Schema):
+    format = fields.Enum(
+        enum = StorageFormat,
+        by_value = True,
+        required = False,
+        load_default = StorageFormat.JSON
+    )
+    keyframe_days = fields.Integer(
+        required = False,
+        load_default = 28
+    )
+
+class BackfillConfig(Schema):
+    queue = fields.String(
+        required = False,
+        load_default = "historical"
+    )
+    enqueue = fields.Boolean(
+        required = False,
+        load_default = True
+    )
+    item_days = fields.Integer(
+        required = False,
+        load_default = 365
+    )
+    workers = fields.Integer(
+        required = False,
+        load_default = 2
+    )
+    lease_seconds = fields.Float(
+        required = False,
+        load_default = 300.0
+    )
+    heartbeat_seconds = fields.Float(
+        required = False,
+        load_default = 60.0
+    )
+    max_attempts = fields.Integer(
+        required = False,
+        load_default = 5
+    )
+    poll_seconds = fields.Float(
+        required = False,
+        load_default = 30.0
+    )
+
+class PartitionsConfig(Schema):
+    managed = fields.Boolean(
+        required = False,
+        load_default = True
+    )
+    interval = fields.Enum(
+        enum = PartitionInterval,
+        by_value = True,
+        required = False,
+        load_default = PartitionInterval.YEAR
+    )
+    start_date = fields.Date(
+        required = False,
+        load_default = date(1999, 1, 1)
+    )
+    future_periods = fields.Integer(
+        required = False,
+        load_default = 2
+    )
+
+class SQLiteConfig(Schema):
+    path = fields.String(
+        required = False,
+        load_default = "./data/exchange_rates.sqlite3"
+    )
+    cache_size_kb = fields.Integer(
+        required = False,
+        load_default = 65536
+    )
+    busy_timeout_ms = fields.Integer(
+        required = False,
+        load_default = 5000
+    )
+    synchronous = fields.String(
+        required = False,
+        load_default = "NORMAL"
+    )
+
+class ClientConfig(Schema):
+    connect_timeout = fields.Float(
+        required = False,
+        load_default = 5.0
+    )
+    read_timeout = fields.Float(
+        required = False,
+        load_default = 30.0
+    )
+    pool_size = fields.Integer(
+        required = False,
+        load_default = 10
+    )
+    max_retries = fields.Integer(
+        required = False,
+        load_default = 3
+    )
+    backoff_base = fields.Float(
+        required = False,
+        load_default = 0.5
+    )
+    backoff_max = fields.Float(
+        required = False,
+        load_default = 30.0
+    )
+    adaptive_concurrency = fields.Boolean(
+        required = False,
+        load_default = False
+    )
+    concurrency_initial = fields.Integer(
+        required = False,
+        load_default = 4
+    )
+    concurrency_min = fields.Integer(
+        required = False,
+        load_default = 1
+    )
+    # Defaults to pool_size, more requests in flight than pooled connections only queue.
+    concurrency_max = fields.Integer(
+        required = False,
+        load_default = None
+    )
+    concurrency_backoff_ratio = fields.Float(
+        required = False,
+        load_default = 0.5
+    )
+    concurrency_latency_tolerance = fields.Float(
+        required = False,
+        load_default = 2.0
+    )
+    breaker_failure_threshold = fields.Integer(
+        required = False,
+        load_default = 5
+    )
+    breaker_reset_seconds = fields.Float(
+        required = False,
+        load_default = 30.0
+    )
+
+class ProvidersConfig(Schema):
+    primary = fields.Enum(
+        enum = RateProvider,
+        by_value = True,
+        required = False,
+        load_default = RateProvider.EXCHANGE_RATE_HOST
+    )
+    secondary = fields.List(
+        fields.Enum(enum = RateProvider, by_value = True),
+        required = False,
+        load_default = []
+    )
+    hedge_percentile = fields.Float(
+        required = False,
+        load_default = 0.95
+    )
+    hedge_initial_delay_seconds = fields.Float(
+        required = False,
+        load_default = 1.0
+    )
+    hedge_min_delay_seconds = fields.Float(
+        required = False,
+        load_default = 0.05
+    )
+    hedge_min_samples = fields.Integer(
+        required = False,
+        load_default = 20
+    )
+
+class CacheConfig(Schema):
+    enabled = fields.Boolean(
+        required = False,
+        load_default = False
+    )
+    directory = fields.String(
+        required = False,
+        load_default = "./cache/exchangerate_host"
+    )
+    max_bytes = fields.Integer(
+        required = False,
+        load_default = 256 * 1024 * 1024
+    )
+    recent_days = fields.Integer(
+        required = False,
+        load_default = 3
+    )
+    recent_ttl_seconds = fields.Integer(
+        required = False,
+        load_default = 3600
+    )
+
+class ExportConfig(Schema):
+    parquet_enabled = fields.Boolean(
+        required = False,
+        load_default = False
+    )
+    parquet_directory = fields.String(
+        required = False,
+        load_default = "./export/exchange_rates"
+    )
+    parquet_compression = fields.String(
+        required = False,
+        load_default = "zstd"
+    )
+
+class MetricsConfig(Schema):
+    prometheus_textfile = fields.String(
+        required = False,
+        load_default = None
+    )
+    json_summary_path = fields.String(
+        required = False,
+        load_default = None
+    )
+    profile = fields.Enum(
+        enum = ProfileMode,
+        by_value = True,
+        required = False,
+        load_default = ProfileMode.NONE
+    )
+    profile_directory = fields.String(
+        required = False,
+        load_default = "./profiles"
+    )
+    profile_sample_interval_ms = fields.Float(
+        required = False,
+        load_default = 5.0
+    )
 
 class EnvironmentVarSchema(Schema):
-    postgres = fields.Nested(PostgresConfig())
+    database = fields.Nested(DatabaseConfig())
+    postgres = fields.Nested(PostgresConfig(), required = False)
+    sqlite = fields.Nested(SQLiteConfig())
+    partitions = fields.Nested(PartitionsConfig())
+    storage = fields.Nested(StorageConfig())
     logger = fields.Nested(LoggerConfig())
     job = fields.Nested(JobConfig())
+    backfill = fields.Nested(BackfillConfig())
+    client = fields.Nested(ClientConfig())
+    providers = fields.Nested(ProvidersConfig())
+    cache = fields.Nested(CacheConfig())
+    export = fields.Nested(ExportConfig())
+    metrics = fields.Nested(MetricsConfig())
+
+    @validates_schema
+    def _validate_database(self, data: dict, **kwargs):
+        if data["database"]["dialect"] == DatabaseDialect.POSTGRES and "postgres" not in data:
+            raise ValidationError(
+                "postgres.* settings are required when database.dialect is POSTGRES",
+                field_name = "postgres"
+            )
+        if data["storage"]["format"] != StorageFormat.JSON and data["database"]["dialect"] != DatabaseDialect.POSTGRES:
+            raise ValidationError(
+                "storage.format {0} requires database.dialect POSTGRES".format(data["storage"]["format"].value),
+                field_name = "storage"
+            )
+        if data["job"]["type"] == JobType.BACKFILL and data["database"]["dialect"] != DatabaseDialect.POSTGRES:
+            raise ValidationError(
+                "job.type BACKFILL requires database.dialect POSTGRES",
+                field_name = "job"
+            )
 
 def _handle_schema_validation(raw_config: dict) -> dict:
     try:
@@ -80,28 +460,137 @@ def _handle_schema_validation(raw_config: dict) -> dict:
         pprint(err.messages_dict)
         sys.exit()
 
+def _drop_unset(section: dict) -> dict:
+    '''
+    Removes variables that are not set so optional fields fall back to
+    their schema `load_default`.
+    '''
+    return { key: value for key, value in section.items() if value is not None }
+
+def _split_list(value: str) -> list:
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip() != ""]
+
 def _build_raw_config() -> dict:
-    return {
-        "job": {
+    raw_config: dict = {
+        "job": _drop_unset({
             "type": os.getenv("JOB.TYPE"),
             "historical_end_date": os.getenv("JOB.HISTORICAL_END_DATE"),
             "historical_previous_days": os.getenv("JOB.HISTORICAL_PREVIOUS_DAYS"),
+            "catchup_start_date": os.getenv("JOB.CATCHUP_START_DATE"),
+            "historical_batch_size": os.getenv("JOB.HISTORICAL_BATCH_SIZE"),
+            "historical_window_days": os.getenv("JOB.HISTORICAL_WINDOW_DAYS"),
+            "historical_fetch_workers": os.getenv("JOB.HISTORICAL_FETCH_WORKERS"),
+            "historical_window_retries": os.getenv("JOB.HISTORICAL_WINDOW_RETRIES"),
+            "historical_checkpoint_path": os.getenv("JOB.HISTORICAL_CHECKPOINT_PATH"),
             "base_currency": os.getenv("JOB.BASE_CURRENCY"),
-            "timezone": os.getenv("JOB.TIMEZONE")
-        },
-        "logger": {
+            "derived_base_currencies": _split_list(os.getenv("JOB.DERIVED_BASE_CURRENCIES")),
+            "maintain_rollups": os.getenv("JOB.MAINTAIN_ROLLUPS"),
+            "timezone": os.getenv("JOB.TIMEZONE"),
+            "daemon_run_at": os.getenv("JOB.DAEMON_RUN_AT"),
+            "daemon_catchup_days": os.getenv("JOB.DAEMON_CATCHUP_DAYS")
+        }),
+        "logger": _drop_unset({
             "log_level": os.getenv("LOGGER.LOG_LEVEL"),
             "name": os.getenv("LOGGER.NAME"),
-            "json_file_path": os.getenv("LOGGER.JSON_FILE_PATH")
-        },
-        "postgres": {
+            "json_file_path": os.getenv("LOGGER.JSON_FILE_PATH"),
+            "json_max_bytes": os.getenv("LOGGER.JSON_MAX_BYTES"),
+            "json_backup_count": os.getenv("LOGGER.JSON_BACKUP_COUNT"),
+            "flush_records": os.getenv("LOGGER.FLUSH_RECORDS"),
+            "flush_interval_seconds": os.getenv("LOGGER.FLUSH_INTERVAL_SECONDS"),
+            "queue_enabled": os.getenv("LOGGER.QUEUE_ENABLED")
+        }),
+        "client": _drop_unset({
+            "connect_timeout": os.getenv("CLIENT.CONNECT_TIMEOUT"),
+            "read_timeout": os.getenv("CLIENT.READ_TIMEOUT"),
+            "pool_size": os.getenv("CLIENT.POOL_SIZE"),
+            "max_retries": os.getenv("CLIENT.MAX_RETRIES"),
+            "backoff_base": os.getenv("CLIENT.BACKOFF_BASE"),
+            "backoff_max": os.getenv("CLIENT.BACKOFF_MAX"),
+            "adaptive_concurrency": os.getenv("CLIENT.ADAPTIVE_CONCURRENCY"),
+            "concurrency_initial": os.getenv("CLIENT.CONCURRENCY_INITIAL"),
+            "concurrency_min": os.getenv("CLIENT.CONCURRENCY_MIN"),
+            "concurrency_max": os.getenv("CLIENT.CONCURRENCY_MAX"),
+            "concurrency_backoff_ratio": os.getenv("CLIENT.CONCURRENCY_BACKOFF_RATIO"),
+            "concurrency_latency_tolerance": os.getenv("CLIENT.CONCURRENCY_LATENCY_TOLERANCE"),
+            "breaker_failure_threshold": os.getenv("CLIENT.BREAKER_FAILURE_THRESHOLD"),
+            "breaker_reset_seconds": os.getenv("CLIENT.BREAKER_RESET_SECONDS")
+        }),
+        "providers": _drop_unset({
+            "primary": os.getenv("PROVIDERS.PRIMARY"),
+            "secondary": _split_list(os.getenv("PROVIDERS.SECONDARY")),
+            "hedge_percentile": os.getenv("PROVIDERS.HEDGE_PERCENTILE"),
+            "hedge_initial_delay_seconds": os.getenv("PROVIDERS.HEDGE_INITIAL_DELAY_SECONDS"),
+            "hedge_min_delay_seconds": os.getenv("PROVIDERS.HEDGE_MIN_DELAY_SECONDS"),
+            "hedge_min_samples": os.getenv("PROVIDERS.HEDGE_MIN_SAMPLES")
+        }),
+        "cache": _drop_unset({
+            "enabled": os.getenv("CACHE.ENABLED"),
+            "directory": os.getenv("CACHE.DIRECTORY"),
+            "max_bytes": os.getenv("CACHE.MAX_BYTES"),
+            "recent_days": os.getenv("CACHE.RECENT_DAYS"),
+            "recent_ttl_seconds": os.getenv("CACHE.RECENT_TTL_SECONDS")
+        }),
+        "metrics": _drop_unset({
+            "prometheus_textfile": os.getenv("METRICS.PROMETHEUS_TEXTFILE"),
+            "json_summary_path": os.getenv("METRICS.JSON_SUMMARY_PATH"),
+            "profile": os.getenv("METRICS.PROFILE"),
+            "profile_directory": os.getenv("METRICS.PROFILE_DIRECTORY"),
+            "profile_sample_interval_ms": os.getenv("METRICS.PROFILE_SAMPLE_INTERVAL_MS")
+        }),
+        "export": _drop_unset({
+            "parquet_enabled": os.getenv("EXPORT.PARQUET_ENABLED"),
+            "parquet_directory": os.getenv("EXPORT.PARQUET_DIRECTORY"),
+            "parquet_compression": os.getenv("EXPORT.PARQUET_COMPRESSION")
+        }),
+        "database": _drop_unset({
+            "dialect": os.getenv("DATABASE.DIALECT")
+        }),
+        "storage": _drop_unset({
+            "format": os.getenv("STORAGE.FORMAT"),
+            "keyframe_days": os.getenv("STORAGE.KEYFRAME_DAYS")
+        }),
+        "backfill": _drop_unset({
+            "queue": os.getenv("BACKFILL.QUEUE"),
+            "enqueue": os.getenv("BACKFILL.ENQUEUE"),
+            "item_days": os.getenv("BACKFILL.ITEM_DAYS"),
+            "workers": os.getenv("BACKFILL.WORKERS"),
+            "lease_seconds": os.getenv("BACKFILL.LEASE_SECONDS"),
+            "heartbeat_seconds": os.getenv("BACKFILL.HEARTBEAT_SECONDS"),
+            "max_attempts": os.getenv("BACKFILL.MAX_ATTEMPTS"),
+            "poll_seconds": os.getenv("BACKFILL.POLL_SECONDS")
+        }),
+        "partitions": _drop_unset({
+            "managed": os.getenv("PARTITIONS.MANAGED"),
+            "interval": os.getenv("PARTITIONS.INTERVAL"),
+            "start_date": os.getenv("PARTITIONS.START_DATE"),
+            "future_periods": os.getenv("PARTITIONS.FUTURE_PERIODS")
+        }),
+        "sqlite": _drop_unset({
+            "path": os.getenv("SQLITE.PATH"),
+            "cache_size_kb": os.getenv("SQLITE.CACHE_SIZE_KB"),
+            "busy_timeout_ms": os.getenv("SQLITE.BUSY_TIMEOUT_MS"),
+            "synchronous": os.getenv("SQLITE.SYNCHRONOUS")
+        }),
+        "postgres": _drop_unset({
             "host": os.getenv("POSTGRES.HOST"),
-            "port": int(os.getenv("POSTGRES.PORT")),
+            "port": os.getenv("POSTGRES.PORT"),
             "database": os.getenv("POSTGRES.DATABASE"),
             "username": os.getenv("POSTGRES.USERNAME"),
-            "password": os.getenv("POSTGRES.PASSWORD")
-        }
+            "password": os.getenv("POSTGRES.PASSWORD"),
+            "pool_size": os.getenv("POSTGRES.POOL_SIZE"),
+            "pool_timeout": os.getenv("POSTGRES.POOL_TIMEOUT"),
+            "max_overflow": os.getenv("POSTGRES.MAX_OVERFLOW"),
+            "pool_pre_ping": os.getenv("POSTGRES.POOL_PRE_PING"),
+            "pool_recycle": os.getenv("POSTGRES.POOL_RECYCLE"),
+            "statement_cache_size": os.getenv("POSTGRES.STATEMENT_CACHE_SIZE")
+        })
     }
+    # Only validate postgres settings when some were provided, SQLite runs need none.
+    if len(raw_config["postgres"]) == 0:
+        raw_config.pop("postgres")
+    return raw_config
 
 def get_environment_config() -> dict:
     raw_config: dict = _build_raw_config()
@@ -3,13 +3,307 @@ from enum import Enum
 class PostgresSelectQuery(Enum):
 
     COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE = "SELECT COUNT(date) FROM dbo.exchange_rates WHERE date = :date AND source = :source"
+    SELECT_EXCHANGE_RATE_DATES_BY_SOURCE_BASE_AND_RANGE = "SELECT date FROM dbo.exchange_rates WHERE source = :source AND base = :base AND date BETWEEN :start_date AND :end_date"
+    SELECT_MISSING_EXCHANGE_RATE_DATES = (
+        "SELECT CAST(d AS DATE) AS date "
+        "FROM generate_series(CAST(:start_date AS DATE), CAST(:end_date AS DATE), INTERVAL '1 day') AS d "
+        "WHERE NOT EXISTS (SELECT 1 FROM dbo.exchange_rates er "
+        "WHERE er.date = CAST(d AS DATE) AND er.source = :source AND er.base = :base) "
+        "ORDER BY 1"
+    )
+    SELECT_LATEST_EXCHANGE_RATE_ON_OR_BEFORE = "SELECT date, rates, source, base FROM dbo.exchange_rates WHERE source = :source AND base = :base AND date <= :on_date AND date >= :earliest_date ORDER BY date DESC LIMIT 1"
+    SELECT_EXCHANGE_RATES_BY_SOURCE_AND_RANGE = "SELECT date, rates, source, base FROM dbo.exchange_rates WHERE source = :source AND date BETWEEN :start_date AND :end_date ORDER BY date, base"
 
     def __str__(self):
         return self.value
     
 class PostgresDMLQuery(Enum):
 
-    INSERT_EXCHANGE_RATE = "INSERT INTO dbo.exchange_rates (date, rates, source) VALUES (:date, :rates, :source)"
+    INSERT_EXCHANGE_RATE = "INSERT INTO dbo.exchange_rates (date, rates, source, base) VALUES (:date, :rates, :source, :base)"
+    # `{values}` is expanded to one "(:date_N, :rates_N, :source_N, :base_N)" group per row.
+    INSERT_EXCHANGE_RATES_MULTI_ROW = "INSERT INTO dbo.exchange_rates (date, rates, source, base) VALUES {values}"
+    UPSERT_EXCHANGE_RATES_DO_NOTHING = "INSERT INTO dbo.exchange_rates (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO NOTHING"
+    UPSERT_EXCHANGE_RATES_DO_UPDATE = "INSERT INTO dbo.exchange_rates (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO UPDATE SET rates = EXCLUDED.rates"
+    # Recomputes the rollups of every :period overlapping [:start_date, :end_date) from the raw rows.
+    REFRESH_EXCHANGE_RATE_ROLLUPS = (
+        "INSERT INTO dbo.exchange_rate_rollups "
+        "(period, period_start, source, base, currency, open_rate, high_rate, low_rate, close_rate, mean_rate, sample_count) "
+        "SELECT :period, CAST(date_trunc(:period, CAST(er.date AS TIMESTAMP)) AS DATE) AS period_start, er.source, er.base, kv.key, "
+        "(array_agg(CAST(kv.value AS DOUBLE PRECISION) ORDER BY er.date ASC))[1], "
+        "MAX(CAST(kv.value AS DOUBLE PRECISION)), "
+        "MIN(CAST(kv.value AS DOUBLE PRECISION)), "
+        "(array_agg(CAST(kv.value AS DOUBLE PRECISION) ORDER BY er.date DESC))[1], "
+        "AVG(CAST(kv.value AS DOUBLE PRECISION)), "
+        "COUNT(*) "
+        "FROM dbo.exchange_rates er CROSS JOIN LATERAL jsonb_each_text(er.rates) AS kv "
+        "WHERE er.source = :source AND er.base = :base AND er.date >= :start_date AND er.date < :end_date "
+        "GROUP BY period_start, er.source, er.base, kv.key "
+        "ON CONFLICT (period, period_start, source, base, currency) DO UPDATE SET "
+        "open_rate = EXCLUDED.open_rate, high_rate = EXCLUDED.high_rate, low_rate = EXCLUDED.low_rate, "
+        "close_rate = EXCLUDED.close_rate, mean_rate = EXCLUDED.mean_rate, sample_count = EXCLUDED.sample_count"
+    )
 
     def __str__(self):
-        return self.value
\ No newline at end of file
+        return self.value
+
+class PostgresDDLQuery(Enum):
+
+    CREATE_DBO_SCHEMA = "CREATE SCHEMA IF NOT EXISTS dbo"
+    # Range partitioned by date, partitions are created by src.database.Schema.
+    CREATE_EXCHANGE_RATES_TABLE = "CREATE TABLE IF NOT EXISTS dbo.exchange_rates (id BIGSERIAL NOT NULL, date DATE NOT NULL, rates JSONB NOT NULL, source VARCHAR(18) NOT NULL, base VARCHAR(3) NOT NULL DEFAULT 'USD') PARTITION BY RANGE (date)"
+    # Required by the ON CONFLICT (date, source, base) upserts.
+    CREATE_EXCHANGE_RATES_DATE_SOURCE_BASE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ux_exchange_rates_date_source_base ON dbo.exchange_rates (date, source, base)"
+    CREATE_EXCHANGE_RATES_DATE_BRIN_INDEX = "CREATE INDEX IF NOT EXISTS ix_exchange_rates_date_brin ON dbo.exchange_rates USING BRIN (date)"
+    # STORAGE.FORMAT=ARRAY tables, the array position of a rate is its currency id.
+    CREATE_CURRENCY_CODES_TABLE = "CREATE TABLE IF NOT EXISTS dbo.currency_codes (id SMALLINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, code VARCHAR(8) NOT NULL UNIQUE)"
+    CREATE_EXCHANGE_RATE_ARRAYS_TABLE = "CREATE TABLE IF NOT EXISTS dbo.exchange_rate_arrays (date DATE NOT NULL, source VARCHAR(18) NOT NULL, base VARCHAR(3) NOT NULL, rates DOUBLE PRECISION[] NOT NULL)"
+    CREATE_EXCHANGE_RATE_ARRAYS_DATE_SOURCE_BASE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ux_exchange_rate_arrays_date_source_base ON dbo.exchange_rate_arrays (date, source, base)"
+    # STORAGE.FORMAT=DELTA table, a keyframe holds the full array and a delta the changed positions only.
+    CREATE_EXCHANGE_RATE_DELTAS_TABLE = "CREATE TABLE IF NOT EXISTS dbo.exchange_rate_deltas (date DATE NOT NULL, source VARCHAR(18) NOT NULL, base VARCHAR(3) NOT NULL, keyframe BOOLEAN NOT NULL, positions SMALLINT[], rates DOUBLE PRECISION[] NOT NULL)"
+    CREATE_EXCHANGE_RATE_DELTAS_DATE_SOURCE_BASE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ux_exchange_rate_deltas_date_source_base ON dbo.exchange_rate_deltas (date, source, base)"
+    CREATE_EXCHANGE_RATE_ROLLUPS_TABLE = (
+        "CREATE TABLE IF NOT EXISTS dbo.exchange_rate_rollups ("
+        "period VARCHAR(5) NOT NULL, period_start DATE NOT NULL, source VARCHAR(18) NOT NULL, "
+        "base VARCHAR(3) NOT NULL, currency VARCHAR(8) NOT NULL, "
+        "open_rate DOUBLE PRECISION NOT NULL, high_rate DOUBLE PRECISION NOT NULL, "
+        "low_rate DOUBLE PRECISION NOT NULL, close_rate DOUBLE PRECISION NOT NULL, "
+        "mean_rate DOUBLE PRECISION NOT NULL, sample_count INTEGER NOT NULL, "
+        "PRIMARY KEY (period, period_start, source, base, currency))"
+    )
+    # Distributed HISTORICAL backfills, see PostgresWorkQueueQuery.
+    CREATE_BACKFILL_WORK_ITEMS_TABLE = (
+        "CREATE TABLE IF NOT EXISTS dbo.backfill_work_items ("
+        "id BIGSERIAL PRIMARY KEY, queue VARCHAR(64) NOT NULL, "
+        "start_date DATE NOT NULL, end_date DATE NOT NULL, "
+        "status VARCHAR(8) NOT NULL DEFAULT 'PENDING', attempts INTEGER NOT NULL DEFAULT 0, "
+        "worker VARCHAR(128), lease_expires_at TIMESTAMPTZ, last_error TEXT, rows_written INTEGER, "
+        "created_at TIMESTAMPTZ NOT NULL DEFAULT now(), finished_at TIMESTAMPTZ, "
+        "UNIQUE (queue, start_date, end_date))"
+    )
+    CREATE_BACKFILL_WORK_ITEMS_CLAIM_INDEX = "CREATE INDEX IF NOT EXISTS ix_backfill_work_items_claim ON dbo.backfill_work_items (queue, status, start_date)"
+
+    def __str__(self):
+        return self.value
+
+
+class PostgresArraySelectQuery(Enum):
+
+    COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE = "SELECT COUNT(date) FROM dbo.exchange_rate_arrays WHERE date = :date AND source = :source"
+    SELECT_EXCHANGE_RATE_DATES_BY_SOURCE_BASE_AND_RANGE = "SELECT date FROM dbo.exchange_rate_arrays WHERE source = :source AND base = :base AND date BETWEEN :start_date AND :end_date"
+    SELECT_MISSING_EXCHANGE_RATE_DATES = (
+        "SELECT CAST(d AS DATE) AS date "
+        "FROM generate_series(CAST(:start_date AS DATE), CAST(:end_date AS DATE), INTERVAL '1 day') AS d "
+        "WHERE NOT EXISTS (SELECT 1 FROM dbo.exchange_rate_arrays er "
+        "WHERE er.date = CAST(d AS DATE) AND er.source = :source AND er.base = :base) "
+        "ORDER BY 1"
+    )
+    SELECT_LATEST_EXCHANGE_RATE_ON_OR_BEFORE = "SELECT date, rates, source, base FROM dbo.exchange_rate_arrays WHERE source = :source AND base = :base AND date <= :on_date AND date >= :earliest_date ORDER BY date DESC LIMIT 1"
+    SELECT_EXCHANGE_RATES_BY_SOURCE_AND_RANGE = "SELECT date, rates, source, base FROM dbo.exchange_rate_arrays WHERE source = :source AND date BETWEEN :start_date AND :end_date ORDER BY date, base"
+    SELECT_CURRENCY_CODES = "SELECT id, code FROM dbo.currency_codes ORDER BY id"
+
+    def __str__(self):
+        return self.value
+
+class PostgresArrayDMLQuery(Enum):
+
+    # :rates is a Postgres array literal such as '{1.0,NULL,0.92}'.
+    INSERT_EXCHANGE_RATE = "INSERT INTO dbo.exchange_rate_arrays (date, rates, source, base) VALUES (:date, :rates, :source, :base)"
+    INSERT_EXCHANGE_RATES_MULTI_ROW = "INSERT INTO dbo.exchange_rate_arrays (date, rates, source, base) VALUES {values}"
+    UPSERT_EXCHANGE_RATES_DO_NOTHING = "INSERT INTO dbo.exchange_rate_arrays (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO NOTHING"
+    UPSERT_EXCHANGE_RATES_DO_UPDATE = "INSERT INTO dbo.exchange_rate_arrays (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO UPDATE SET rates = EXCLUDED.rates"
+    # `{values}` is expanded to one "(:code_N)" group per new currency code.
+    INSERT_CURRENCY_CODES = "INSERT INTO dbo.currency_codes (code) VALUES {values} ON CONFLICT (code) DO NOTHING"
+    REFRESH_EXCHANGE_RATE_ROLLUPS = (
+        "INSERT INTO dbo.exchange_rate_rollups "
+        "(period, period_start, source, base, currency, open_rate, high_rate, low_rate, close_rate, mean_rate, sample_count) "
+        "SELECT :period, CAST(date_trunc(:period, CAST(er.date AS TIMESTAMP)) AS DATE) AS period_start, er.source, er.base, cc.code, "
+        "(array_agg(kv.value ORDER BY er.date ASC))[1], "
+        "MAX(kv.value), "
+        "MIN(kv.value), "
+        "(array_agg(kv.value ORDER BY er.date DESC))[1], "
+        "AVG(kv.value), "
+        "COUNT(*) "
+        "FROM dbo.exchange_rate_arrays er CROSS JOIN LATERAL unnest(er.rates) WITH ORDINALITY AS kv(value, position) "
+        "JOIN dbo.currency_codes cc ON cc.id = kv.position "
+        "WHERE er.source = :source AND er.base = :base AND er.date >= :start_date AND er.date < :end_date "
+        "AND kv.value IS NOT NULL "
+        "GROUP BY period_start, er.source, er.base, cc.code "
+        "ON CONFLICT (period, period_start, source, base, currency) DO UPDATE SET "
+        "open_rate = EXCLUDED.open_rate, high_rate = EXCLUDED.high_rate, low_rate = EXCLUDED.low_rate, "
+        "close_rate = EXCLUDED.close_rate, mean_rate = EXCLUDED.mean_rate, sample_count = EXCLUDED.sample_count"
+    )
+
+    def __str__(self):
+        return self.value
+
+class PostgresDeltaSelectQuery(Enum):
+
+    COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE = "SELECT COUNT(date) FROM dbo.exchange_rate_deltas WHERE date = :date AND source = :source"
+    SELECT_EXCHANGE_RATE_DATES_BY_SOURCE_BASE_AND_RANGE = "SELECT date FROM dbo.exchange_rate_deltas WHERE source = :source AND base = :base AND date BETWEEN :start_date AND :end_date"
+    SELECT_MISSING_EXCHANGE_RATE_DATES = (
+        "SELECT CAST(d AS DATE) AS date "
+        "FROM generate_series(CAST(:start_date AS DATE), CAST(:end_date AS DATE), INTERVAL '1 day') AS d "
+        "WHERE NOT EXISTS (SELECT 1 FROM dbo.exchange_rate_deltas er "
+        "WHERE er.date = CAST(d AS DATE) AND er.source = :source AND er.base = :base) "
+        "ORDER BY 1"
+    )
+    # Chains are read from the start of a keyframe window so the first row is a keyframe.
+    SELECT_EXCHANGE_RATE_CHAIN_BY_SOURCE_BASE_AND_RANGE = "SELECT date, keyframe, positions, rates, source, base FROM dbo.exchange_rate_deltas WHERE source = :source AND base = :base AND date BETWEEN :start_date AND :end_date ORDER BY date"
+    SELECT_EXCHANGE_RATE_CHAINS_BY_SOURCE_AND_RANGE = "SELECT date, keyframe, positions, rates, source, base FROM dbo.exchange_rate_deltas WHERE source = :source AND date BETWEEN :start_date AND :end_date ORDER BY base, date"
+    SELECT_CURRENCY_CODES = "SELECT id, code FROM dbo.currency_codes ORDER BY id"
+    # Held until the writing transaction ends, so writers of one chain in any process take turns.
+    LOCK_EXCHANGE_RATE_CHAIN = "SELECT pg_advisory_xact_lock(hashtext('dbo.exchange_rate_deltas|' || :source || '|' || :base)) AS locked"
+
+    def __str__(self):
+        return self.value
+
+class PostgresDeltaDMLQuery(Enum):
+
+    # `{values}` is expanded to one "(:date_N, :keyframe_N, :positions_N, :rates_N, :source_N, :base_N)" group per row.
+    INSERT_EXCHANGE_RATES_MULTI_ROW = "INSERT INTO dbo.exchange_rate_deltas (date, keyframe, positions, rates, source, base) VALUES {values}"
+    UPSERT_EXCHANGE_RATES_DO_NOTHING = "INSERT INTO dbo.exchange_rate_deltas (date, keyframe, positions, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO NOTHING"
+    UPSERT_EXCHANGE_RATES_DO_UPDATE = "INSERT INTO dbo.exchange_rate_deltas (date, keyframe, positions, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO UPDATE SET keyframe = EXCLUDED.keyframe, positions = EXCLUDED.positions, rates = EXCLUDED.rates"
+    # Re-encodes a stored day whose previous day changed.
+    UPDATE_EXCHANGE_RATE_DELTA = "UPDATE dbo.exchange_rate_deltas SET keyframe = :keyframe, positions = :positions, rates = :rates WHERE date = :date AND source = :source AND base = :base"
+    INSERT_CURRENCY_CODES = "INSERT INTO dbo.currency_codes (code) VALUES {values} ON CONFLICT (code) DO NOTHING"
+    # Rollups are aggregated from the reconstructed days, `{values}` holds one
+    # "(:period_N, :period_start_N, :source_N, :base_N, :currency_N, :open_N, :high_N, :low_N, :close_N, :mean_N, :count_N)" group per currency.
+    UPSERT_EXCHANGE_RATE_ROLLUPS = (
+        "INSERT INTO dbo.exchange_rate_rollups "
+        "(period, period_start, source, base, currency, open_rate, high_rate, low_rate, close_rate, mean_rate, sample_count) "
+        "VALUES {values} "
+        "ON CONFLICT (period, period_start, source, base, currency) DO UPDATE SET "
+        "open_rate = EXCLUDED.open_rate, high_rate = EXCLUDED.high_rate, low_rate = EXCLUDED.low_rate, "
+        "close_rate = EXCLUDED.close_rate, mean_rate = EXCLUDED.mean_rate, sample_count = EXCLUDED.sample_count"
+    )
+
+    def __str__(self):
+        return self.value
+
+class PostgresWorkQueueQuery(Enum):
+
+    # `{values}` is expanded to one "(:queue, :start_date_N, :end_date_N)" group per work item.
+    ENQUEUE_WORK_ITEMS = "INSERT INTO dbo.backfill_work_items (queue, start_date, end_date) VALUES {values} ON CONFLICT (queue, start_date, end_date) DO NOTHING"
+    # Expired leases past the attempt limit are failed instead of claimed again.
+    FAIL_EXHAUSTED_WORK_ITEMS = (
+        "UPDATE dbo.backfill_work_items SET status = 'FAILED', finished_at = now(), "
+        "last_error = COALESCE(last_error, 'Lease expired.') "
+        "WHERE queue = :queue AND status = 'CLAIMED' AND lease_expires_at < now() AND attempts >= :max_attempts"
+    )
+    # Takes the oldest pending item, or one whose lease expired, without
+    # waiting on the rows other workers are claiming.
+    CLAIM_WORK_ITEM = (
+        "UPDATE dbo.backfill_work_items w SET status = 'CLAIMED', worker = :worker, attempts = w.attempts + 1, "
+        "lease_expires_at = now() + CAST(:lease_seconds AS DOUBLE PRECISION) * INTERVAL '1 second' "
+        "FROM (SELECT id FROM dbo.backfill_work_items "
+        "WHERE queue = :queue AND attempts < :max_attempts "
+        "AND (status = 'PENDING' OR (status = 'CLAIMED' AND lease_expires_at < now())) "
+        "ORDER BY start_date LIMIT 1 FOR UPDATE SKIP LOCKED) claimable "
+        "WHERE w.id = claimable.id "
+        "RETURNING w.id, w.queue, w.start_date, w.end_date, w.attempts"
+    )
+    HEARTBEAT_WORK_ITEM = (
+        "UPDATE dbo.backfill_work_items "
+        "SET lease_expires_at = now() + CAST(:lease_seconds AS DOUBLE PRECISION) * INTERVAL '1 second' "
+        "WHERE id = :id AND worker = :worker AND status = 'CLAIMED'"
+    )
+    COMPLETE_WORK_ITEM = (
+        "UPDATE dbo.backfill_work_items SET status = 'DONE', finished_at = now(), lease_expires_at = NULL, "
+        "rows_written = :rows_written, last_error = NULL "
+        "WHERE id = :id AND worker = :worker AND status = 'CLAIMED'"
+    )
+    # Hands the item back for another worker, or fails it on the last attempt.
+    RELEASE_FAILED_WORK_ITEM = (
+        "UPDATE dbo.backfill_work_items SET lease_expires_at = NULL, last_error = :error, "
+        "status = CASE WHEN attempts >= :max_attempts THEN 'FAILED' ELSE 'PENDING' END, "
+        "finished_at = CASE WHEN attempts >= :max_attempts THEN now() END "
+        "WHERE id = :id AND worker = :worker AND status = 'CLAIMED'"
+    )
+    SELECT_WORK_ITEM_STATUS_COUNTS = (
+        "SELECT status, COUNT(*) AS count, "
+        "COUNT(*) FILTER (WHERE status = 'CLAIMED' AND lease_expires_at >= now()) AS leased "
+        "FROM dbo.backfill_work_items WHERE queue = :queue GROUP BY status"
+    )
+
+    def __str__(self):
+        return self.value
+
+class PostgresPartitionQuery(Enum):
+
+    # 'p' for the partitioned table, 'r' for a legacy heap table, no row when missing.
+    SELECT_EXCHANGE_RATES_TABLE_KIND = "SELECT c.relkind AS kind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace WHERE n.nspname = 'dbo' AND c.relname = 'exchange_rates'"
+    # `bound` reads "FOR VALUES FROM ('yyyy-mm-dd') TO ('yyyy-mm-dd')", or "DEFAULT".
+    SELECT_EXCHANGE_RATES_PARTITIONS = "SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'dbo.exchange_rates'::regclass"
+    SELECT_EXCHANGE_RATES_DATE_RANGE = "SELECT MIN(date) AS start_date, MAX(date) AS end_date FROM dbo.exchange_rates"
+    CREATE_EXCHANGE_RATES_PARTITION = "CREATE TABLE IF NOT EXISTS dbo.{partition} PARTITION OF dbo.exchange_rates FOR VALUES FROM ('{start_date}') TO ('{end_date}')"
+    RENAME_LEGACY_EXCHANGE_RATES_TABLE = "ALTER TABLE dbo.exchange_rates RENAME TO exchange_rates_legacy"
+    RENAME_LEGACY_EXCHANGE_RATES_INDEX = "ALTER INDEX IF EXISTS dbo.ux_exchange_rates_date_source_base RENAME TO ux_exchange_rates_legacy_date_source_base"
+    COPY_LEGACY_EXCHANGE_RATES = "INSERT INTO dbo.exchange_rates (date, rates, source, base) SELECT date, rates, source, base FROM dbo.exchange_rates_legacy ORDER BY date ON CONFLICT (date, source, base) DO NOTHING"
+
+    def __str__(self):
+        return self.value
+
+class SQLiteSelectQuery(Enum):
+
+    COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE = "SELECT COUNT(date) AS count FROM exchange_rates WHERE date = :date AND source = :source"
+    SELECT_EXCHANGE_RATE_DATES_BY_SOURCE_BASE_AND_RANGE = "SELECT date FROM exchange_rates WHERE source = :source AND base = :base AND date BETWEEN :start_date AND :end_date"
+    SELECT_MISSING_EXCHANGE_RATE_DATES = (
+        "WITH RECURSIVE days(d) AS ("
+        "SELECT date(:start_date) UNION ALL SELECT date(d, '+1 day') FROM days WHERE d < date(:end_date)) "
+        "SELECT d AS date FROM days "
+        "WHERE NOT EXISTS (SELECT 1 FROM exchange_rates er "
+        "WHERE er.date = days.d AND er.source = :source AND er.base = :base) "
+        "ORDER BY d"
+    )
+    SELECT_LATEST_EXCHANGE_RATE_ON_OR_BEFORE = "SELECT date, rates, source, base FROM exchange_rates WHERE source = :source AND base = :base AND date <= :on_date AND date >= :earliest_date ORDER BY date DESC LIMIT 1"
+    SELECT_EXCHANGE_RATES_BY_SOURCE_AND_RANGE = "SELECT date, rates, source, base FROM exchange_rates WHERE source = :source AND date BETWEEN :start_date AND :end_date ORDER BY date, base"
+
+    def __str__(self):
+        return self.value
+
+class SQLiteDMLQuery(Enum):
+
+    INSERT_EXCHANGE_RATE = "INSERT INTO exchange_rates (date, rates, source, base) VALUES (:date, :rates, :source, :base)"
+    INSERT_EXCHANGE_RATES_MULTI_ROW = "INSERT INTO exchange_rates (date, rates, source, base) VALUES {values}"
+    UPSERT_EXCHANGE_RATES_DO_NOTHING = "INSERT INTO exchange_rates (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO NOTHING"
+    UPSERT_EXCHANGE_RATES_DO_UPDATE = "INSERT INTO exchange_rates (date, rates, source, base) VALUES {values} ON CONFLICT (date, source, base) DO UPDATE SET rates = excluded.rates"
+    # SQLite has no array_agg, so open/close come from ranked rows. Weeks start on Monday.
+    REFRESH_EXCHANGE_RATE_ROLLUPS = (
+        "INSERT INTO exchange_rate_rollups "
+        "(period, period_start, source, base, currency, open_rate, high_rate, low_rate, close_rate, mean_rate, sample_count) "
+        "SELECT :period, period_start, source, base, currency, "
+        "MAX(CASE WHEN first_rank = 1 THEN rate END), MAX(rate), MIN(rate), "
+        "MAX(CASE WHEN last_rank = 1 THEN rate END), AVG(rate), COUNT(*) "
+        "FROM (SELECT flat.*, "
+        "ROW_NUMBER() OVER (PARTITION BY period_start, source, base, currency ORDER BY date ASC) AS first_rank, "
+        "ROW_NUMBER() OVER (PARTITION BY period_start, source, base, currency ORDER BY date DESC) AS last_rank "
+        "FROM (SELECT er.date, er.source, er.base, kv.key AS currency, CAST(kv.value AS REAL) AS rate, "
+        "CASE :period WHEN 'WEEK' THEN date(er.date, '-' || ((CAST(strftime('%w', er.date) AS INTEGER) + 6) % 7) || ' days') "
+        "ELSE date(er.date, 'start of month') END AS period_start "
+        "FROM exchange_rates er, json_each(er.rates) AS kv "
+        "WHERE er.source = :source AND er.base = :base AND er.date >= :start_date AND er.date < :end_date) AS flat) AS ranked "
+        "WHERE true "
+        "GROUP BY period_start, source, base, currency "
+        "ON CONFLICT (period, period_start, source, base, currency) DO UPDATE SET "
+        "open_rate = excluded.open_rate, high_rate = excluded.high_rate, low_rate = excluded.low_rate, "
+        "close_rate = excluded.close_rate, mean_rate = excluded.mean_rate, sample_count = excluded.sample_count"
+    )
+
+    def __str__(self):
+        return self.value
+
+class SQLiteDDLQuery(Enum):
+
+    CREATE_EXCHANGE_RATES_TABLE = "CREATE TABLE IF NOT EXISTS exchange_rates (id INTEGER PRIMARY KEY, date TEXT NOT NULL, rates TEXT NOT NULL, source VARCHAR(18) NOT NULL, base VARCHAR(3) NOT NULL DEFAULT 'USD')"
+    CREATE_EXCHANGE_RATES_DATE_SOURCE_BASE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS ux_exchange_rates_date_source_base ON exchange_rates (date, source, base)"
+    CREATE_EXCHANGE_RATE_ROLLUPS_TABLE = (
+        "CREATE TABLE IF NOT EXISTS exchange_rate_rollups ("
+        "period TEXT NOT NULL, period_start TEXT NOT NULL, source TEXT NOT NULL, "
+        "base TEXT NOT NULL, currency TEXT NOT NULL, "
+        "open_rate REAL NOT NULL, high_rate REAL NOT NULL, low_rate REAL NOT NULL, "
+        "close_rate REAL NOT NULL, mean_rate REAL NOT NULL, sample_count INTEGER NOT NULL, "
+        "PRIMARY KEY (period, period_start, source, base, currency))"
+    )
+
+    def __str__(self):
+        return self.value
@@ -0,0 +1,201 @@
+import re
+from datetime import date
+from logging import Logger
+from typing import Dict, List, Optional, Tuple
+
+from src.database import SQLDatabase
+from src.database.Queries import PostgresPartitionQuery
+from src.enums import PartitionInterval
+
+_PARTITION_BOUND = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+def apply_schema(sql_db: SQLDatabase):
+    '''
+    Runs every DDL statement of the database's dialect, in declaration order.
+    Statements are idempotent so this is safe on every start.
+    '''
+    sql_db.execute_batch(statements = [(query, None) for query in sql_db.ddl_queries])
+
+def _period_start(interval: PartitionInterval, day: date) -> date:
+    if interval == PartitionInterval.MONTH:
+        return date(day.year, day.month, 1)
+    return date(day.year, 1, 1)
+
+def _next_period(interval: PartitionInterval, period_start: date) -> date:
+    if interval == PartitionInterval.MONTH:
+        if period_start.month == 12:
+            return date(period_start.year + 1, 1, 1)
+        return date(period_start.year, period_start.month + 1, 1)
+    return date(period_start.year + 1, 1, 1)
+
+def _partition_name(interval: PartitionInterval, period_start: date) -> str:
+    if interval == PartitionInterval.MONTH:
+        return "exchange_rates_y{0:04d}m{1:02d}".format(period_start.year, period_start.month)
+    return "exchange_rates_y{0:04d}".format(period_start.year)
+
+def add_periods(interval: PartitionInterval, day: date, periods: int) -> date:
+    '''
+    Start of the period `periods` after the one holding `day`.
+    '''
+    period_start: date = _period_start(interval = interval, day = day)
+    for _ in range(periods):
+        period_start = _next_period(interval = interval, period_start = period_start)
+    return period_start
+
+def plan_partitions(
+    interval: PartitionInterval, start_date: date, end_date: date
+) -> List[Tuple[str, date, date]]:
+    '''
+    Responds with (name, start inclusive, end exclusive) for every partition
+    covering the inclusive date range.
+    '''
+    partitions: List[Tuple[str, date, date]] = []
+    period_start: date = _period_start(interval = interval, day = start_date)
+    while period_start <= end_date:
+        period_end: date = _next_period(interval = interval, period_start = period_start)
+        partitions.append((
+            _partition_name(interval = interval, period_start = period_start), period_start, period_end
+        ))
+        period_start = period_end
+    return partitions
+
+def _table_kind(sql_db: SQLDatabase) -> Optional[str]:
+    rows: List[dict] = sql_db.select(query = PostgresPartitionQuery.SELECT_EXCHANGE_RATES_TABLE_KIND)
+    return rows[0]["kind"] if len(rows) > 0 else None
+
+def _existing_partitions(sql_db: SQLDatabase) -> Dict[str, Tuple[date, date]]:
+    '''
+    Responds with the (start inclusive, end exclusive) bounds of every
+    range partition, by name.
+    '''
+    existing: Dict[str, Tuple[date, date]] = {}
+    for row in sql_db.select(query = PostgresPartitionQuery.SELECT_EXCHANGE_RATES_PARTITIONS):
+        match: Optional[re.Match] = _PARTITION_BOUND.search(row["bound"] or "")
+        if match != None:
+            existing[row["name"]] = (date.fromisoformat(match.group(1)), date.fromisoformat(match.group(2)))
+    return existing
+
+def _overlaps(bounds: Tuple[date, date], existing: Dict[str, Tuple[date, date]]) -> bool:
+    return any(start < bounds[1] and bounds[0] < end for start, end in existing.values())
+
+def _plan_missing_partitions(
+    interval: PartitionInterval, start_date: date, end_date: date, existing: Dict[str, Tuple[date, date]]
+) -> List[Tuple[str, date, date]]:
+    '''
+    Plans the partitions covering the inclusive range that do not exist yet,
+    matched by bounds rather than name. When PARTITIONS.INTERVAL changed, a
+    period overlapping partitions of the other interval is filled with month
+    partitions around them instead, as both intervals align on months.
+    '''
+    missing: List[Tuple[str, date, date]] = []
+    for name, period_start, period_end in plan_partitions(
+        interval = interval, start_date = start_date, end_date = end_date
+    ):
+        if name in existing:
+            continue
+        if not _overlaps(bounds = (period_start, period_end), existing = existing):
+            missing.append((name, period_start, period_end))
+            continue
+        for month_name, month_start, month_end in plan_partitions(
+            interval = PartitionInterval.MONTH,
+            start_date = period_start,
+            end_date = date.fromordinal(period_end.toordinal() - 1)
+        ):
+            if not _overlaps(bounds = (month_start, month_end), existing = existing):
+                missing.append((month_name, month_start, month_end))
+    return missing
+
+def _partition_statements(
+    interval: PartitionInterval, start_date: date, end_date: date, existing: Dict[str, Tuple[date, date]]
+) -> List[tuple]:
+    return [
+        (
+            str(PostgresPartitionQuery.CREATE_EXCHANGE_RATES_PARTITION).format(
+                partition = name,
+                start_date = period_start.isoformat(),
+                end_date = period_end.isoformat()
+            ),
+            None
+        ) for name, period_start, period_end in _plan_missing_partitions(
+            interval = interval, start_date = start_date, end_date = end_date, existing = existing
+        )
+    ]
+
+def ensure_partitions(
+    sql_db: SQLDatabase,
+    logger: Logger,
+    interval: PartitionInterval,
+    start_date: date,
+    end_date: date
+) -> int:
+    '''
+    Creates the missing partitions of the Postgres rates table for the
+    inclusive range, responding with how many were created. Does nothing on
+    SQLite or before the table was bootstrapped as a partitioned table.
+    '''
+    if sql_db.dialect != "postgres":
+        return 0
+    if _table_kind(sql_db = sql_db) != "p":
+        logger.warning("dbo.exchange_rates is not partitioned yet, run the BOOTSTRAP job to migrate it.")
+        return 0
+    existing: Dict[str, Tuple[date, date]] = _existing_partitions(sql_db = sql_db)
+    statements: List[tuple] = _partition_statements(
+        interval = interval, start_date = start_date, end_date = end_date, existing = existing
+    )
+    if len(statements) == 0:
+        return 0
+    sql_db.execute_batch(statements = statements)
+    logger.info("Created {0} exchange rate partitions between {1} and {2}.".format(
+        len(statements), start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    ))
+    return len(statements)
+
+def bootstrap_schema(
+    sql_db: SQLDatabase,
+    logger: Logger,
+    interval: PartitionInterval,
+    start_date: date,
+    end_date: date
+):
+    '''
+    Creates or migrates the schema in one transaction. On Postgres a legacy
+    heap `dbo.exchange_rates` is renamed to `dbo.exchange_rates_legacy`, the
+    partitioned table and its indexes are created, partitions are added from
+    `start_date` (or the oldest legacy row) through `end_date`, and the legacy
+    rows are copied across. The legacy table is kept for the operator to drop.
+    '''
+    if sql_db.dialect != "postgres":
+        apply_schema(sql_db = sql_db)
+        logger.info("Applied the {0} schema, partitioning only applies to Postgres.".format(sql_db.dialect))
+        return
+    statements: List[tuple] = []
+    kind: Optional[str] = _table_kind(sql_db = sql_db)
+    legacy: bool = kind == "r"
+    first_date: date = start_date
+    last_date: date = end_date
+    if legacy:
+        stored: dict = sql_db.select(query = PostgresPartitionQuery.SELECT_EXCHANGE_RATES_DATE_RANGE)[0]
+        if stored["start_date"] != None:
+            first_date = min(first_date, stored["start_date"])
+            last_date = max(last_date, stored["end_date"])
+        statements.append((PostgresPartitionQuery.RENAME_LEGACY_EXCHANGE_RATES_TABLE, None))
+        statements.append((PostgresPartitionQuery.RENAME_LEGACY_EXCHANGE_RATES_INDEX, None))
+    statements.extend((query, None) for query in sql_db.ddl_queries)
+    existing: Dict[str, Tuple[date, date]] = {}
+    if kind == "p":
+        existing = _existing_partitions(sql_db = sql_db)
+    partitions: List[tuple] = _partition_statements(
+        interval = interval, start_date = first_date, end_date = last_date, existing = existing
+    )
+    statements.extend(partitions)
+    if legacy:
+        statements.append((PostgresPartitionQuery.COPY_LEGACY_EXCHANGE_RATES, None))
+    sql_db.execute_batch(statements = statements)
+    logger.info("Schema bootstrapped with {0} new {1} partitions from {2} to {3}.".format(
+        len(partitions), interval.value.lower(), first_date.strftime("%Y-%m-%d"), last_date.strftime("%Y-%m-%d")
+    ))
+    if legacy:
+        logger.warning(
+            "Migrated dbo.exchange_rates into the partitioned table, the original rows "
+            "remain in dbo.exchange_rates_legacy and can be dropped once verified."
+        )
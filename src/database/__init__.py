@@ -1,9 +1,22 @@
+import os
 import sqlalchemy
+import threading
 from abc import ABCMeta, abstractclassmethod
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Union, List
+from datetime import date, datetime
+from enum import Enum
+from typing import Callable, Iterator, Type, Union, List, Tuple
 
-from src.database.Queries import PostgresSelectQuery, PostgresDMLQuery
+from src.metrics import metrics
+from src.database.Queries import (
+    PostgresSelectQuery, 
+    PostgresDMLQuery, 
+    PostgresDDLQuery,
+    SQLiteSelectQuery,
+    SQLiteDMLQuery,
+    SQLiteDDLQuery
+)
 
 @dataclass
 class SQLConnectionDetails:
@@ -14,26 +27,181 @@ class SQLConnectionDetails:
     password: str
     pool_size: int = 5
     pool_timeout: int = 30
+    max_overflow: int = 10
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    query_cache_size: int = 500
+
+@dataclass
+class SQLiteConnectionDetails:
+    path: str
+    cache_size_kb: int = 65536
+    busy_timeout_ms: int = 5000
+    synchronous: str = "NORMAL"
+    query_cache_size: int = 500
+
+def _query_label(query) -> str:
+    """
+    Metric label for a statement: the query enum member name, or `text`
+    for ad hoc SQL strings.
+    """
+    return query.name if isinstance(query, Enum) else "text"
+
+class SQLTransaction:
+    """
+    Statements sent on one connection inside one open transaction, see
+    `SQLDatabase.transaction`.
+    """
+    def __init__(self, conn: sqlalchemy.Connection, bind_args: Callable[[dict], dict]):
+        self._conn = conn
+        self._bind_args = bind_args
+        self.affected: int = 0
+
+    def execute(self, query: Union[Enum, str], args: dict = None) -> int:
+        result: sqlalchemy.CursorResult = self._conn.execute(
+            statement = sqlalchemy.sql.text(str(query)),
+            parameters = self._bind_args(args)
+        )
+        self.affected = self.affected + max(result.rowcount, 0)
+        return result.rowcount
+
+    def select(self, query: Union[Enum, str], args: dict = None) -> List[dict]:
+        results: sqlalchemy.CursorResult = self._conn.execute(
+            statement = sqlalchemy.sql.text(str(query)),
+            parameters = self._bind_args(args)
+        )
+        return [row._mapping for row in results]
 
 class SQLDatabase(metaclass=ABCMeta):
+    # Metric label identifying the backend.
+    dialect: str = None
+    # Dialect specific query sets, members share names across dialects.
+    select_queries: Type[Enum] = None
+    dml_queries: Type[Enum] = None
+    ddl_queries: Type[Enum] = None
+
     def __init__(self, connection_details = SQLConnectionDetails):
         self._conn_details = connection_details
+        self._engine: sqlalchemy.Engine = None
+        self._engine_lock = threading.Lock()
 
     @abstractclassmethod
     def _build_connection_string(self) -> str:
         pass
 
     @abstractclassmethod
-    def get_engine(self) -> sqlalchemy.Engine:
-        pass
-    
-    @abstractclassmethod
-    def execute(self, query: str, args: dict = None):
+    def _create_engine(self) -> sqlalchemy.Engine:
         pass
 
-    @abstractclassmethod
-    def select(self, query: str, args: dict = None) -> List[dict]:
-        pass
+    def _bind_args(self, args: dict) -> dict:
+        """
+        Converts the query arguments to what the driver binds, unchanged
+        unless a dialect needs otherwise.
+        """
+        return args
+
+    def get_engine(self) -> sqlalchemy.Engine:
+        """
+        Responds with the SQLAlchemy Engine object targeted at the injected
+        database connection details. The engine and its connection pool are
+        created on first use and reused for the life of this object.
+        """
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    with metrics.timed("db_engine_create_seconds", dialect = self.dialect):
+                        self._engine = self._create_engine()
+        return self._engine
+
+    def dispose(self):
+        """
+        Closes every pooled connection and drops the engine. A later query
+        will build a fresh engine.
+        """
+        with self._engine_lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+    def execute(self, query: Union[Enum, str], args: dict = None) -> int:
+        """
+        Performs the provided INSERT/UPDATE/DELETE/STORED PROCEDURE query
+        on the injected database connection detials. Responds with the
+        number of rows affected.
+        """
+        engine: sqlalchemy.Engine = self.get_engine()
+        with metrics.timed("db_query_seconds", dialect = self.dialect, operation = "execute", query = _query_label(query)):
+            with engine.connect() as conn:
+                result: sqlalchemy.CursorResult = conn.execute(
+                    statement = sqlalchemy.sql.text(str(query)),
+                    parameters = self._bind_args(args)
+                )
+                conn.commit()
+        metrics.increment("db_rows_affected_total", max(result.rowcount, 0), dialect = self.dialect)
+        return result.rowcount
+
+    def execute_batch(self, statements: List[Tuple[Union[Enum, str], dict]]) -> int:
+        """
+        Performs every (query, args) pair inside a single transaction,
+        responding with the total number of rows affected. Statements that
+        report no row count (-1) add nothing.
+        """
+        engine: sqlalchemy.Engine = self.get_engine()
+        affected: int = 0
+        with metrics.timed("db_query_seconds", dialect = self.dialect, operation = "execute_batch", query = "batch"):
+            with engine.begin() as conn:
+                for query, args in statements:
+                    result: sqlalchemy.CursorResult = conn.execute(
+                        statement = sqlalchemy.sql.text(str(query)),
+                        parameters = self._bind_args(args)
+                    )
+                    affected = affected + max(result.rowcount, 0)
+        metrics.increment("db_rows_affected_total", affected, dialect = self.dialect)
+        return affected
+
+    def execute_returning(self, query: Union[Enum, str], args: dict = None) -> List[dict]:
+        """
+        Performs an INSERT/UPDATE/DELETE ... RETURNING query and commits it,
+        responding with the returned rows.
+        """
+        engine: sqlalchemy.Engine = self.get_engine()
+        with metrics.timed("db_query_seconds", dialect = self.dialect, operation = "execute_returning", query = _query_label(query)):
+            with engine.begin() as conn:
+                results: sqlalchemy.CursorResult = conn.execute(
+                    statement = sqlalchemy.sql.text(str(query)),
+                    parameters = self._bind_args(args)
+                )
+                rows: List[dict] = [row._mapping for row in results]
+        metrics.increment("db_rows_affected_total", len(rows), dialect = self.dialect)
+        return rows
+
+    def select(self, query: Union[Enum, str], args: dict = None) -> List[dict]:
+        """
+        Performs the provide SELECT query on the injected database
+        connection details.
+        """
+        engine: sqlalchemy.Engine = self.get_engine()
+        with metrics.timed("db_query_seconds", dialect = self.dialect, operation = "select", query = _query_label(query)):
+            with engine.connect() as conn:
+                results: sqlalchemy.CursorResult = conn.execute(
+                    statement = sqlalchemy.sql.text(str(query)),
+                    parameters = self._bind_args(args)
+                )
+                return [row._mapping for row in results]
+
+    @contextmanager
+    def transaction(self) -> Iterator[SQLTransaction]:
+        """
+        Yields a `SQLTransaction` for reads and writes that must see and
+        change the same state, committed when the block exits and rolled
+        back when it raises.
+        """
+        engine: sqlalchemy.Engine = self.get_engine()
+        with metrics.timed("db_query_seconds", dialect = self.dialect, operation = "transaction", query = "transaction"):
+            with engine.begin() as conn:
+                tx = SQLTransaction(conn = conn, bind_args = self._bind_args)
+                yield tx
+        metrics.increment("db_rows_affected_total", tx.affected, dialect = self.dialect)
 
 class PostgresEngineCreateError(Exception):
     """
@@ -47,11 +215,16 @@ class PostgresEngineCreateError(Exception):
         ))
 
 class PostgresDatabase(SQLDatabase):
+    dialect = "postgres"
+    select_queries = PostgresSelectQuery
+    dml_queries = PostgresDMLQuery
+    ddl_queries = PostgresDDLQuery
+
     def __init__(self, connection_details: SQLConnectionDetails):
         super().__init__(connection_details = connection_details)
 
     def _build_connection_string(self) -> str:
-        return "postgresql://{0}:{1}@{2}:{3}/{4}".format(
+        return "postgresql+psycopg2://{0}:{1}@{2}:{3}/{4}".format(
             self._conn_details.username,
             self._conn_details.password,
             self._conn_details.host,
@@ -59,11 +232,7 @@ class PostgresDatabase(SQLDatabase):
             self._conn_details.database
         )
 
-    def get_engine(self) -> sqlalchemy.Engine:
-        """
-        Responds with a SQLAlchemy Engine object targeted at the injected
-        database connection details.
-        """
+    def _create_engine(self) -> sqlalchemy.Engine:
         url = self._build_connection_string()
         try:
             # Documentation Reference:
@@ -71,7 +240,11 @@ class PostgresDatabase(SQLDatabase):
             engine = sqlalchemy.create_engine(
                 url = url,
                 pool_size = self._conn_details.pool_size,
-                pool_timeout = self._conn_details.pool_timeout
+                pool_timeout = self._conn_details.pool_timeout,
+                max_overflow = self._conn_details.max_overflow,
+                pool_pre_ping = self._conn_details.pool_pre_ping,
+                pool_recycle = self._conn_details.pool_recycle,
+                query_cache_size = self._conn_details.query_cache_size
             )
             return engine
         except Exception as create_engine_err:
@@ -81,28 +254,69 @@ class PostgresDatabase(SQLDatabase):
                 user = self._conn_details.username
             )
 
-    def execute(self, query: Union[PostgresDMLQuery, str], args: dict = None):
-        """
-        Performs the provided INSERT/UPDATE/DELETE/STORED PROCEDURE query
-        on the injected database connection detials.
-        """
-        engine: sqlalchemy.Engine = self.get_engine()
-        with engine.connect() as conn:
-            conn.execute(
-                statement = sqlalchemy.sql.text(str(query)),
-                parameters = args
-            )
-            conn.commit()
+class SQLiteEngineCreateError(Exception):
+    """
+    When the SQLAlchemy create_engine function fails to build
+    an object for a SQLite database file.
+    """
+    def __init__(self, message: str, path: str):
+        super().__init__(
+            "Failed to create SQLAlchemy engine for [SQLite: {0}]. {1}".format(
+                path, message
+        ))
 
-    def select(self, query: Union[PostgresSelectQuery, str], args: dict = None) -> List[dict]:
-        """
-        Performs the provide SELECT query on the injected database
-        connection details.
-        """
-        engine: sqlalchemy.Engine = self.get_engine()
-        with engine.connect() as conn:
-            results: sqlalchemy.CursorResult = conn.execute(
-                statement = sqlalchemy.sql.text(str(query)),
-                parameters = args
+class SQLiteDatabase(SQLDatabase):
+    """
+    Embedded database for edge deployments and integration runs. Connections
+    use WAL journaling and a tuned page cache; dates are bound as ISO strings.
+    """
+    dialect = "sqlite"
+    select_queries = SQLiteSelectQuery
+    dml_queries = SQLiteDMLQuery
+    ddl_queries = SQLiteDDLQuery
+
+    def __init__(self, connection_details: SQLiteConnectionDetails):
+        super().__init__(connection_details = connection_details)
+
+    def _build_connection_string(self) -> str:
+        return "sqlite:///{0}".format(self._conn_details.path)
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = {0}".format(self._conn_details.synchronous))
+        # A negative cache_size is a budget in KiB rather than pages.
+        cursor.execute("PRAGMA cache_size = -{0}".format(int(self._conn_details.cache_size_kb)))
+        cursor.execute("PRAGMA busy_timeout = {0}".format(int(self._conn_details.busy_timeout_ms)))
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.close()
+
+    def _create_engine(self) -> sqlalchemy.Engine:
+        url = self._build_connection_string()
+        try:
+            directory = os.path.dirname(self._conn_details.path)
+            if directory != "" and self._conn_details.path != ":memory:":
+                os.makedirs(directory, exist_ok = True)
+            engine = sqlalchemy.create_engine(
+                url = url,
+                query_cache_size = self._conn_details.query_cache_size
             )
-            return [row._mapping for row in results]
\ No newline at end of file
+            sqlalchemy.event.listen(engine, "connect", self._apply_pragmas)
+            return engine
+        except Exception as create_engine_err:
+            raise SQLiteEngineCreateError(
+                message = create_engine_err.args,
+                path = self._conn_details.path
+            )
+
+    def _bind_args(self, args: dict) -> dict:
+        if args == None:
+            return None
+        bound: dict = {}
+        for key, value in args.items():
+            if isinstance(value, datetime):
+                value = value.isoformat(sep = " ")
+            elif isinstance(value, date):
+                value = value.isoformat()
+            bound[key] = value
+        return bound
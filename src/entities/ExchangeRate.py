@@ -5,4 +5,5 @@ from dataclasses import dataclass
 class ExchangeRate:
     date: date
     rates: dict
-    source: str
\ No newline at end of file
+    source: str
+    base: str
\ No newline at end of file
@@ -0,0 +1,9 @@
+from datetime import date
+from dataclasses import dataclass
+
+@dataclass
+class FailedWindow:
+    start_date: date
+    end_date: date
+    error: str
+    failed_at: str
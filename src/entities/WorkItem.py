@@ -0,0 +1,10 @@
+from datetime import date
+from dataclasses import dataclass
+
+@dataclass
+class WorkItem:
+    id: int
+    queue: str
+    start_date: date
+    end_date: date
+    attempts: int
@@ -1,5 +1,66 @@
 from enum import Enum
 
+class BaseCurrency(Enum):
+    '''
+    Availiable currency types to use as a base for `ExchangeRateHost` base currency.
+    '''
+    USD = "USD"
+    CAD = "CAD"
+    JPY = "JPY"
+    GBP = "GBP"
+
 class JobType(Enum):
     HISTORICAL = "HISTORICAL"
-    NIGHTLY = "NIGHTLY"
\ No newline at end of file
+    NIGHTLY = "NIGHTLY"
+    DAEMON = "DAEMON"
+    CATCHUP = "CATCHUP"
+    BOOTSTRAP = "BOOTSTRAP"
+    BACKFILL = "BACKFILL"
+
+class RateProvider(Enum):
+    '''
+    Rate sources known to the provider registry, the value is stored as the
+    `source` of every rate row the provider supplied.
+    '''
+    EXCHANGE_RATE_HOST = "EXCHANGE_RATE_HOST"
+    FRANKFURTER = "FRANKFURTER"
+
+class DatabaseDialect(Enum):
+    POSTGRES = "POSTGRES"
+    SQLITE = "SQLITE"
+
+class StorageFormat(Enum):
+    '''
+    How the daily rate tables are stored: one JSONB object per row, a
+    DOUBLE PRECISION[] ordered by the currency code dictionary, or only the
+    currencies changed since the previous day with periodic keyframes.
+    '''
+    JSON = "JSON"
+    ARRAY = "ARRAY"
+    DELTA = "DELTA"
+
+class PartitionInterval(Enum):
+    '''
+    Date span covered by each partition of the Postgres rates table.
+    '''
+    YEAR = "YEAR"
+    MONTH = "MONTH"
+
+class ConflictAction(Enum):
+    '''
+    What a bulk insert does when a (date, source, base) row already exists.
+    '''
+    NOTHING = "NOTHING"
+    UPDATE = "UPDATE"
+
+class RollupPeriod(Enum):
+    '''
+    Period granularities maintained in the rate rollup table.
+    '''
+    WEEK = "WEEK"
+    MONTH = "MONTH"
+
+class ProfileMode(Enum):
+    NONE = "NONE"
+    CPROFILE = "CPROFILE"
+    SAMPLING = "SAMPLING"
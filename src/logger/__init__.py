@@ -2,14 +2,19 @@ import logging
 import sys
 import json
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List, Optional, Tuple
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
 
         extra = getattr(record, "__dict__", {})
         json_record = {
-            "Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            # The record's own timestamp, not the time the listener thread formats it.
+            "Time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)),
             "Level": getattr(record, "levelname", None),
             "File": getattr(record, "pathname", None),
             "Line": getattr(record, "lineno", None),
@@ -17,8 +22,15 @@ class JsonFormatter(logging.Formatter):
             "additional_detail": extra.get("additional_detail"),
         }
         return json.dumps(json_record)
-    
-class StandardOutColorFormatter(logging.Formatter):    
+
+class StandardOutColorFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__()
+        self._formatters: dict = {
+            level: logging.Formatter(log_fmt) for level, log_fmt in self._get_formats().items()
+        }
+        self._default_formatter = self._formatters[logging.INFO]
+
     def _get_formats(self) -> dict:
         grey = "\x1b[38;20m"
         yellow = "\x1b[33;20m"
@@ -27,7 +39,7 @@ class StandardOutColorFormatter(logging.Formatter):
         pink = '\x1b[35m'
         blue = '\x1b[34m'
         reset = "\x1b[0m"
-        format = "[%(levelname)s | %(asctime)s] %(message)s" 
+        format = "[%(levelname)s | %(asctime)s] %(message)s"
         FORMATS = {
             logging.DEBUG: blue + format + reset,
             logging.INFO: blue + format + reset,
@@ -39,9 +51,91 @@ class StandardOutColorFormatter(logging.Formatter):
         return FORMATS
 
     def format(self, record):
-        log_fmt = self._get_formats().get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        return self._formatters.get(record.levelno, self._default_formatter).format(record)
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    '''
+    Size rotated file handler that flushes every `flush_records` records or
+    once `flush_interval` seconds have passed, rather than after every record.
+    Records at `flush_level` or above are flushed straight away. A timer
+    flushes the tail of a burst when no further record arrives.
+    '''
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        flush_records: int = 1,
+        flush_interval: float = 0.0,
+        flush_level: int = logging.ERROR
+    ):
+        super().__init__(
+            filename = filename,
+            maxBytes = max_bytes,
+            backupCount = backup_count,
+            encoding = "utf-8"
+        )
+        self._flush_records = max(1, flush_records)
+        self._flush_interval = flush_interval
+        self._flush_level = flush_level
+        self._pending: int = 0
+        self._last_flush: float = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+
+    def _schedule_flush(self):
+        if self._flush_interval <= 0 or self._flush_timer != None:
+            return
+        delay: float = max(0.0, self._flush_interval - (time.monotonic() - self._last_flush))
+        self._flush_timer = threading.Timer(delay, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            line: str = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + len(line) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(line)
+            self._pending = self._pending + 1
+            if (
+                self._pending >= self._flush_records
+                or record.levelno >= self._flush_level
+                or time.monotonic() - self._last_flush >= self._flush_interval
+            ):
+                self.flush()
+            else:
+                self._schedule_flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        # Also called from the timer thread, so state changes under the handler lock.
+        self.acquire()
+        try:
+            super().flush()
+            self._pending = 0
+            self._last_flush = time.monotonic()
+            if self._flush_timer != None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        finally:
+            self.release()
+
+    def close(self):
+        self.acquire()
+        try:
+            if self._flush_timer != None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        finally:
+            self.release()
+        super().close()
 
 def build_stdout_logging_handler() -> logging.StreamHandler:
     formatter = StandardOutColorFormatter()
@@ -49,9 +143,40 @@ def build_stdout_logging_handler() -> logging.StreamHandler:
     stdout_handler.setFormatter(formatter)
     return stdout_handler
 
-def build_json_logging_handler(file_name: str) -> logging.FileHandler:
+def build_json_logging_handler(
+    file_name: str,
+    max_bytes: int = 0,
+    backup_count: int = 0,
+    flush_records: int = 1,
+    flush_interval: float = 0.0
+) -> logging.FileHandler:
     formatter = JsonFormatter()
     os.makedirs(os.path.dirname(file_name), exist_ok=True)
-    json_handler = logging.FileHandler(filename = file_name)
+    json_handler = BatchedRotatingFileHandler(
+        filename = file_name,
+        max_bytes = max_bytes,
+        backup_count = backup_count,
+        flush_records = flush_records,
+        flush_interval = flush_interval
+    )
     json_handler.setFormatter(formatter)
-    return json_handler
\ No newline at end of file
+    return json_handler
+
+def build_queue_logging_handler(
+    handlers: List[logging.Handler]
+) -> Tuple[QueueHandler, QueueListener]:
+    '''
+    Puts `handlers` behind an unbounded queue served by a background thread,
+    so callers only pay for enqueueing a record. Stop the listener with
+    `stop_queue_logging` to drain the queue before exiting.
+    '''
+    record_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(record_queue, *handlers, respect_handler_level = True)
+    listener.start()
+    return QueueHandler(record_queue), listener
+
+def stop_queue_logging(listener: QueueListener):
+    listener.stop()
+    for handler in listener.handlers:
+        handler.flush()
+        handler.close()
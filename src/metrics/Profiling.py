@@ -0,0 +1,87 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from src.enums import ProfileMode
+
+class SamplingProfiler:
+    '''
+    Low overhead profiler that records the stack of every thread each
+    `interval` seconds and writes them as collapsed stacks, the input format
+    of flamegraph.pl and speedscope.
+    '''
+    def __init__(self, interval: float = 0.005):
+        self._interval = interval
+        self._samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = "sampling-profiler", daemon = True)
+
+    def _collapse(self, frame) -> str:
+        names: List[str] = []
+        while frame != None:
+            code = frame.f_code
+            names.append("{0} ({1}:{2})".format(
+                code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+            ))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        own_id: int = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self._samples[self._collapse(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, "w") as stacks_file:
+            for stack, count in self._samples.most_common():
+                stacks_file.write("{0} {1}\n".format(stack, count))
+
+@contextmanager
+def profiled(mode: ProfileMode, directory: str, interval: float = 0.005) -> Iterator[None]:
+    '''
+    Runs the block under the chosen profiler and dumps the results into
+    `directory`: a `.prof` file plus a text top list for cProfile, collapsed
+    stacks for the sampling profiler. `ProfileMode.NONE` adds no overhead.
+    '''
+    if mode == ProfileMode.NONE:
+        yield
+        return
+    os.makedirs(directory, exist_ok = True)
+    stamp: str = time.strftime("%Y%m%dT%H%M%S")
+    if mode == ProfileMode.CPROFILE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, "profile-{0}.prof".format(stamp)))
+            report = io.StringIO()
+            pstats.Stats(profiler, stream = report).sort_stats("cumulative").print_stats(50)
+            with open(os.path.join(directory, "profile-{0}.txt".format(stamp)), "w") as report_file:
+                report_file.write(report.getvalue())
+        return
+    sampler = SamplingProfiler(interval = interval)
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        sampler.write(os.path.join(directory, "profile-{0}.collapsed".format(stamp)))
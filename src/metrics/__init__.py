@@ -0,0 +1,220 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Latency buckets in seconds, from a cached lookup up to a slow /timeseries call.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((str(key), str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(
+        '{0}="{1}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"')) for key, value in pairs
+    ) + "}"
+
+class Histogram:
+    '''
+    Cumulative bucket histogram of observed values for one label set.
+    '''
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count = self.count + 1
+        self.sum = self.sum + value
+        self.min = value if self.min == None else min(self.min, value)
+        self.max = value if self.max == None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        '''
+        Upper bound of the bucket holding the q-th observation, capped at the
+        largest value seen.
+        '''
+        if self.count == 0:
+            return None
+        rank: float = q * self.count
+        seen: int = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen = seen + bucket_count
+            if seen >= rank:
+                bound: float = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(bound, self.max)
+        return self.max
+
+class MetricsRegistry:
+    '''
+    Thread safe store of counters, gauges and latency histograms keyed by
+    metric name and labels, exported as a Prometheus textfile or a JSON
+    summary.
+    '''
+    def __init__(self, prefix: str = "exchange_rates"):
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key: LabelKey = _label_key(labels)
+        with self._lock:
+            series: Dict[LabelKey, float] = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        '''
+        Records the current value of a gauge, replacing the previous one.
+        '''
+        key: LabelKey = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key: LabelKey = _label_key(labels)
+        with self._lock:
+            series: Dict[LabelKey, Histogram] = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timed(self, name: str, **labels) -> Iterator[dict]:
+        '''
+        Observes the wall time of the block in seconds. Labels can be added
+        to the yielded dict inside the block, e.g. a response status.
+        '''
+        started: float = time.perf_counter()
+        block_labels: dict = dict(labels)
+        try:
+            yield block_labels
+        except BaseException:
+            block_labels.setdefault("outcome", "error")
+            raise
+        finally:
+            block_labels.setdefault("outcome", "ok")
+            self.observe(name, time.perf_counter() - started, **block_labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def summary(self) -> dict:
+        with self._lock:
+            counters: dict = {
+                name: [{ "labels": dict(key), "value": value } for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            gauges: dict = {
+                name: [{ "labels": dict(key), "value": value } for key, value in series.items()]
+                for name, series in self._gauges.items()
+            }
+            histograms: dict = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "mean": round(histogram.sum / histogram.count, 6) if histogram.count > 0 else None,
+                        "min": histogram.min,
+                        "max": histogram.max,
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "p99": histogram.quantile(0.99)
+                    } for key, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return { "counters": counters, "gauges": gauges, "histograms": histograms }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric: str = "{0}_{1}".format(self._prefix, name)
+                if name in self._help:
+                    lines.append("# HELP {0} {1}".format(metric, self._help[name]))
+                lines.append("# TYPE {0} counter".format(metric))
+                for key, value in sorted(series.items()):
+                    lines.append("{0}{1} {2}".format(metric, _format_labels(key), value))
+            for name, series in sorted(self._gauges.items()):
+                metric = "{0}_{1}".format(self._prefix, name)
+                if name in self._help:
+                    lines.append("# HELP {0} {1}".format(metric, self._help[name]))
+                lines.append("# TYPE {0} gauge".format(metric))
+                for key, value in sorted(series.items()):
+                    lines.append("{0}{1} {2}".format(metric, _format_labels(key), value))
+            for name, series in sorted(self._histograms.items()):
+                metric = "{0}_{1}".format(self._prefix, name)
+                if name in self._help:
+                    lines.append("# HELP {0} {1}".format(metric, self._help[name]))
+                lines.append("# TYPE {0} histogram".format(metric))
+                for key, histogram in sorted(series.items()):
+                    cumulative: int = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative = cumulative + bucket_count
+                        lines.append("{0}_bucket{1} {2}".format(
+                            metric, _format_labels(key, (("le", repr(bound)),)), cumulative
+                        ))
+                    lines.append("{0}_bucket{1} {2}".format(
+                        metric, _format_labels(key, (("le", "+Inf"),)), histogram.count
+                    ))
+                    lines.append("{0}_sum{1} {2}".format(metric, _format_labels(key), histogram.sum))
+                    lines.append("{0}_count{1} {2}".format(metric, _format_labels(key), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def _write_atomic(self, path: str, body: str):
+        '''
+        The node_exporter textfile collector may read at any moment, so the
+        file is written aside and renamed into place.
+        '''
+        directory: str = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok = True)
+        temp_path: str = path + ".tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(body)
+        os.replace(temp_path, path)
+
+    def write_prometheus_textfile(self, path: str):
+        self._write_atomic(path = path, body = self.render_prometheus())
+
+    def write_json_summary(self, path: str):
+        self._write_atomic(path = path, body = json.dumps(self.summary(), indent = 2) + "\n")
+
+# Process wide registry shared by the client, database and services.
+metrics = MetricsRegistry()
+metrics.describe("http_request_seconds", "Latency of rate provider requests, including retried attempts.")
+metrics.describe("http_requests_total", "Rate provider responses by endpoint and status code.")
+metrics.describe("http_retries_total", "Rate provider attempts that were retried.")
+metrics.describe("http_response_bytes_total", "Response body bytes received from rate providers.")
+metrics.describe("concurrency_limit", "Current adaptive concurrency limit per rate provider.")
+metrics.describe("hedged_requests_total", "Requests sent to a further provider because the previous one was slow.")
+metrics.describe("provider_answers_total", "Hedged requests answered, by winning provider.")
+metrics.describe("db_query_seconds", "Latency of database statements by operation.")
+metrics.describe("db_rows_affected_total", "Rows affected by database writes.")
+metrics.describe("db_engine_create_seconds", "Time spent building the SQLAlchemy engine.")
+metrics.describe("stage_seconds", "Latency of collector service stages.")
+metrics.describe("rows_written_total", "Exchange rate rows written by the collector services.")
@@ -0,0 +1,86 @@
+import json
+import threading
+from typing import Dict, List, Optional, Set
+
+from src.database import SQLDatabase
+from src.database.Queries import PostgresArrayDMLQuery, PostgresArraySelectQuery
+from src.entities.ExchangeRate import ExchangeRate
+from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+
+class ArrayStorageDialectError(Exception):
+    def __init__(self, dialect: str):
+        '''
+        Raised when array storage is requested on a database without array columns.
+        '''
+        super().__init__("Array rate storage requires Postgres, the database dialect is '{0}'.".format(dialect))
+
+class ExchangeRateArrayRepo(ExchangeRateRepo):
+    '''
+    Stores each day's rates as one DOUBLE PRECISION[] in
+    `dbo.exchange_rate_arrays`, ordered by the ids of the `dbo.currency_codes`
+    dictionary, instead of a JSONB object repeating every currency code. A
+    currency absent on a day is a NULL element. New codes are added to the
+    dictionary once per write batch, reads decode back into `ExchangeRate`.
+    '''
+    def __init__(self, sql_db: SQLDatabase):
+        if sql_db.dialect != "postgres":
+            raise ArrayStorageDialectError(dialect = sql_db.dialect)
+        super().__init__(sql_db = sql_db)
+        self.select_queries = PostgresArraySelectQuery
+        self.dml_queries = PostgresArrayDMLQuery
+        self._codes_lock = threading.Lock()
+        # Array position (currency id - 1) to code, and code to position.
+        self._codes: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+
+    def _load_codes(self):
+        rows: List[dict] = self._db.select(query = self.select_queries.SELECT_CURRENCY_CODES)
+        codes: List[Optional[str]] = [None] * (rows[-1]["id"] if len(rows) > 0 else 0)
+        for row in rows:
+            codes[row["id"] - 1] = row["code"]
+        self._codes = codes
+        self._positions = { code: position for position, code in enumerate(codes) if code != None }
+
+    def _prepare_rates(self, entities: List[ExchangeRate]):
+        '''
+        Adds every currency code of the batch that is not in the dictionary
+        yet, in one statement, then reloads the dictionary.
+        '''
+        with self._codes_lock:
+            unknown: Set[str] = {
+                code for entity in entities for code in entity.rates.keys()
+            } - self._positions.keys()
+            if len(unknown) == 0:
+                return
+            self._load_codes()
+            unknown = unknown - self._positions.keys()
+            if len(unknown) > 0:
+                new_codes: List[str] = sorted(unknown)
+                self._db.execute(
+                    query = str(self.dml_queries.INSERT_CURRENCY_CODES).format(
+                        values = ", ".join(f"(:code_{index})" for index in range(len(new_codes)))
+                    ),
+                    args = { f"code_{index}": code for index, code in enumerate(new_codes) }
+                )
+                self._load_codes()
+
+    def _array_literal(self, values: List[Optional[float]]) -> str:
+        '''
+        Postgres array literal of the values. The C json encoder writes the
+        floats, shortest round trip form as repr would.
+        '''
+        return "{" + json.dumps(values, separators = (",", ":"))[1:-1].replace("null", "NULL") + "}"
+
+    def _encode_rates(self, rates: dict) -> str:
+        values: List[Optional[float]] = list(map(rates.get, self._codes))
+        while len(values) > 0 and values[-1] == None:
+            values.pop()
+        return self._array_literal(values = values)
+
+    def _decode_rates(self, value: List[Optional[float]]) -> dict:
+        if len(value) > len(self._codes):
+            with self._codes_lock:
+                self._load_codes()
+        return {
+            self._codes[position]: rate for position, rate in enumerate(value) if rate != None
+        }
@@ -0,0 +1,411 @@
+import threading
+import numpy as np
+from datetime import date, timedelta
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.database import SQLDatabase, SQLTransaction
+from src.database.Errors import DatabaseQueryError
+from src.database.Queries import PostgresDeltaDMLQuery, PostgresDeltaSelectQuery
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import ConflictAction, RollupPeriod
+from src.repositories.ExchangeRateArrayRepo import ExchangeRateArrayRepo
+from src.repositories.ExchangeRateRepo import _as_date
+from src.repositories.ExchangeRateRollupRepo import IExchangeRateRollupRepo
+
+# (keyframe, positions, rates) of one stored day, positions is None on keyframes.
+DeltaRow = Tuple[bool, Optional[List[int]], List[Optional[float]]]
+
+class BrokenDeltaChainError(Exception):
+    def __init__(self, for_date: date, source: str, base: str):
+        '''
+        Raised when a delta row has no keyframe before it in its window.
+        '''
+        super().__init__("No keyframe precedes the {0} {1} rates of {2}.".format(
+            source, base, for_date.strftime("%Y-%m-%d")
+        ))
+
+class ExchangeRateDeltaRepo(ExchangeRateArrayRepo):
+    '''
+    Stores each day in `dbo.exchange_rate_deltas` as the currencies that
+    changed since the previous stored day, keyed by the `dbo.currency_codes`
+    dictionary. A day without changes (weekends, market holidays) is an empty
+    row. Dates are split in fixed windows of `keyframe_days`, the first stored
+    day of each window is a keyframe holding every rate, so any day is rebuilt
+    from at most `keyframe_days` rows. Writing a day re-encodes the stored day
+    after it when that one was a delta against an older day. Each chain is
+    read, planned and written under a transaction scoped advisory lock, so
+    writers in other processes never encode against a stale chain.
+    '''
+    def __init__(self, sql_db: SQLDatabase, keyframe_days: int = 28):
+        if keyframe_days < 1:
+            raise ValueError("keyframe_days must be a positive integer")
+        super().__init__(sql_db = sql_db)
+        self.select_queries = PostgresDeltaSelectQuery
+        self.dml_queries = PostgresDeltaDMLQuery
+        self._keyframe_days = keyframe_days
+        # Deltas depend on the stored previous day, writes are serialized
+        # here and, across processes, by the chain's advisory lock.
+        self._write_lock = threading.Lock()
+
+    def _window_start(self, day: date) -> date:
+        ordinal: int = day.toordinal()
+        return date.fromordinal(ordinal - ordinal % self._keyframe_days)
+
+    def _window_end(self, day: date) -> date:
+        return self._window_start(day = day) + timedelta(days = self._keyframe_days - 1)
+
+    def _vector(self, rates: dict, codes: List[Optional[str]]) -> np.ndarray:
+        '''
+        Rates in dictionary order, NaN where a currency is absent.
+        '''
+        return np.fromiter(
+            (rates.get(code, np.nan) for code in codes), dtype = np.float64, count = len(codes)
+        )
+
+    def _rates_dict(self, state: np.ndarray, codes: List[Optional[str]]) -> dict:
+        values: List[float] = state.tolist()
+        return { codes[position]: values[position] for position in np.flatnonzero(~np.isnan(state)).tolist() }
+
+    def _encode_delta(self, previous: Optional[np.ndarray], current: np.ndarray) -> DeltaRow:
+        '''
+        Keyframe when there is no previous day in the window, else the
+        positions (currency ids) whose rate differs, compared across the
+        whole currency axis at once. A currency that disappeared is a NULL.
+        '''
+        if previous is None:
+            present: np.ndarray = np.flatnonzero(~np.isnan(current))
+            values: List[float] = current[:present[-1] + 1].tolist() if len(present) > 0 else []
+            return True, None, [None if value != value else value for value in values]
+        same: np.ndarray = (previous == current) | (np.isnan(previous) & np.isnan(current))
+        changed: np.ndarray = np.flatnonzero(~same)
+        return (
+            False,
+            (changed + 1).tolist(),
+            [None if value != value else value for value in current[changed].tolist()]
+        )
+
+    def _ensure_codes(self, rows: List[dict]) -> List[Optional[str]]:
+        '''
+        Reloads the dictionary when a stored row references a currency id
+        added by another process, responding with the codes to decode with.
+        '''
+        needed: int = 0
+        for row in rows:
+            if row["keyframe"]:
+                needed = max(needed, len(row["rates"]))
+            elif len(row["positions"]) > 0:
+                needed = max(needed, max(row["positions"]))
+        if needed > len(self._codes):
+            with self._codes_lock:
+                self._load_codes()
+        return self._codes
+
+    def _reconstruct(
+        self, rows: List[dict], codes: List[Optional[str]]
+    ) -> Iterator[Tuple[dict, np.ndarray]]:
+        '''
+        Replays rows ordered by base then date, yielding every row with its
+        full rate vector.
+        '''
+        state: Optional[np.ndarray] = None
+        chain: Optional[tuple] = None
+        for row in rows:
+            if (row["source"], row["base"]) != chain:
+                chain = (row["source"], row["base"])
+                state = None
+            if row["keyframe"]:
+                state = np.full(len(codes), np.nan)
+                state[:len(row["rates"])] = np.array(row["rates"], dtype = np.float64)
+            elif state is None:
+                raise BrokenDeltaChainError(for_date = _as_date(row["date"]), source = row["source"], base = row["base"])
+            elif len(row["positions"]) > 0:
+                state = state.copy()
+                state[np.array(row["positions"]) - 1] = np.array(row["rates"], dtype = np.float64)
+            yield row, state
+
+    def _select_chain(
+        self, source: str, base: str, start_date: date, end_date: date, tx: Optional[SQLTransaction] = None
+    ) -> List[dict]:
+        return (tx or self._db).select(
+            query = self.select_queries.SELECT_EXCHANGE_RATE_CHAIN_BY_SOURCE_BASE_AND_RANGE,
+            args = {
+                "start_date": self._window_start(day = start_date),
+                "end_date": end_date,
+                "source": source,
+                "base": base
+            }
+        )
+
+    def _plan_chain(
+        self,
+        tx: SQLTransaction,
+        source: str,
+        base: str,
+        days: Dict[date, dict],
+        on_conflict: Optional[ConflictAction]
+    ) -> Tuple[List[tuple], List[tuple], int]:
+        '''
+        Encodes the new days of one (source, base) against the stored windows
+        they fall in, read inside `tx`. Responds with the rows to insert, the
+        stored rows whose encoding changed, and how many of the new days are
+        written.
+        '''
+        rows: List[dict] = self._select_chain(
+            source = source,
+            base = base,
+            start_date = min(days),
+            end_date = self._window_end(day = max(days)),
+            tx = tx
+        )
+        codes: List[Optional[str]] = self._ensure_codes(rows = rows)
+        stored: Dict[date, DeltaRow] = {}
+        merged: Dict[date, np.ndarray] = {}
+        for row, state in self._reconstruct(rows = rows, codes = codes):
+            day: date = _as_date(row["date"])
+            stored[day] = (row["keyframe"], row["positions"], row["rates"])
+            merged[day] = state
+        written: Set[date] = set()
+        for day, rates in days.items():
+            if day in stored and on_conflict == ConflictAction.NOTHING:
+                continue
+            merged[day] = self._vector(rates = rates, codes = codes)
+            written.add(day)
+        inserts: List[tuple] = []
+        updates: List[tuple] = []
+        previous: Optional[np.ndarray] = None
+        previous_window: Optional[date] = None
+        for day in sorted(merged):
+            window: date = self._window_start(day = day)
+            encoded: DeltaRow = self._encode_delta(
+                previous = previous if window == previous_window else None, current = merged[day]
+            )
+            previous, previous_window = merged[day], window
+            if day in written and (day not in stored or on_conflict == None):
+                # Without a conflict action a clashing day fails the write, as for the other formats.
+                inserts.append((day, source, base, encoded))
+            elif day in stored and encoded != stored[day]:
+                updates.append((day, source, base, encoded))
+        return inserts, updates, len(written)
+
+    def _delta_args(self, row: tuple, suffix: str = "") -> dict:
+        day, source, base, (keyframe, positions, rates) = row
+        return {
+            f"date{suffix}": day,
+            f"keyframe{suffix}": keyframe,
+            f"positions{suffix}": None if positions == None else "{" + ",".join(map(str, positions)) + "}",
+            f"rates{suffix}": self._array_literal(values = rates),
+            f"source{suffix}": source,
+            f"base{suffix}": base
+        }
+
+    def _build_delta_insert(self, batch: List[tuple], query: Enum) -> tuple:
+        groups: List[str] = []
+        args: dict = {}
+        for index, row in enumerate(batch):
+            groups.append(
+                f"(:date_{index}, :keyframe_{index}, :positions_{index}, :rates_{index}, :source_{index}, :base_{index})"
+            )
+            args.update(self._delta_args(row = row, suffix = f"_{index}"))
+        return query.value.format(values = ", ".join(groups)), args
+
+    def insert_exchange_rate(self, entity: ExchangeRate):
+        self.insert_exchange_rates(entities = [entity])
+
+    def insert_exchange_rates(
+        self,
+        entities: List[ExchangeRate],
+        batch_size: int = 500,
+        on_conflict: Optional[ConflictAction] = None
+    ) -> int:
+        '''
+        Encodes the entities against the stored days around them and writes
+        the new rows, plus the re-encoded stored rows that followed an inserted
+        or replaced day, in one transaction. Conflicts are resolved as for the
+        other formats. Returns the number of entities written.
+        '''
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        if len(entities) == 0:
+            return 0
+        query: Enum = self._resolve_insert_query(on_conflict = on_conflict)
+        with self._write_lock:
+            try:
+                self._prepare_rates(entities = entities)
+            except Exception as query_err:
+                raise DatabaseQueryError(query_err.args)
+            chains: Dict[Tuple[str, str], Dict[date, dict]] = {}
+            for entity in entities:
+                chains.setdefault((entity.source, entity.base), {})[_as_date(entity.date)] = entity.rates
+            written: int = 0
+            try:
+                with self._db.transaction() as tx:
+                    # Locked in a fixed order so two writers of the same chains cannot deadlock.
+                    for source, base in sorted(chains):
+                        tx.select(
+                            query = self.select_queries.LOCK_EXCHANGE_RATE_CHAIN,
+                            args = { "source": source, "base": base }
+                        )
+                    inserts: List[tuple] = []
+                    updates: List[tuple] = []
+                    for (source, base), days in chains.items():
+                        chain_inserts, chain_updates, chain_written = self._plan_chain(
+                            tx = tx, source = source, base = base, days = days, on_conflict = on_conflict
+                        )
+                        inserts.extend(chain_inserts)
+                        updates.extend(chain_updates)
+                        written = written + chain_written
+                    for offset in range(0, len(inserts), batch_size):
+                        insert_query, insert_args = self._build_delta_insert(
+                            batch = inserts[offset:offset + batch_size], query = query
+                        )
+                        tx.execute(query = insert_query, args = insert_args)
+                    for row in updates:
+                        tx.execute(query = self.dml_queries.UPDATE_EXCHANGE_RATE_DELTA, args = self._delta_args(row = row))
+            except BrokenDeltaChainError:
+                raise
+            except Exception as query_err:
+                raise DatabaseQueryError(query_err.args)
+            return written
+
+    def get_exchange_rates_between_for_base(
+        self, start_date: date, end_date: date, source: str, base: str
+    ) -> List[ExchangeRate]:
+        '''
+        Responds with the rebuilt rates of one base between `start_date` and
+        `end_date` (inclusive), ordered by date.
+        '''
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        try:
+            rows: List[dict] = self._select_chain(
+                source = source, base = base, start_date = start_date, end_date = end_date
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        codes: List[Optional[str]] = self._ensure_codes(rows = rows)
+        return [
+            self._delta_entity(row = row, state = state, codes = codes)
+            for row, state in self._reconstruct(rows = rows, codes = codes)
+            if _as_date(row["date"]) >= start_date
+        ]
+
+    def _delta_entity(self, row: dict, state: np.ndarray, codes: List[Optional[str]]) -> ExchangeRate:
+        return ExchangeRate(
+            date = _as_date(row["date"]),
+            rates = self._rates_dict(state = state, codes = codes),
+            source = row["source"],
+            base = row["base"]
+        )
+
+    def get_latest_on_or_before(
+        self, on_date: date, source: str, base: str, lookback_days: int = 7
+    ) -> Optional[ExchangeRate]:
+        on_date = _as_date(on_date)
+        earliest_date: date = on_date - timedelta(days = lookback_days)
+        try:
+            rows: List[dict] = self._select_chain(
+                source = source, base = base, start_date = earliest_date, end_date = on_date
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        if len(rows) == 0 or _as_date(rows[-1]["date"]) < earliest_date:
+            return None
+        codes: List[Optional[str]] = self._ensure_codes(rows = rows)
+        for row, state in self._reconstruct(rows = rows, codes = codes):
+            pass
+        return self._delta_entity(row = row, state = state, codes = codes)
+
+    def get_exchange_rates_between(
+        self, start_date: date, end_date: date, source: str
+    ) -> List[ExchangeRate]:
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        try:
+            rows: List[dict] = self._db.select(
+                query = self.select_queries.SELECT_EXCHANGE_RATE_CHAINS_BY_SOURCE_AND_RANGE,
+                args = {
+                    "start_date": self._window_start(day = start_date),
+                    "end_date": end_date,
+                    "source": source
+                }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        codes: List[Optional[str]] = self._ensure_codes(rows = rows)
+        entities: List[ExchangeRate] = [
+            self._delta_entity(row = row, state = state, codes = codes)
+            for row, state in self._reconstruct(rows = rows, codes = codes)
+            if _as_date(row["date"]) >= start_date
+        ]
+        entities.sort(key = lambda x: (x.date, x.base))
+        return entities
+
+def _period_start(value: date, period: RollupPeriod) -> date:
+    if period == RollupPeriod.WEEK:
+        return value - timedelta(days = value.weekday())
+    return value.replace(day = 1)
+
+class ExchangeRateDeltaRollupRepo(IExchangeRateRollupRepo):
+    '''
+    Rollups for delta storage, where SQL cannot aggregate the raw rows. The
+    days are rebuilt by the rate repo, aggregated per currency and upserted.
+    '''
+    def __init__(self, sql_db: SQLDatabase, rate_repo: ExchangeRateDeltaRepo):
+        self._db = sql_db
+        self._rate_repo = rate_repo
+
+    def _aggregate(
+        self, entities: List[ExchangeRate], period: RollupPeriod
+    ) -> Dict[Tuple[date, str], List[float]]:
+        '''
+        Rates of every (period start, currency) in date order.
+        '''
+        samples: Dict[Tuple[date, str], List[float]] = {}
+        for entity in entities:
+            start: date = _period_start(value = entity.date, period = period)
+            for currency, rate in entity.rates.items():
+                samples.setdefault((start, currency), []).append(rate)
+        return samples
+
+    def refresh_periods(
+        self, 
+        period: RollupPeriod, 
+        start_date: date, 
+        end_date: date, 
+        source: str, 
+        base: str
+    ) -> int:
+        entities: List[ExchangeRate] = self._rate_repo.get_exchange_rates_between_for_base(
+            start_date = start_date, end_date = end_date - timedelta(days = 1), source = source, base = base
+        )
+        samples: Dict[Tuple[date, str], List[float]] = self._aggregate(entities = entities, period = period)
+        if len(samples) == 0:
+            return 0
+        groups: List[str] = []
+        args: dict = {}
+        for index, ((start, currency), rates) in enumerate(samples.items()):
+            groups.append(
+                f"(:period_{index}, :period_start_{index}, :source_{index}, :base_{index}, :currency_{index}, "
+                f":open_{index}, :high_{index}, :low_{index}, :close_{index}, :mean_{index}, :count_{index})"
+            )
+            args.update({
+                f"period_{index}": period.value,
+                f"period_start_{index}": start,
+                f"source_{index}": source,
+                f"base_{index}": base,
+                f"currency_{index}": currency,
+                f"open_{index}": rates[0],
+                f"high_{index}": max(rates),
+                f"low_{index}": min(rates),
+                f"close_{index}": rates[-1],
+                f"mean_{index}": sum(rates) / len(rates),
+                f"count_{index}": len(rates)
+            })
+        try:
+            return self._db.execute(
+                query = str(self._rate_repo.dml_queries.UPSERT_EXCHANGE_RATE_ROLLUPS).format(
+                    values = ", ".join(groups)
+                ),
+                args = args
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
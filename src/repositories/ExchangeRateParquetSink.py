@@ -0,0 +1,102 @@
+import os
+import tempfile
+from datetime import date
+from typing import List
+
+from src.entities.ExchangeRate import ExchangeRate
+
+class ParquetDependencyError(Exception):
+    def __init__(self, message: str):
+        super().__init__(
+            "Parquet export requires the optional `pyarrow` package. {0}".format(message)
+        )
+
+def _import_pyarrow():
+    '''
+    pyarrow is only needed when the export is enabled, so it is imported on
+    demand rather than with the module.
+    '''
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as import_err:
+        raise ParquetDependencyError(import_err.args)
+    return pyarrow, pyarrow.parquet
+
+class ExchangeRateParquetSink:
+    '''
+    Writes stored rates as a long-format (date, base, currency, rate) Parquet
+    dataset laid out as `source=<source>/year=<yyyy>/month=<mm>/rates.parquet`.
+    Every write replaces one whole month partition.
+    '''
+    FILE_NAME: str = "rates.parquet"
+
+    def __init__(self, directory: str, compression: str = "zstd"):
+        self._pyarrow, self._parquet = _import_pyarrow()
+        self._directory = directory
+        self._compression = compression
+        self._schema = self._pyarrow.schema([
+            ("date", self._pyarrow.date32()),
+            ("base", self._pyarrow.string()),
+            ("currency", self._pyarrow.string()),
+            ("rate", self._pyarrow.float64())
+        ])
+
+    def partition_path(self, source: str, year: int, month: int) -> str:
+        return os.path.join(
+            self._directory,
+            "source={0}".format(source),
+            "year={0:04d}".format(year),
+            "month={0:02d}".format(month),
+            self.FILE_NAME
+        )
+
+    def _build_table(self, entities: List[ExchangeRate]):
+        dates: List[date] = []
+        bases: List[str] = []
+        currencies: List[str] = []
+        rates: List[float] = []
+        for entity in sorted(entities, key = lambda x: (x.date, x.base)):
+            for currency in sorted(entity.rates.keys()):
+                dates.append(entity.date)
+                bases.append(entity.base)
+                currencies.append(currency)
+                rates.append(float(entity.rates[currency]))
+        return self._pyarrow.table(
+            [dates, bases, currencies, rates],
+            schema = self._schema
+        )
+
+    def write_partition(
+        self, source: str, year: int, month: int, entities: List[ExchangeRate]
+    ) -> int:
+        '''
+        Replaces the month partition with `entities`, which must be every
+        stored row of that month for the source. The file is written next to
+        the partition and renamed over it so readers never see a partial file.
+        Responds with the number of rows written.
+        '''
+        path: str = self.partition_path(source = source, year = year, month = month)
+        if len(entities) == 0:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        table = self._build_table(entities = entities)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        descriptor, temp_path = tempfile.mkstemp(
+            prefix = ".rates-", suffix = ".parquet.tmp", dir = os.path.dirname(path)
+        )
+        os.close(descriptor)
+        try:
+            self._parquet.write_table(
+                table,
+                temp_path,
+                compression = self._compression,
+                use_dictionary = ["base", "currency"]
+            )
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return table.num_rows
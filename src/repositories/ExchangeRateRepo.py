@@ -1,18 +1,58 @@
 import json
 from abc import ABCMeta
-from typing import List
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import List, Optional, Set
 
 from src.database import SQLDatabase
 from src.database.Errors import DatabaseQueryError
-from src.database.Queries import PostgresDMLQuery, PostgresSelectQuery
 from src.entities.ExchangeRate import ExchangeRate
+from src.enums import ConflictAction
 
 
+def _as_date(value) -> date:
+    '''
+    Normalizes a date column value, SQLite responds with ISO strings.
+    '''
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
 class IExchangeRateRepo(metaclass = ABCMeta):
 
     def insert_exchange_rate(entity: ExchangeRate):
         pass
 
+    def insert_exchange_rates(
+        self, 
+        entities: List[ExchangeRate], 
+        batch_size: int, 
+        on_conflict: Optional[ConflictAction]
+    ) -> int:
+        pass
+
+    def get_existing_dates(
+        self, start_date: date, end_date: date, source: str, base: str
+    ) -> Set[date]:
+        pass
+
+    def get_missing_dates(
+        self, start_date: date, end_date: date, source: str, base: str
+    ) -> List[date]:
+        pass
+
+    def get_latest_on_or_before(
+        self, on_date: date, source: str, base: str, lookback_days: int
+    ) -> Optional[ExchangeRate]:
+        pass
+
+    def get_exchange_rates_between(
+        self, start_date: date, end_date: date, source: str
+    ) -> List[ExchangeRate]:
+        pass
+
     def if_exists_by_date_and_source() -> int:
         pass
 
@@ -20,20 +60,189 @@ class ExchangeRateRepo(IExchangeRateRepo):
     
     def __init__(self, sql_db: SQLDatabase):
         self._db = sql_db
+        # Storage formats with their own tables swap these for their query sets.
+        self.select_queries = sql_db.select_queries
+        self.dml_queries = sql_db.dml_queries
+
+    def _encode_rates(self, rates: dict):
+        return json.dumps(rates)
+
+    def _decode_rates(self, value) -> dict:
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    def _prepare_rates(self, entities: List[ExchangeRate]):
+        '''
+        Called once per write before any rates are encoded.
+        '''
+        pass
+
+    def _resolve_insert_query(self, on_conflict: Optional[ConflictAction]) -> Enum:
+        match on_conflict:
+            case ConflictAction.NOTHING:
+                return self.dml_queries.UPSERT_EXCHANGE_RATES_DO_NOTHING
+            case ConflictAction.UPDATE:
+                return self.dml_queries.UPSERT_EXCHANGE_RATES_DO_UPDATE
+            case _:
+                return self.dml_queries.INSERT_EXCHANGE_RATES_MULTI_ROW
+
+    def _build_multi_row_insert(
+        self, batch: List[ExchangeRate], query: Enum
+    ) -> tuple:
+        '''
+        Builds a single multi-row INSERT statement and its bind parameters
+        for the provided batch of entities.
+        '''
+        groups: List[str] = []
+        args: dict = {}
+        for index, entity in enumerate(batch):
+            groups.append(f"(:date_{index}, :rates_{index}, :source_{index}, :base_{index})")
+            args[f"date_{index}"] = entity.date
+            args[f"rates_{index}"] = self._encode_rates(entity.rates)
+            args[f"source_{index}"] = entity.source
+            args[f"base_{index}"] = entity.base
+        statement: str = query.value.format(values = ", ".join(groups))
+        return statement, args
 
     def insert_exchange_rate(self, entity: ExchangeRate):
         try:
+            self._prepare_rates(entities = [entity])
             self._db.execute(
-                query = PostgresDMLQuery.INSERT_EXCHANGE_RATE, 
-                args = { "date": entity.date, "source": entity.source, "rates": json.dumps(entity.rates) }
+                query = self.dml_queries.INSERT_EXCHANGE_RATE, 
+                args = { 
+                    "date": entity.date, 
+                    "source": entity.source, 
+                    "base": entity.base, 
+                    "rates": self._encode_rates(entity.rates) 
+                }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def insert_exchange_rates(
+        self, 
+        entities: List[ExchangeRate], 
+        batch_size: int = 500,
+        on_conflict: Optional[ConflictAction] = None
+    ) -> int:
+        '''
+        Writes the entities in batches of `batch_size`, each batch being a single
+        multi-row INSERT, and commits every batch in one transaction. With
+        `on_conflict` set rows clashing on (date, source, base) are skipped or
+        overwritten instead of failing the write. Returns the number of rows written.
+        '''
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        if len(entities) == 0:
+            return 0
+        query: Enum = self._resolve_insert_query(on_conflict = on_conflict)
+        try:
+            self._prepare_rates(entities = entities)
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        statements: List[tuple] = [
+            self._build_multi_row_insert(batch = entities[offset:offset + batch_size], query = query)
+            for offset in range(0, len(entities), batch_size)
+        ]
+        try:
+            return self._db.execute_batch(statements = statements)
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def get_existing_dates(
+        self, start_date: date, end_date: date, source: str, base: str
+    ) -> Set[date]:
+        '''
+        Responds with every date between `start_date` and `end_date` (inclusive)
+        already stored for the source and base currency, using a single query.
+        '''
+        try:
+            result: List[dict] = self._db.select(
+                query = self.select_queries.SELECT_EXCHANGE_RATE_DATES_BY_SOURCE_BASE_AND_RANGE,
+                args = { 
+                    "start_date": start_date, 
+                    "end_date": end_date, 
+                    "source": source, 
+                    "base": base 
+                }
+            )
+            return { _as_date(row.get("date")) for row in result }
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def get_missing_dates(
+        self, start_date: date, end_date: date, source: str, base: str
+    ) -> List[date]:
+        '''
+        Responds, in order, with every date between `start_date` and `end_date`
+        (inclusive) that has no stored rates for the source and base currency.
+        '''
+        try:
+            result: List[dict] = self._db.select(
+                query = self.select_queries.SELECT_MISSING_EXCHANGE_RATE_DATES,
+                args = { 
+                    "start_date": start_date, 
+                    "end_date": end_date, 
+                    "source": source, 
+                    "base": base 
+                }
+            )
+            return [_as_date(row.get("date")) for row in result]
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def _cast_entity(self, row: dict) -> ExchangeRate:
+        return ExchangeRate(
+            date = _as_date(row.get("date")),
+            rates = self._decode_rates(row.get("rates")),
+            source = row.get("source"),
+            base = row.get("base")
+        )
+
+    def get_latest_on_or_before(
+        self, on_date: date, source: str, base: str, lookback_days: int = 7
+    ) -> Optional[ExchangeRate]:
+        '''
+        Responds with the rates stored for `on_date`, or for the nearest prior
+        date within `lookback_days` (weekends, market holidays).
+        '''
+        try:
+            result: List[dict] = self._db.select(
+                query = self.select_queries.SELECT_LATEST_EXCHANGE_RATE_ON_OR_BEFORE,
+                args = {
+                    "on_date": on_date,
+                    "earliest_date": on_date - timedelta(days = lookback_days),
+                    "source": source,
+                    "base": base
+                }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        if len(result) == 0:
+            return None
+        return self._cast_entity(row = result[0])
+
+    def get_exchange_rates_between(
+        self, start_date: date, end_date: date, source: str
+    ) -> List[ExchangeRate]:
+        '''
+        Responds with the rates of every base stored for the source between
+        `start_date` and `end_date` (inclusive), ordered by date then base.
+        '''
+        try:
+            result: List[dict] = self._db.select(
+                query = self.select_queries.SELECT_EXCHANGE_RATES_BY_SOURCE_AND_RANGE,
+                args = { "start_date": start_date, "end_date": end_date, "source": source }
             )
         except Exception as query_err:
             raise DatabaseQueryError(query_err.args)
+        return [self._cast_entity(row = row) for row in result]
 
     def if_exists_by_date_and_source(self, date: str, source: str) -> int:
         try:
             result: List[dict] = self._db.select(
-                query = PostgresSelectQuery.COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE, 
+                query = self.select_queries.COUNT_EXCHANGE_RATE_BY_DATE_AND_SOURCE, 
                 args = { "date":  date, "source": source }
             )
             return result[0].get("count")
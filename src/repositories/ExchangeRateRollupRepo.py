@@ -0,0 +1,57 @@
+from abc import ABCMeta
+from datetime import date
+from enum import Enum
+from typing import Optional, Type
+
+from src.database import SQLDatabase
+from src.database.Errors import DatabaseQueryError
+from src.enums import RollupPeriod
+
+
+class IExchangeRateRollupRepo(metaclass = ABCMeta):
+
+    def refresh_periods(
+        self, 
+        period: RollupPeriod, 
+        start_date: date, 
+        end_date: date, 
+        source: str, 
+        base: str
+    ) -> int:
+        pass
+
+class ExchangeRateRollupRepo(IExchangeRateRollupRepo):
+
+    def __init__(self, sql_db: SQLDatabase, dml_queries: Optional[Type[Enum]] = None):
+        '''
+        `dml_queries` selects the raw rate table the rollups are read from,
+        the database's own query set by default.
+        '''
+        self._db = sql_db
+        self._dml_queries = dml_queries or sql_db.dml_queries
+
+    def refresh_periods(
+        self, 
+        period: RollupPeriod, 
+        start_date: date, 
+        end_date: date, 
+        source: str, 
+        base: str
+    ) -> int:
+        '''
+        Recomputes the rollups of `period` for raw rows dated from `start_date`
+        (inclusive) to `end_date` (exclusive). Both bounds must be period starts.
+        '''
+        try:
+            return self._db.execute(
+                query = self._dml_queries.REFRESH_EXCHANGE_RATE_ROLLUPS,
+                args = {
+                    "period": period.value,
+                    "start_date": start_date,
+                    "end_date": end_date,
+                    "source": source,
+                    "base": base
+                }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from logging import Logger
+from typing import List, Tuple
+
+from src.entities.FailedWindow import FailedWindow
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+class LoadCheckpointRepo:
+    '''
+    Durable progress of a historical load, kept as a JSON file: the inclusive
+    date ranges already saved, merged as they grow, and the windows that
+    failed on the last run. Every change is written next to the file and
+    renamed over it, so a crash leaves the previous checkpoint intact.
+    A checkpoint written for another `scope` (bases and sources) is ignored.
+    '''
+    VERSION: int = 1
+
+    def __init__(self, logger: Logger, path: str, scope: str):
+        self._logger = logger
+        self._path = path
+        self._scope = scope
+        self._lock = threading.Lock()
+        self._completed: List[Tuple[date, date]] = []
+        self._failed: List[FailedWindow] = []
+        self._load()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, "r", encoding = "utf-8") as checkpoint_file:
+            content: dict = json.load(checkpoint_file)
+        if content.get("version") != self.VERSION or content.get("scope") != self._scope:
+            self._logger.warning("Ignoring the checkpoint {0} written for {1}, this load is for {2}.".format(
+                self._path, content.get("scope"), self._scope
+            ))
+            return
+        self._completed = [
+            (date.fromisoformat(start_date), date.fromisoformat(end_date))
+            for start_date, end_date in content["completed"]
+        ]
+        self._failed = [
+            FailedWindow(
+                start_date = date.fromisoformat(x["start_date"]),
+                end_date = date.fromisoformat(x["end_date"]),
+                error = x["error"],
+                failed_at = x["failed_at"]
+            ) for x in content["failed"]
+        ]
+
+    def _save(self):
+        content: dict = {
+            "version": self.VERSION,
+            "scope": self._scope,
+            "completed": [[start_date.isoformat(), end_date.isoformat()] for start_date, end_date in self._completed],
+            "failed": [
+                {
+                    "start_date": x.start_date.isoformat(),
+                    "end_date": x.end_date.isoformat(),
+                    "error": x.error,
+                    "failed_at": x.failed_at
+                } for x in self._failed
+            ]
+        }
+        directory: str = os.path.dirname(self._path) or "."
+        os.makedirs(directory, exist_ok = True)
+        descriptor, temp_path = tempfile.mkstemp(prefix = ".checkpoint-", suffix = ".json.tmp", dir = directory)
+        try:
+            with os.fdopen(descriptor, "w", encoding = "utf-8") as temp_file:
+                json.dump(content, temp_file, indent = 2)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, self._path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def completed(self) -> List[Tuple[date, date]]:
+        with self._lock:
+            return list(self._completed)
+
+    def failed(self) -> List[FailedWindow]:
+        with self._lock:
+            return list(self._failed)
+
+    def mark_completed(self, start_date: date, end_date: date):
+        '''
+        Records the inclusive range as saved, merging it with the ranges it
+        overlaps or touches.
+        '''
+        start_date, end_date = _as_date(start_date), _as_date(end_date)
+        with self._lock:
+            merged: List[Tuple[date, date]] = []
+            for stored_start, stored_end in sorted(self._completed + [(start_date, end_date)]):
+                if len(merged) > 0 and stored_start <= merged[-1][1] + timedelta(days = 1):
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], stored_end))
+                else:
+                    merged.append((stored_start, stored_end))
+            self._completed = merged
+            self._save()
+
+    def record_failures(self, failed: List[FailedWindow]):
+        '''
+        Replaces the failed windows with those of the run that just ended.
+        '''
+        with self._lock:
+            self._failed = list(failed)
+            self._save()
+
+    def clear(self):
+        '''
+        Removes the checkpoint once the whole load succeeded.
+        '''
+        with self._lock:
+            self._completed = []
+            self._failed = []
+            if os.path.exists(self._path):
+                os.remove(self._path)
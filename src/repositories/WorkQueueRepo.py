@@ -0,0 +1,151 @@
+from abc import ABCMeta
+from typing import Dict, List, Optional
+
+from src.database import SQLDatabase
+from src.database.Errors import DatabaseQueryError
+from src.database.Queries import PostgresWorkQueueQuery
+from src.entities.WorkItem import WorkItem
+from src.repositories.ExchangeRateRepo import _as_date
+from src.services.DateWindowPlanner import DateWindow
+
+class WorkQueueDialectError(Exception):
+    def __init__(self, dialect: str):
+        '''
+        Raised when the work queue is used on a database without SKIP LOCKED.
+        '''
+        super().__init__("The backfill work queue requires Postgres, the database dialect is '{0}'.".format(dialect))
+
+class IWorkQueueRepo(metaclass = ABCMeta):
+
+    def enqueue(self, queue: str, windows: List[DateWindow]) -> int:
+        pass
+
+    def claim(
+        self, queue: str, worker: str, lease_seconds: float, max_attempts: int
+    ) -> Optional[WorkItem]:
+        pass
+
+    def heartbeat(self, item: WorkItem, worker: str, lease_seconds: float) -> bool:
+        pass
+
+    def complete(self, item: WorkItem, worker: str, rows_written: int) -> bool:
+        pass
+
+    def release_failed(self, item: WorkItem, worker: str, error: str, max_attempts: int) -> bool:
+        pass
+
+    def status_counts(self, queue: str) -> Dict[str, int]:
+        pass
+
+class WorkQueueRepo(IWorkQueueRepo):
+    '''
+    Date range work items in `dbo.backfill_work_items`, shared by any number
+    of job instances. Items are claimed with `FOR UPDATE SKIP LOCKED` under a
+    lease that the holder extends; an item whose lease expires is claimed
+    again by the next worker. Writes by a worker that lost its lease are
+    ignored, each responds with whether the worker still held the item.
+    '''
+    def __init__(self, sql_db: SQLDatabase):
+        if sql_db.dialect != "postgres":
+            raise WorkQueueDialectError(dialect = sql_db.dialect)
+        self._db = sql_db
+
+    def enqueue(self, queue: str, windows: List[DateWindow], batch_size: int = 500) -> int:
+        '''
+        Adds the windows not queued yet, responding with how many were added.
+        Running it again with the same windows adds nothing.
+        '''
+        statements: List[tuple] = []
+        for offset in range(0, len(windows), batch_size):
+            batch: List[DateWindow] = windows[offset:offset + batch_size]
+            args: dict = { "queue": queue }
+            for index, window in enumerate(batch):
+                args[f"start_date_{index}"] = _as_date(window.start_date)
+                args[f"end_date_{index}"] = _as_date(window.end_date)
+            statements.append((
+                PostgresWorkQueueQuery.ENQUEUE_WORK_ITEMS.value.format(values = ", ".join(
+                    f"(:queue, :start_date_{index}, :end_date_{index})" for index in range(len(batch))
+                )),
+                args
+            ))
+        if len(statements) == 0:
+            return 0
+        try:
+            return self._db.execute_batch(statements = statements)
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def claim(
+        self, queue: str, worker: str, lease_seconds: float, max_attempts: int
+    ) -> Optional[WorkItem]:
+        '''
+        Fails the expired items that used every attempt, then claims the
+        oldest claimable item. Responds with None when nothing is claimable.
+        '''
+        try:
+            self._db.execute(
+                query = PostgresWorkQueueQuery.FAIL_EXHAUSTED_WORK_ITEMS,
+                args = { "queue": queue, "max_attempts": max_attempts }
+            )
+            rows: List[dict] = self._db.execute_returning(
+                query = PostgresWorkQueueQuery.CLAIM_WORK_ITEM,
+                args = {
+                    "queue": queue,
+                    "worker": worker,
+                    "lease_seconds": lease_seconds,
+                    "max_attempts": max_attempts
+                }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        if len(rows) == 0:
+            return None
+        return WorkItem(
+            id = rows[0]["id"],
+            queue = rows[0]["queue"],
+            start_date = rows[0]["start_date"],
+            end_date = rows[0]["end_date"],
+            attempts = rows[0]["attempts"]
+        )
+
+    def heartbeat(self, item: WorkItem, worker: str, lease_seconds: float) -> bool:
+        try:
+            return self._db.execute(
+                query = PostgresWorkQueueQuery.HEARTBEAT_WORK_ITEM,
+                args = { "id": item.id, "worker": worker, "lease_seconds": lease_seconds }
+            ) > 0
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def complete(self, item: WorkItem, worker: str, rows_written: int) -> bool:
+        try:
+            return self._db.execute(
+                query = PostgresWorkQueueQuery.COMPLETE_WORK_ITEM,
+                args = { "id": item.id, "worker": worker, "rows_written": rows_written }
+            ) > 0
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def release_failed(self, item: WorkItem, worker: str, error: str, max_attempts: int) -> bool:
+        try:
+            return self._db.execute(
+                query = PostgresWorkQueueQuery.RELEASE_FAILED_WORK_ITEM,
+                args = { "id": item.id, "worker": worker, "error": error, "max_attempts": max_attempts }
+            ) > 0
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+
+    def status_counts(self, queue: str) -> Dict[str, int]:
+        '''
+        Item count per status, plus `LEASED` for claimed items whose lease
+        is still live.
+        '''
+        try:
+            rows: List[dict] = self._db.select(
+                query = PostgresWorkQueueQuery.SELECT_WORK_ITEM_STATUS_COUNTS, args = { "queue": queue }
+            )
+        except Exception as query_err:
+            raise DatabaseQueryError(query_err.args)
+        counts: Dict[str, int] = { row["status"]: row["count"] for row in rows }
+        counts["LEASED"] = sum(row["leased"] for row in rows)
+        return counts
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from logging import Logger
+from typing import List
+
+from src.metrics import metrics
+from src.repositories.WorkQueueRepo import IWorkQueueRepo
+from src.services.DateWindowPlanner import DateWindow
+
+def plan_aligned_windows(start_date: date, end_date: date, item_days: int) -> List[DateWindow]:
+    '''
+    Splits the inclusive range into windows whose boundaries fall on
+    multiples of `item_days` from the first ordinal day, so instances
+    enqueueing overlapping ranges produce the same items for the overlap.
+    '''
+    if item_days < 1:
+        raise ValueError("item_days must be a positive integer")
+    windows: List[DateWindow] = []
+    window_start: date = start_date
+    while window_start <= end_date:
+        ordinal: int = window_start.toordinal()
+        window_end: date = min(
+            date.fromordinal(ordinal - ordinal % item_days + item_days - 1), end_date
+        )
+        windows.append(DateWindow(start_date = window_start, end_date = window_end))
+        window_start = window_end + timedelta(days = 1)
+    return windows
+
+class BackfillCoordinator:
+    '''
+    Splits a HISTORICAL backfill into date range work items on the shared
+    queue. Enqueueing is idempotent, every instance of a backfill may run it.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        repo: IWorkQueueRepo,
+        queue: str,
+        item_days: int = 365
+    ):
+        self._logger = logger
+        self._repo = repo
+        self._queue = queue
+        self._item_days = item_days
+
+    def enqueue(self, start_date: date, end_date: date) -> int:
+        windows: List[DateWindow] = plan_aligned_windows(
+            start_date = start_date, end_date = end_date, item_days = self._item_days
+        )
+        added: int = self._repo.enqueue(queue = self._queue, windows = windows)
+        metrics.increment("work_items_enqueued_total", added, queue = self._queue)
+        self._logger.info("Queued {0} new of {1} work items on {2} for {3} to {4}.".format(
+            added,
+            len(windows),
+            self._queue,
+            start_date.strftime("%Y-%m-%d"),
+            end_date.strftime("%Y-%m-%d")
+        ))
+        return added
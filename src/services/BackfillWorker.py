@@ -0,0 +1,155 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from typing import Dict, List, Optional
+
+from src.entities.WorkItem import WorkItem
+from src.metrics import metrics
+from src.repositories.WorkQueueRepo import IWorkQueueRepo
+from src.services.DateWindowPlanner import DateWindow
+from src.services.HistoricalRateLoaderService import HistoricalReateLoaderService
+
+class BackfillWorker:
+    '''
+    Claims work items from the shared queue and loads each date range with
+    the historical loader, holding the item's lease with a heartbeat while
+    it runs. A failed item goes back to the queue until it used every
+    attempt. An item whose outcome cannot be recorded is logged and left to
+    its lease, the slot moves on. Each of the `concurrency` slots stops once
+    no item is pending or leased, or when `stop` is called.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        repo: IWorkQueueRepo,
+        loader: HistoricalReateLoaderService,
+        queue: str,
+        worker_id: str,
+        lease_seconds: float = 300.0,
+        heartbeat_seconds: float = 60.0,
+        max_attempts: int = 5,
+        poll_seconds: float = 30.0,
+        concurrency: int = 1
+    ):
+        if heartbeat_seconds >= lease_seconds:
+            raise ValueError("heartbeat_seconds must be shorter than lease_seconds")
+        self._logger = logger
+        self._repo = repo
+        self._loader = loader
+        self._queue = queue
+        self._worker_id = worker_id
+        self._lease_seconds = lease_seconds
+        self._heartbeat_seconds = heartbeat_seconds
+        self._max_attempts = max_attempts
+        self._poll_seconds = poll_seconds
+        self._concurrency = max(1, concurrency)
+        self._stopping = threading.Event()
+
+    def stop(self):
+        '''
+        Slots finish their current item and claim no more.
+        '''
+        self._stopping.set()
+
+    def _describe(self, item: WorkItem) -> str:
+        return "{0} to {1} (item {2}, attempt {3})".format(
+            item.start_date.strftime("%Y-%m-%d"), item.end_date.strftime("%Y-%m-%d"), item.id, item.attempts
+        )
+
+    def _heartbeat(self, item: WorkItem, worker: str, done: threading.Event):
+        while not done.wait(self._heartbeat_seconds):
+            try:
+                held: bool = self._repo.heartbeat(item = item, worker = worker, lease_seconds = self._lease_seconds)
+            except Exception as heartbeat_err:
+                # The lease may still be live, the next beat retries.
+                self._logger.warning("Heartbeat for {0} failed. {1}".format(self._describe(item = item), heartbeat_err.args))
+                continue
+            if not held:
+                self._logger.warning("Lost the lease on {0}, another worker may load it again.".format(
+                    self._describe(item = item)
+                ))
+                return
+
+    def _process(self, item: WorkItem, worker: str):
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target = self._heartbeat,
+            args = (item, worker, done),
+            name = "heartbeat-{0}".format(item.id),
+            daemon = True
+        )
+        heartbeat.start()
+        try:
+            written: int = self._loader.load_ranges(
+                ranges = [DateWindow(start_date = item.start_date, end_date = item.end_date)]
+            )
+        except Exception as load_err:
+            done.set()
+            heartbeat.join()
+            metrics.increment("work_items_total", queue = self._queue, outcome = "failed")
+            self._logger.error("Failed to load {0}. {1}".format(self._describe(item = item), load_err.args))
+            try:
+                self._repo.release_failed(
+                    item = item, worker = worker, error = repr(load_err), max_attempts = self._max_attempts
+                )
+            except Exception as release_err:
+                # The item is claimable again once its lease expires.
+                self._logger.error("Failed to release {0}. {1}".format(self._describe(item = item), release_err.args))
+            return
+        done.set()
+        heartbeat.join()
+        try:
+            completed: bool = self._repo.complete(item = item, worker = worker, rows_written = written)
+        except Exception as complete_err:
+            # The rows are stored, the item is loaded again once its lease expires.
+            metrics.increment("work_items_total", queue = self._queue, outcome = "unrecorded")
+            self._logger.error("Loaded {0} with {1} rows but failed to mark it done. {2}".format(
+                self._describe(item = item), written, complete_err.args
+            ))
+            return
+        if completed:
+            metrics.increment("work_items_total", queue = self._queue, outcome = "done")
+            self._logger.info("Completed {0} with {1} rows.".format(self._describe(item = item), written))
+        else:
+            metrics.increment("work_items_total", queue = self._queue, outcome = "lease_lost")
+            self._logger.warning("Loaded {0} after its lease expired.".format(self._describe(item = item)))
+
+    def _work(self, slot: int) -> int:
+        worker: str = "{0}/{1}".format(self._worker_id, slot)
+        processed: int = 0
+        while not self._stopping.is_set():
+            item: Optional[WorkItem] = self._repo.claim(
+                queue = self._queue,
+                worker = worker,
+                lease_seconds = self._lease_seconds,
+                max_attempts = self._max_attempts
+            )
+            if item == None:
+                counts: Dict[str, int] = self._repo.status_counts(queue = self._queue)
+                if counts.get("PENDING", 0) == 0 and counts.get("CLAIMED", 0) == 0:
+                    return processed
+                # Items leased by other workers are claimable again if their lease expires.
+                self._stopping.wait(self._poll_seconds)
+                continue
+            self._process(item = item, worker = worker)
+            processed = processed + 1
+        return processed
+
+    def run(self) -> Dict[str, int]:
+        '''
+        Works the queue until it drains, responding with the final item
+        count per status.
+        '''
+        with ThreadPoolExecutor(max_workers = self._concurrency) as executor:
+            processed: List[int] = list(executor.map(self._work, range(self._concurrency)))
+        counts: Dict[str, int] = self._repo.status_counts(queue = self._queue)
+        self._logger.info("Worker {0} processed {1} items. Queue {2}: {3} done, {4} failed, {5} pending, {6} claimed.".format(
+            self._worker_id,
+            sum(processed),
+            self._queue,
+            counts.get("DONE", 0),
+            counts.get("FAILED", 0),
+            counts.get("PENDING", 0),
+            counts.get("CLAIMED", 0)
+        ))
+        return counts
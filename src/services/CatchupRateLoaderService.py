@@ -0,0 +1,66 @@
+from datetime import date
+from logging import Logger
+from typing import List, Optional, Set
+
+from src.enums import BaseCurrency
+from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+from src.services.DateWindowPlanner import DateWindow, merge_date_ranges
+from src.services.HistoricalRateLoaderService import HistoricalReateLoaderService
+
+class CatchupRateLoaderService:
+    '''
+    Finds the dates with no stored rates since a start date and backfills
+    only those, so recovering from missed runs costs work proportional to
+    the gap rather than the history length.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        repo: ExchangeRateRepo,
+        loader: HistoricalReateLoaderService,
+        bases: List[BaseCurrency],
+        sources: List[str] = None
+    ):
+        self._logger = logger
+        self._repo = repo
+        self._loader = loader
+        self._bases = bases
+        self._sources = sources or ["EXCHANGE_RATE_HOST"]
+
+    def _find_missing_dates(self, start_date: date, end_date: date) -> List[date]:
+        '''
+        A day is missing for a base when no source has it stored.
+        '''
+        missing: Set[date] = set()
+        for base in self._bases:
+            base_missing: Optional[Set[date]] = None
+            for source in self._sources:
+                source_missing: Set[date] = set(self._repo.get_missing_dates(
+                    start_date = start_date,
+                    end_date = end_date,
+                    source = source,
+                    base = base.value
+                ))
+                base_missing = source_missing if base_missing == None else base_missing & source_missing
+            missing.update(base_missing)
+        return sorted(missing)
+
+    def run(self, start_date: date, end_date: date):
+        missing: List[date] = self._find_missing_dates(
+            start_date = start_date, end_date = end_date
+        )
+        if len(missing) == 0:
+            self._logger.info("No missing rates between {0} and {1}.".format(
+                start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+            ))
+            return
+        ranges: List[DateWindow] = merge_date_ranges(dates = missing)
+        self._logger.info("Catching up {0} missing days in {1} ranges: {2}".format(
+            len(missing),
+            len(ranges),
+            ", ".join(
+                "{0}..{1}".format(x.start_date.strftime("%Y-%m-%d"), x.end_date.strftime("%Y-%m-%d"))
+                for x in ranges
+            )
+        ))
+        self._loader.load_ranges(ranges = ranges)
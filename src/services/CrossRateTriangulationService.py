@@ -0,0 +1,70 @@
+from typing import Dict, List
+
+from src.clients.ExchangeRateHost import BaseCurrency, DatedRates
+
+class CrossRateTriangulationService:
+    '''
+    Derives rate tables for other base currencies from rates fetched against a
+    single base. For base B and currency C, `rate[B][C] = rate[A][C] / rate[A][B]`,
+    computed at once over the whole date x currency matrix. numpy is imported
+    on the first derivation, so single base runs never load it.
+    '''
+
+    def _build_matrix(
+        self, collection: List[DatedRates], source_base: BaseCurrency
+    ) -> tuple:
+        import numpy as np
+        currencies: set = { source_base.value }
+        for dated_rates in collection:
+            currencies.update(dated_rates.rates.keys())
+        columns: List[str] = sorted(currencies)
+        index: Dict[str, int] = { code: i for i, code in enumerate(columns) }
+        matrix = np.full((len(collection), len(columns)), np.nan, dtype = np.float64)
+        for row, dated_rates in enumerate(collection):
+            for code, rate in dated_rates.rates.items():
+                matrix[row, index[code]] = rate
+        # A base always converts to itself at par, even if the payload omits it.
+        matrix[:, index[source_base.value]] = 1.0
+        return matrix, columns, index
+
+    def derive(
+        self,
+        collection: List[DatedRates],
+        source_base: BaseCurrency,
+        target_bases: List[BaseCurrency]
+    ) -> Dict[BaseCurrency, List[DatedRates]]:
+        '''
+        Responds with the derived rate tables per target base, in the order of
+        `collection`. Days where the target base has no usable rate are skipped.
+        '''
+        targets: List[BaseCurrency] = [x for x in target_bases if x != source_base]
+        derived: Dict[BaseCurrency, List[DatedRates]] = { x: [] for x in targets }
+        if len(collection) == 0 or len(targets) == 0:
+            return derived
+        import numpy as np
+        matrix, columns, index = self._build_matrix(
+            collection = collection, source_base = source_base
+        )
+        target_columns: List[int] = [index.get(x.value, -1) for x in targets]
+        divisors = np.full((len(collection), len(targets)), np.nan, dtype = np.float64)
+        for position, column in enumerate(target_columns):
+            if column >= 0:
+                divisors[:, position] = matrix[:, column]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            # Shape (days, targets, currencies).
+            cross = matrix[:, np.newaxis, :] / divisors[:, :, np.newaxis]
+        usable = np.isfinite(divisors) & (divisors > 0)
+        finite = np.isfinite(cross)
+        for position, target in enumerate(targets):
+            for row, dated_rates in enumerate(collection):
+                if not usable[row, position]:
+                    continue
+                values = cross[row, position]
+                mask = finite[row, position]
+                rates: dict = {
+                    columns[col]: float(values[col]) for col in np.flatnonzero(mask)
+                }
+                derived[target].append(DatedRates(
+                    date = dated_rates.date, rates = rates, source = dated_rates.source
+                ))
+        return derived
@@ -0,0 +1,197 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, date
+from typing import Dict, List, Optional, Sequence, Union
+
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import BaseCurrency
+from src.repositories.ExchangeRateRepo import IExchangeRateRepo
+
+class CurrencyConversionError(Exception):
+    def __init__(self, message: str):
+        '''
+        Raised when an amount cannot be converted with the stored rates.
+        '''
+        super().__init__(
+            "Failed to convert currency. {0}".format(message)
+        )
+
+def _as_date(value: Union[date, datetime]) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+class CurrencyConversionService:
+    '''
+    Read side API converting amounts with the rates stored by the collector
+    jobs. Rate tables are held in a bounded LRU cache keyed by the date they
+    were stored for. A date answered by an earlier day's rates (weekends,
+    holidays) is remembered as pointing at that day, so only its first
+    lookup queries the database; `clear_cache` drops these once its own
+    rates are written. `sources` are in precedence order: the nearest stored
+    date wins and a tie goes to the earlier source.
+    '''
+    def __init__(
+        self,
+        repo: IExchangeRateRepo,
+        base_currency: BaseCurrency,
+        sources: List[str] = None,
+        cache_size: int = 1024,
+        lookback_days: int = 7
+    ):
+        self._repo = repo
+        self._base_currency = base_currency
+        self._sources = sources or ["EXCHANGE_RATE_HOST"]
+        self._lookback_days = lookback_days
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._tables: "OrderedDict[date, Dict[str, float]]" = OrderedDict()
+        # Requested date to the earlier stored date that answered it.
+        self._fallbacks: "OrderedDict[date, date]" = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def _find_rates(self, on_date: date) -> Optional[ExchangeRate]:
+        '''
+        Rates for `on_date`, falling back to the nearest prior stored date of
+        any source.
+        '''
+        found: Optional[ExchangeRate] = None
+        for source in self._sources:
+            entity: Optional[ExchangeRate] = self._repo.get_latest_on_or_before(
+                on_date = on_date,
+                source = source,
+                base = self._base_currency.value,
+                lookback_days = self._lookback_days
+            )
+            if entity != None and (found == None or entity.date > found.date):
+                found = entity
+            if found != None and found.date == on_date:
+                break
+        return found
+
+    def _rate_table(self, on_date: date) -> Dict[str, float]:
+        with self._cache_lock:
+            stored_date: date = self._fallbacks.get(on_date, on_date)
+            table: Optional[Dict[str, float]] = self._tables.get(stored_date)
+            if table != None:
+                self._tables.move_to_end(stored_date)
+                if stored_date != on_date:
+                    self._fallbacks.move_to_end(on_date)
+                self.hits = self.hits + 1
+                return table
+            self.misses = self.misses + 1
+        entity: Optional[ExchangeRate] = self._find_rates(on_date = on_date)
+        if entity == None:
+            raise CurrencyConversionError(
+                "No {0} rates stored for {1} within {2} days before {3}.".format(
+                    self._base_currency.value,
+                    ", ".join(self._sources),
+                    self._lookback_days,
+                    on_date.strftime("%Y-%m-%d")
+                )
+            )
+        table = { code: float(rate) for code, rate in entity.rates.items() }
+        table[self._base_currency.value] = 1.0
+        with self._cache_lock:
+            self._tables[entity.date] = table
+            self._tables.move_to_end(entity.date)
+            while len(self._tables) > self._cache_size:
+                self._tables.popitem(last = False)
+            if entity.date != on_date:
+                self._fallbacks[on_date] = entity.date
+                self._fallbacks.move_to_end(on_date)
+                while len(self._fallbacks) > self._cache_size:
+                    self._fallbacks.popitem(last = False)
+        return table
+
+    def _lookup(self, table: Dict[str, float], currency: str, on_date: date) -> float:
+        rate = table.get(currency)
+        if rate == None or rate <= 0:
+            raise CurrencyConversionError(
+                "No rate for {0} on {1}.".format(currency, on_date.strftime("%Y-%m-%d"))
+            )
+        return rate
+
+    def convert(
+        self,
+        amount: float,
+        from_currency: str,
+        to_currency: str,
+        on_date: Union[date, datetime]
+    ) -> float:
+        target_date: date = _as_date(on_date)
+        table: Dict[str, float] = self._rate_table(target_date)
+        from_rate: float = self._lookup(table = table, currency = from_currency, on_date = target_date)
+        to_rate: float = self._lookup(table = table, currency = to_currency, on_date = target_date)
+        return amount * to_rate / from_rate
+
+    def _index_dates(self, dates: Sequence[Union[date, datetime]], count: int) -> tuple:
+        '''
+        Responds with the distinct dates and, per item, the position of its date
+        in that list. Datetime64 arrays are indexed by NumPy, other sequences
+        through a dict, which is far cheaper than converting date objects.
+        '''
+        if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+            unique_days, day_index = np.unique(dates.astype("datetime64[D]"), return_inverse = True)
+            return unique_days.tolist(), day_index
+        lookup: Dict[date, int] = {}
+        day_index = np.fromiter(
+            (lookup.setdefault(_as_date(x), len(lookup)) for x in dates),
+            dtype = np.intp,
+            count = count
+        )
+        return list(lookup.keys()), day_index
+
+    def convert_many(
+        self,
+        amounts: Sequence[float],
+        from_currencies: Sequence[str],
+        to_currencies: Sequence[str],
+        dates: Sequence[Union[date, datetime]]
+    ) -> np.ndarray:
+        '''
+        Converts every amount in one vectorized pass. Rate tables are loaded once
+        per distinct date, then gathered from a dates x currencies matrix.
+        '''
+        values = np.asarray(amounts, dtype = np.float64)
+        count: int = len(values)
+        if not (len(from_currencies) == len(to_currencies) == len(dates) == count):
+            raise ValueError("amounts, from_currencies, to_currencies and dates must be the same length")
+        if count == 0:
+            return values
+        unique_days, day_index = self._index_dates(dates = dates, count = count)
+        codes = np.concatenate([
+            np.asarray(from_currencies, dtype = str), np.asarray(to_currencies, dtype = str)
+        ])
+        unique_codes, code_index = np.unique(codes, return_inverse = True)
+        matrix = np.full((len(unique_days), len(unique_codes)), np.nan, dtype = np.float64)
+        for row, day in enumerate(unique_days):
+            table: Dict[str, float] = self._rate_table(day)
+            matrix[row] = [table.get(code, np.nan) for code in unique_codes.tolist()]
+        from_rates = matrix[day_index, code_index[:count]]
+        to_rates = matrix[day_index, code_index[count:]]
+        invalid = ~(np.isfinite(from_rates) & np.isfinite(to_rates) & (from_rates > 0))
+        if invalid.any():
+            position: int = int(np.flatnonzero(invalid)[0])
+            raise CurrencyConversionError(
+                "No rate to convert {0} to {1} on {2} (item {3}).".format(
+                    from_currencies[position],
+                    to_currencies[position],
+                    unique_days[day_index[position]].strftime("%Y-%m-%d"),
+                    position
+                )
+            )
+        return values * to_rates / from_rates
+
+    def cache_info(self) -> dict:
+        with self._cache_lock:
+            return {
+                "hits": self.hits, "misses": self.misses, "tables": len(self._tables), "fallbacks": len(self._fallbacks)
+            }
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._tables.clear()
+            self._fallbacks.clear()
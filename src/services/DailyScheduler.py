@@ -0,0 +1,92 @@
+import threading
+from datetime import date, datetime, time, timedelta
+from logging import Logger
+from typing import Callable, List, Optional
+
+import pytz
+
+class DailyScheduler:
+    '''
+    Runs `on_tick` once a day at `run_at` wall clock time in `timezone`,
+    following DST changes. Sleeps in short steps so a suspended host or a
+    clock jump is noticed on wake. When more than one tick was missed,
+    `on_missed` receives every missed tick date at once instead.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        timezone: str,
+        run_at: time,
+        on_tick: Callable[[datetime], None],
+        on_missed: Callable[[List[date]], None],
+        max_sleep_seconds: float = 60.0,
+        now: Optional[Callable[[], datetime]] = None
+    ):
+        self._logger = logger
+        self._timezone = pytz.timezone(timezone)
+        self._run_at = run_at
+        self._on_tick = on_tick
+        self._on_missed = on_missed
+        self._max_sleep_seconds = max_sleep_seconds
+        self._now = now or (lambda: datetime.now(self._timezone))
+        self._stop = threading.Event()
+
+    def tick_at(self, day: date) -> datetime:
+        '''
+        Aware tick time on `day`. A run time skipped by a spring forward
+        change moves past the gap, a repeated one runs on its first occurrence.
+        '''
+        naive: datetime = datetime.combine(day, self._run_at)
+        try:
+            local: datetime = self._timezone.localize(naive, is_dst = None)
+        except pytz.NonExistentTimeError:
+            local = self._timezone.localize(naive, is_dst = False)
+        except pytz.AmbiguousTimeError:
+            local = self._timezone.localize(naive, is_dst = True)
+        return self._timezone.normalize(local)
+
+    def next_tick_after(self, moment: datetime) -> datetime:
+        local_day: date = moment.astimezone(self._timezone).date()
+        tick: datetime = self.tick_at(day = local_day)
+        if tick <= moment:
+            tick = self.tick_at(day = local_day + timedelta(days = 1))
+        return tick
+
+    def _missed_ticks(self, scheduled: datetime, moment: datetime) -> List[datetime]:
+        ticks: List[datetime] = []
+        tick: datetime = scheduled
+        while tick <= moment:
+            ticks.append(tick)
+            tick = self.tick_at(day = tick.astimezone(self._timezone).date() + timedelta(days = 1))
+        return ticks
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def run(self):
+        '''
+        Blocks until `stop` is called. A tick that is running when the stop
+        arrives is allowed to finish.
+        '''
+        scheduled: datetime = self.next_tick_after(moment = self._now())
+        self._logger.info("Next collection scheduled for {0}.".format(scheduled.isoformat()))
+        while not self._stop.is_set():
+            remaining: float = (scheduled - self._now()).total_seconds()
+            if remaining > 0:
+                self._stop.wait(min(remaining, self._max_sleep_seconds))
+                continue
+            moment: datetime = self._now()
+            due: List[datetime] = self._missed_ticks(scheduled = scheduled, moment = moment)
+            if len(due) > 1:
+                self._logger.warning("Woke at {0} after missing {1} scheduled collections.".format(
+                    moment.isoformat(), len(due)
+                ))
+                self._on_missed([x.astimezone(self._timezone).date() for x in due])
+            else:
+                self._on_tick(due[0])
+            scheduled = self.next_tick_after(moment = max(moment, due[-1]))
+            self._logger.info("Next collection scheduled for {0}.".format(scheduled.isoformat()))
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Tuple
+
+@dataclass
+class DateWindow:
+    start_date: datetime
+    end_date: datetime
+
+def plan_date_windows(
+    start_date: datetime, 
+    end_date: datetime, 
+    window_days: int
+) -> List[DateWindow]:
+    '''
+    Splits the inclusive `[start_date, end_date]` span into consecutive,
+    non-overlapping windows of at most `window_days` days, in date order.
+    '''
+    if window_days < 1:
+        raise ValueError("window_days must be a positive integer")
+    windows: List[DateWindow] = []
+    window_start: datetime = start_date
+    while window_start <= end_date:
+        window_end: datetime = min(
+            window_start + timedelta(days = window_days - 1), end_date
+        )
+        windows.append(DateWindow(start_date = window_start, end_date = window_end))
+        window_start = window_end + timedelta(days = 1)
+    return windows
+
+def merge_date_ranges(dates: List[date]) -> List[DateWindow]:
+    '''
+    Collapses individual dates into the fewest contiguous, inclusive ranges.
+    '''
+    ranges: List[DateWindow] = []
+    for value in sorted(set(dates)):
+        if len(ranges) > 0 and ranges[-1].end_date + timedelta(days = 1) == value:
+            ranges[-1].end_date = value
+        else:
+            ranges.append(DateWindow(start_date = value, end_date = value))
+    return ranges
+
+def subtract_date_ranges(
+    ranges: List[DateWindow], covered: List[Tuple[date, date]]
+) -> List[DateWindow]:
+    '''
+    Responds with the parts of the inclusive `ranges` outside every inclusive
+    `covered` range, in the order of `ranges`.
+    '''
+    remaining: List[DateWindow] = []
+    for date_range in ranges:
+        pieces: List[DateWindow] = [DateWindow(start_date = date_range.start_date, end_date = date_range.end_date)]
+        for covered_start, covered_end in covered:
+            next_pieces: List[DateWindow] = []
+            for piece in pieces:
+                if covered_end < piece.start_date or covered_start > piece.end_date:
+                    next_pieces.append(piece)
+                    continue
+                if piece.start_date < covered_start:
+                    next_pieces.append(DateWindow(
+                        start_date = piece.start_date, end_date = covered_start - timedelta(days = 1)
+                    ))
+                if covered_end < piece.end_date:
+                    next_pieces.append(DateWindow(
+                        start_date = covered_end + timedelta(days = 1), end_date = piece.end_date
+                    ))
+            pieces = next_pieces
+        remaining.extend(pieces)
+    return remaining
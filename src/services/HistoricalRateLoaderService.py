@@ -1,27 +1,58 @@
-import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from logging import Logger
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, date, timedelta
+from typing import Dict, Iterator, List, Optional, Set
 
 from src.entities.ExchangeRate import ExchangeRate
+from src.entities.FailedWindow import FailedWindow
+from src.enums import ConflictAction
+from src.metrics import metrics
 from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+from src.repositories.LoadCheckpointRepo import LoadCheckpointRepo
 from src.clients.ExchangeRateHost import (
     IExchangeRateHost,
     BaseCurrency,
     DatedRates
 )
+from src.services.DateWindowPlanner import DateWindow, plan_date_windows, subtract_date_ranges
+from src.services.CrossRateTriangulationService import CrossRateTriangulationService
+from src.services.RatesWrittenListener import IRatesWrittenListener
 
-class RatesDuplicationError(Exception):
-    def __init__(self, date: datetime, source: str):
+class WindowCollectionError(Exception):
+    def __init__(self, window: DateWindow, attempts: int):
         '''
-        Raised when there is a duplicate record found inside of the database table.
+        Raised when a date window could not be collected after every retry.
         '''
         super().__init__(
-            self, 
-            "Duplicate record was found inside of database table.",
-            date.strftime("%Y-%m-%d"),
-            source
+            "Failed to collect rates for {0} to {1} after {2} attempts.".format(
+                window.start_date.strftime("%Y-%m-%d"),
+                window.end_date.strftime("%Y-%m-%d"),
+                attempts
+            )
+        )
+
+def _count_days(ranges: List[DateWindow]) -> int:
+    return sum((x.end_date - x.start_date).days + 1 for x in ranges)
+
+class HistoricalLoadError(Exception):
+    def __init__(self, failed: List[FailedWindow], windows: int):
+        '''
+        Raised after a load in which some windows failed, once every other
+        window was saved.
+        '''
+        super().__init__(
+            "Failed to collect {0} of {1} windows: {2}.".format(
+                len(failed),
+                windows,
+                ", ".join(
+                    "{0}..{1}".format(x.start_date.strftime("%Y-%m-%d"), x.end_date.strftime("%Y-%m-%d"))
+                    for x in failed
+                )
+            )
         )
+        self.failed = failed
 
 class HistoricalReateLoaderService:
 
@@ -29,78 +60,269 @@ class HistoricalReateLoaderService:
         self, 
         logger: Logger, 
         repo: ExchangeRateRepo, 
-        client: IExchangeRateHost
+        client: IExchangeRateHost,
+        base_currency: BaseCurrency,
+        derived_bases: List[BaseCurrency] = None,
+        batch_size: int = 500,
+        window_days: int = 365,
+        max_workers: int = 4,
+        window_retries: int = 2,
+        listeners: List[IRatesWrittenListener] = None,
+        sources: List[str] = None,
+        checkpoints: Optional[LoadCheckpointRepo] = None
     ):
         self._logger = logger
         self._repo = repo
         self._client = client
+        self._base_currency = base_currency
+        self._derived_bases = derived_bases or []
+        self._triangulator = CrossRateTriangulationService()
+        self._batch_size = batch_size
+        self._window_days = window_days
+        self._max_workers = max_workers
+        self._window_retries = window_retries
+        self._listeners = listeners or []
+        # Every source the client may answer from, the first one is recorded
+        # when the client does not name the provider.
+        self._sources = sources or ["EXCHANGE_RATE_HOST"]
+        # Window workers fetch and parse in parallel but write one batch at a
+        # time, so listeners never see two overlapping writes.
+        self._write_lock = threading.Lock()
+        # Saved ranges and failed windows survive a restart when set.
+        self._checkpoints = checkpoints
 
     def _cast_entity_collection(
         self, collection: List[DatedRates]
     ) -> List[ExchangeRate]:
+        tables: Dict[BaseCurrency, List[DatedRates]] = { self._base_currency: collection }
+        tables.update(self._triangulator.derive(
+            collection = collection,
+            source_base = self._base_currency,
+            target_bases = self._derived_bases
+        ))
         return [
             ExchangeRate(
-                date = x.date, rates = x.rates, source = "EXCHANGE_RATE_HOST"
-            ) for x in collection
+                date = x.date, rates = x.rates, source = x.source or self._sources[0], base = base.value
+            ) for base, rates in tables.items() for x in rates
         ]
 
-    def _insert_record(self, entity: ExchangeRate):
+    def _insert_records(self, entities: List[ExchangeRate]) -> int:
         try:
-            self._repo.insert_exchange_rate(entity = entity)
+            return self._repo.insert_exchange_rates(
+                entities = entities, 
+                batch_size = self._batch_size,
+                on_conflict = ConflictAction.NOTHING
+            )
         except Exception as err:
             raise err
     
-    def _check_for_duplicates(self, date: datetime, source: str):
-        total: int = self._repo.if_exists_by_date_and_source(
-            date = date.strftime("%Y-%m-%d"), source = source
-        )
-        if total > 0:
-            raise RatesDuplicationError(date = date, source = source)
+    def _remove_duplicates(self, collection: List[ExchangeRate]) -> List[ExchangeRate]:
+        if len(collection) == 0:
+            return collection
+        start_date: date = min(x.date for x in collection)
+        end_date: date = max(x.date for x in collection)
+        existing: Dict[str, Set[date]] = {}
+        for base in { x.base for x in collection }:
+            existing[base] = set()
+            for source in self._sources:
+                existing[base].update(self._repo.get_existing_dates(
+                    start_date = start_date,
+                    end_date = end_date,
+                    source = source,
+                    base = base
+                ))
+            if len(existing[base]) > 0:
+                self._logger.warning("Skipping {0} {1} records already stored for sources {2}.".format(
+                    len(existing[base]), base, ", ".join(self._sources)
+                ))
+        return [x for x in collection if x.date not in existing[x.base]]
 
-    def _save_rate_history(self, collection: List[ExchangeRate]):
-        for record in collection:
-            try:
-                self._check_for_duplicates(
-                    date = record.date, source = record.source
-                )
-            except RatesDuplicationError as dup_err:
-                self._logger.warning(str(dup_err.args))
-                continue
+    def _save_rate_history(self, collection: List[ExchangeRate]) -> int:
+        pending: List[ExchangeRate] = self._remove_duplicates(collection = collection)
+        if len(pending) == 0:
+            self._logger.info("No new historical records to save.")
+            return 0
+        started: float = time.perf_counter()
+        try:
+            with metrics.timed("stage_seconds", stage = "historical_insert"):
+                written: int = self._insert_records(entities = pending)
+        except Exception as save_err:
+            self._logger.error("Failed to save records dated {0} to {1}. {2}".format(
+                pending[0].date.strftime("%Y-%m-%d"),
+                pending[-1].date.strftime("%Y-%m-%d"),
+                save_err.args
+            ))
+            raise
+        elapsed: float = time.perf_counter() - started
+        rows_per_sec: float = written / elapsed if elapsed > 0 else float(written)
+        self._logger.info("Saved {0} historical records in {1:.3f}s ({2:.1f} rows/sec).".format(
+            written, elapsed, rows_per_sec
+        ))
+        metrics.increment("rows_written_total", written, job = "historical")
+        with metrics.timed("stage_seconds", stage = "historical_listeners"):
+            for listener in self._listeners:
+                listener.on_rates_written(entities = pending)
+        return written
+
+    def _write_batch(self, batch: List[DatedRates]) -> int:
+        with metrics.timed("stage_seconds", stage = "historical_cast"):
+            entities: List[ExchangeRate] = self._cast_entity_collection(collection = batch)
+        with metrics.timed("stage_seconds", stage = "historical_write_wait"):
+            self._write_lock.acquire()
+        try:
+            return self._save_rate_history(collection = entities)
+        finally:
+            self._write_lock.release()
+
+    def _stream_window(
+        self, client: IExchangeRateHost, window: DateWindow
+    ) -> Iterator[DatedRates]:
+        '''
+        Yields the days of the window as the client streams them. A failed
+        attempt resumes after the last day received rather than from the
+        start of the window.
+        '''
+        attempts: int = self._window_retries + 1
+        resume_from = window.start_date
+        for attempt in range(1, attempts + 1):
             try:
-                self._insert_record(entity = record)
-            except Exception as save_err:
-                self._logger.error("Failed to save record dated {0}. {1}".format(
-                    record.date.strftime("%Y-%m-%d"), save_err.args
-                ))
-                sys.exit()
+                for dated_rates in client.iter_rates_for_date_range(
+                    start_date = resume_from,
+                    end_date = window.end_date
+                ):
+                    yield dated_rates
+                    resume_from = datetime.combine(
+                        dated_rates.date + timedelta(days = 1), datetime.min.time()
+                    )
+                return
+            except Exception as window_err:
+                reason: str = str(window_err.args)
+            self._logger.warning("Attempt {0}/{1} for {2} to {3} failed. {4}".format(
+                attempt,
+                attempts,
+                resume_from.strftime("%Y-%m-%d"),
+                window.end_date.strftime("%Y-%m-%d"),
+                reason
+            ))
+        raise WindowCollectionError(window = window, attempts = attempts)
+
+    def _load_window(self, client: IExchangeRateHost, window: DateWindow) -> int:
+        '''
+        Flows the streamed days of one window to the writer in batches of
+        `batch_size` days, holding at most one batch in memory.
+        '''
+        written: int = 0
+        batch: List[DatedRates] = []
+        with metrics.timed("stage_seconds", stage = "historical_window"):
+            for dated_rates in self._stream_window(client = client, window = window):
+                batch.append(dated_rates)
+                if len(batch) >= self._batch_size:
+                    written = written + self._write_batch(batch = batch)
+                    self._checkpoint(start_date = window.start_date, end_date = batch[-1].date)
+                    batch = []
+            if len(batch) > 0:
+                written = written + self._write_batch(batch = batch)
+            # Days after the last one streamed have no rates, the window is done.
+            self._checkpoint(start_date = window.start_date, end_date = window.end_date)
+        return written
+
+    def _checkpoint(self, start_date: date, end_date: date):
+        if self._checkpoints != None:
+            self._checkpoints.mark_completed(start_date = start_date, end_date = end_date)
 
-    def _collect_historical_rates(
+    def _load_historical_rates(
         self, 
         client: IExchangeRateHost, 
-        start_date: datetime, 
-        end_date: datetime
-    ) -> List[DatedRates]:
-        try:
-            rates_collection: List[DatedRates] = client.get_rates_for_date_range(
-                start_date = start_date,
-                end_date = end_date
+        ranges: List[DateWindow]
+    ) -> int:
+        '''
+        Loads every window, a failed one does not stop the others. Raises
+        `HistoricalLoadError` listing the failed windows at the end.
+        '''
+        windows: List[DateWindow] = [
+            window for date_range in ranges for window in plan_date_windows(
+                start_date = date_range.start_date,
+                end_date = date_range.end_date,
+                window_days = self._window_days
             )
-            return rates_collection
-        except Exception as collection_err:
-            self._logger.error("Failed to collect date from ExchangeRateHost. {0}".format(
-                collection_err.args
+        ]
+        if len(windows) == 0:
+            return 0
+        workers: int = max(1, min(self._max_workers, len(windows)))
+        written: int = 0
+        failed: List[FailedWindow] = []
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            futures: List[Future] = [
+                executor.submit(self._load_window, client, window) 
+                for window in windows
+            ]
+            for window, future in zip(windows, futures):
+                try:
+                    written = written + future.result()
+                except Exception as collection_err:
+                    self._logger.error("Failed to collect rates for {0} to {1}. {2}".format(
+                        window.start_date.strftime("%Y-%m-%d"),
+                        window.end_date.strftime("%Y-%m-%d"),
+                        collection_err.args
+                    ))
+                    failed.append(FailedWindow(
+                        start_date = window.start_date,
+                        end_date = window.end_date,
+                        error = repr(collection_err),
+                        failed_at = datetime.now().isoformat(timespec = "seconds")
+                    ))
+        metrics.increment("historical_windows_total", len(windows) - len(failed), outcome = "done")
+        metrics.increment("historical_windows_total", len(failed), outcome = "failed")
+        if self._checkpoints != None:
+            self._checkpoints.record_failures(failed = failed)
+        if len(failed) > 0:
+            raise HistoricalLoadError(failed = failed, windows = len(windows))
+        return written
+
+    def _resume_ranges(self, ranges: List[DateWindow]) -> List[DateWindow]:
+        '''
+        Drops the days the checkpoint already holds from `ranges`.
+        '''
+        if self._checkpoints == None:
+            return ranges
+        remaining: List[DateWindow] = subtract_date_ranges(
+            ranges = ranges, covered = self._checkpoints.completed()
+        )
+        total: int = _count_days(ranges = ranges)
+        if remaining != ranges:
+            self._logger.info("Resuming from {0}, {1} of {2} days were already saved.".format(
+                self._checkpoints.path, total - _count_days(ranges = remaining), total
+            ))
+        for failed in self._checkpoints.failed():
+            self._logger.info("Retrying {0} to {1}, it failed at {2}. {3}".format(
+                failed.start_date.strftime("%Y-%m-%d"),
+                failed.end_date.strftime("%Y-%m-%d"),
+                failed.failed_at,
+                failed.error
             ))
-            sys.exit()
+        return remaining
+
+    def load_ranges(self, ranges: List[DateWindow]) -> int:
+        '''
+        Streams and saves every inclusive date range. Windows are fetched in
+        parallel and each flows to the database in batches as it is parsed.
+        With checkpoints, days saved by an earlier run are skipped and the
+        checkpoint is removed once every window succeeded. Responds with the
+        number of rows written.
+        '''
+        started: float = time.perf_counter()
+        written: int = self._load_historical_rates(
+            client = self._client,
+            ranges = self._resume_ranges(ranges = ranges)
+        )
+        if self._checkpoints != None:
+            self._checkpoints.clear()
+        self._logger.info("Saved {0} historical records in total in {1:.3f}s.".format(
+            written, time.perf_counter() - started
+        ))
+        return written
 
     def load(self, end_date: datetime, previous_days: int):
         time_delta = timedelta(days = previous_days)
         start_date: datetime = end_date - time_delta
-        rates_collection: List[DatedRates] = self._collect_historical_rates(
-            client = self._client,
-            start_date = start_date,
-            end_date = end_date
-        )
-        entities: List[ExchangeRate] = self._cast_entity_collection(
-            collection = rates_collection
-        )
-        self._save_rate_history(collection = entities)
\ No newline at end of file
+        self.load_ranges(ranges = [DateWindow(start_date = start_date, end_date = end_date)])
@@ -6,8 +6,12 @@ from src.clients.ExchangeRateHost import (
 )
 from logging import Logger
 from src.entities.ExchangeRate import ExchangeRate
-from typing import Callable, Any
+from src.enums import ConflictAction
+from src.metrics import metrics
+from typing import Callable, Any, Dict, List, Set
 from src.repositories.ExchangeRateRepo import ExchangeRateRepo
+from src.services.CrossRateTriangulationService import CrossRateTriangulationService
+from src.services.RatesWrittenListener import IRatesWrittenListener
 
 class RatesClientCollectionError(Exception):
     def __init__(self, client: Any, func: Callable):
@@ -19,7 +23,7 @@ class RatesClientCollectionError(Exception):
         super().__init__(self, f"Failed to collect rates from client '{clientName}.{funcName}'")
 
 class RatesDuplicationError(Exception):
-    def __init__(self, date: datetime, source: str):
+    def __init__(self, date: datetime, source: str, bases: List[str]):
         '''
         Raised when there is a duplicate record found inside of the database table.
         '''
@@ -27,7 +31,8 @@ class RatesDuplicationError(Exception):
             self, 
             "Duplicate record was found inside of database table.",
             date.strftime("%Y-%m-%d"),
-            source
+            source,
+            bases
         )
 
 class NightlyRateCollectorService:
@@ -36,11 +41,22 @@ class NightlyRateCollectorService:
         self, 
         repo: ExchangeRateRepo, 
         logger: Logger, 
-        client: IExchangeRateHost
+        client: IExchangeRateHost,
+        base_currency: BaseCurrency,
+        derived_bases: List[BaseCurrency] = None,
+        listeners: List[IRatesWrittenListener] = None,
+        sources: List[str] = None
     ):
         self._repo = repo
         self._logger = logger
         self._client = client
+        self._base_currency = base_currency
+        self._derived_bases = [x for x in (derived_bases or []) if x != base_currency]
+        self._triangulator = CrossRateTriangulationService()
+        self._listeners = listeners or []
+        # Every source the client may answer from, the first one is recorded
+        # when the client does not name the provider.
+        self._sources = sources or ["EXCHANGE_RATE_HOST"]
 
     def _handle_missing_rates(
         self, rates: DatedRates, client: IExchangeRateHost
@@ -51,32 +67,75 @@ class NightlyRateCollectorService:
                 func = client.get_rate_for_date
             )
 
-    def _insert_record(self, entity: ExchangeRate):
+    def _insert_records(self, entities: List[ExchangeRate]) -> int:
         try:
-            self._repo.insert_exchange_rate(entity = entity)
+            return self._repo.insert_exchange_rates(
+                entities = entities, on_conflict = ConflictAction.NOTHING
+            )
         except Exception as err:
             raise err
 
-    def _check_for_duplicates(self, date: date, source: str):
-        total: int = self._repo.if_exists_by_date_and_source(
-            date = date.strftime("%Y-%m-%d"), source = source
-        )
-        if total > 0:
-            raise RatesDuplicationError(date = date, source = source)
+    def _check_for_duplicates(self, date: date) -> List[BaseCurrency]:
+        '''
+        Responds with the bases still missing for the date from every source,
+        raising when every base is already stored.
+        '''
+        missing: List[BaseCurrency] = []
+        for base in [self._base_currency] + self._derived_bases:
+            existing: Set[date] = set()
+            for source in self._sources:
+                existing.update(self._repo.get_existing_dates(
+                    start_date = date, end_date = date, source = source, base = base.value
+                ))
+            if len(existing) == 0:
+                missing.append(base)
+        if len(missing) == 0:
+            raise RatesDuplicationError(
+                date = date, 
+                source = ", ".join(self._sources), 
+                bases = [x.value for x in [self._base_currency] + self._derived_bases]
+            )
+        return missing
+
+    def _build_entities(
+        self, dated_rates: DatedRates, source: str, bases: List[BaseCurrency]
+    ) -> List[ExchangeRate]:
+        tables: Dict[BaseCurrency, List[DatedRates]] = { self._base_currency: [dated_rates] }
+        tables.update(self._triangulator.derive(
+            collection = [dated_rates],
+            source_base = self._base_currency,
+            target_bases = self._derived_bases
+        ))
+        return [
+            ExchangeRate(
+                date = x.date, rates = x.rates, source = source, base = base.value
+            ) for base, rates in tables.items() if base in bases for x in rates
+        ]
 
     def save_rate(self, target_date: datetime):
-        source: str = "EXCHANGE_RATE_HOST"
         try:
-            self._check_for_duplicates(date = target_date, source = source)
+            with metrics.timed("stage_seconds", stage = "nightly_duplicate_check"):
+                bases: List[BaseCurrency] = self._check_for_duplicates(date = target_date.date())
         except RatesDuplicationError as dup_err:
             self._logger.warning("Duplicate rates record existing in database. {0}".format(
                 str(dup_err.args)
             ))
-        dated_rates: DatedRates = self._client.get_rate_for_date(date = target_date)
+            return
+        with metrics.timed("stage_seconds", stage = "nightly_fetch"):
+            dated_rates: DatedRates = self._client.get_rate_for_date(date = target_date)
         self._handle_missing_rates(rates = dated_rates, client = self._client)
-        entity = ExchangeRate(
-            date = dated_rates.date,
-            rates = dated_rates.rates,
-            source = source
+        entities: List[ExchangeRate] = self._build_entities(
+            dated_rates = dated_rates, source = dated_rates.source or self._sources[0], bases = bases
         )
-        self._insert_record(entity = entity)
\ No newline at end of file
+        with metrics.timed("stage_seconds", stage = "nightly_write"):
+            written: int = self._insert_records(entities = entities)
+        metrics.increment("rows_written_total", written, job = "nightly")
+        if written < len(entities):
+            self._logger.warning("{0} of {1} rate records for {2} were stored by another run.".format(
+                len(entities) - written,
+                len(entities),
+                dated_rates.date.strftime("%Y-%m-%d")
+            ))
+        with metrics.timed("stage_seconds", stage = "nightly_listeners"):
+            for listener in self._listeners:
+                listener.on_rates_written(entities = entities)
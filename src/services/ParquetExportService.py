@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+from logging import Logger
+from typing import Dict, List, Set
+
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import RollupPeriod
+from src.repositories.ExchangeRateParquetSink import ExchangeRateParquetSink
+from src.repositories.ExchangeRateRepo import IExchangeRateRepo
+from src.services.RatesWrittenListener import IRatesWrittenListener
+from src.services.RollupRefreshService import next_period_start, period_start
+
+class ParquetExportService(IRatesWrittenListener):
+    '''
+    Keeps the Parquet export current by rewriting only the month partitions
+    touched by each write, reading each month back from the database so the
+    partition holds every base stored for it.
+    '''
+    def __init__(
+        self,
+        logger: Logger,
+        repo: IExchangeRateRepo,
+        sink: ExchangeRateParquetSink
+    ):
+        self._logger = logger
+        self._repo = repo
+        self._sink = sink
+
+    def _group_months(self, entities: List[ExchangeRate]) -> Dict[str, Set[date]]:
+        groups: Dict[str, Set[date]] = {}
+        for entity in entities:
+            groups.setdefault(entity.source, set()).add(
+                period_start(value = entity.date, period = RollupPeriod.MONTH)
+            )
+        return groups
+
+    def export_month(self, source: str, month_start: date) -> int:
+        month_end: date = next_period_start(value = month_start, period = RollupPeriod.MONTH)
+        entities: List[ExchangeRate] = self._repo.get_exchange_rates_between(
+            start_date = month_start,
+            end_date = month_end - timedelta(days = 1),
+            source = source
+        )
+        return self._sink.write_partition(
+            source = source,
+            year = month_start.year,
+            month = month_start.month,
+            entities = entities
+        )
+
+    def on_rates_written(self, entities: List[ExchangeRate]):
+        for source, months in self._group_months(entities = entities).items():
+            for month_start in sorted(months):
+                try:
+                    written: int = self.export_month(source = source, month_start = month_start)
+                except Exception as export_err:
+                    self._logger.error("Failed to export {0} rates for {1}. {2}".format(
+                        source, month_start.strftime("%Y-%m"), export_err.args
+                    ))
+                    continue
+                self._logger.info("Exported {0} {1} rate rows for {2}.".format(
+                    written, source, month_start.strftime("%Y-%m")
+                ))
@@ -0,0 +1,13 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+from src.entities.ExchangeRate import ExchangeRate
+
+class IRatesWrittenListener(ABC):
+    '''
+    Notified by the collector services after a batch of rates is stored.
+    '''
+
+    @abstractmethod
+    def on_rates_written(self, entities: List[ExchangeRate]):
+        pass
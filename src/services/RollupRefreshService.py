@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from logging import Logger
+from typing import Dict, List, Tuple
+
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import RollupPeriod
+from src.repositories.ExchangeRateRollupRepo import IExchangeRateRollupRepo
+from src.services.RatesWrittenListener import IRatesWrittenListener
+
+def period_start(value: date, period: RollupPeriod) -> date:
+    '''
+    First day of the period containing `value`. Weeks start on Monday to
+    match Postgres `date_trunc('week', ...)`.
+    '''
+    match period:
+        case RollupPeriod.WEEK:
+            return value - timedelta(days = value.weekday())
+        case RollupPeriod.MONTH:
+            return value.replace(day = 1)
+
+def next_period_start(value: date, period: RollupPeriod) -> date:
+    start: date = period_start(value = value, period = period)
+    match period:
+        case RollupPeriod.WEEK:
+            return start + timedelta(days = 7)
+        case RollupPeriod.MONTH:
+            return (start + timedelta(days = 32)).replace(day = 1)
+
+class RollupRefreshService(IRatesWrittenListener):
+    '''
+    Keeps the weekly and monthly rollups current by recomputing only the
+    periods touched by each write.
+    '''
+    def __init__(
+        self, 
+        logger: Logger, 
+        repo: IExchangeRateRollupRepo,
+        periods: List[RollupPeriod] = None
+    ):
+        self._logger = logger
+        self._repo = repo
+        self._periods = periods or [RollupPeriod.WEEK, RollupPeriod.MONTH]
+
+    def _group_dates(self, entities: List[ExchangeRate]) -> Dict[Tuple[str, str], List[date]]:
+        groups: Dict[Tuple[str, str], List[date]] = {}
+        for entity in entities:
+            groups.setdefault((entity.source, entity.base), []).append(entity.date)
+        return groups
+
+    def on_rates_written(self, entities: List[ExchangeRate]):
+        for (source, base), dates in self._group_dates(entities = entities).items():
+            for period in self._periods:
+                start_date: date = period_start(value = min(dates), period = period)
+                end_date: date = next_period_start(value = max(dates), period = period)
+                try:
+                    refreshed: int = self._repo.refresh_periods(
+                        period = period,
+                        start_date = start_date,
+                        end_date = end_date,
+                        source = source,
+                        base = base
+                    )
+                except Exception as refresh_err:
+                    self._logger.error("Failed to refresh {0} rollups for {1}/{2} from {3} to {4}. {5}".format(
+                        period.value, source, base, start_date, end_date, refresh_err.args
+                    ))
+                    continue
+                self._logger.info("Refreshed {0} {1} rollup rows for {2}/{3} from {4} to {5}.".format(
+                    refreshed, period.value, source, base, start_date, end_date
+                ))
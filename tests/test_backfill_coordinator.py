@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+import pytest
+
+from src.services.BackfillCoordinator import plan_aligned_windows
+
+def test_plan_aligned_windows_cover_the_range_in_order():
+    windows = plan_aligned_windows(start_date = date(2020, 2, 10), end_date = date(2021, 7, 1), item_days = 100)
+    assert windows[0].start_date == date(2020, 2, 10)
+    assert windows[-1].end_date == date(2021, 7, 1)
+    for previous, current in zip(windows, windows[1:]):
+        assert current.start_date == previous.end_date + timedelta(days = 1)
+
+def test_plan_aligned_windows_end_on_item_boundaries():
+    windows = plan_aligned_windows(start_date = date(2020, 2, 10), end_date = date(2021, 7, 1), item_days = 100)
+    for window in windows[:-1]:
+        assert (window.end_date.toordinal() + 1) % 100 == 0
+        assert (window.end_date - window.start_date).days < 100
+
+def test_plan_aligned_windows_agree_on_overlapping_ranges():
+    first = plan_aligned_windows(start_date = date(2020, 1, 1), end_date = date(2021, 12, 31), item_days = 90)
+    second = plan_aligned_windows(start_date = date(2020, 7, 15), end_date = date(2022, 6, 30), item_days = 90)
+    interior = [x for x in second[1:] if x.end_date <= date(2021, 12, 31)]
+    assert len(interior) > 0
+    assert all(x in first for x in interior[:-1])
+
+def test_plan_aligned_windows_reject_empty_items():
+    with pytest.raises(ValueError):
+        plan_aligned_windows(start_date = date(2020, 1, 1), end_date = date(2020, 1, 2), item_days = 0)
@@ -0,0 +1,83 @@
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from src.entities.WorkItem import WorkItem
+from src.repositories.WorkQueueRepo import IWorkQueueRepo
+from src.services.BackfillWorker import BackfillWorker
+from src.services.DateWindowPlanner import DateWindow
+
+class InMemoryWorkQueueRepo(IWorkQueueRepo):
+    '''
+    Hands out the queued items once each. Completing or releasing the items
+    in `broken` raises, as when the connection drops.
+    '''
+    def __init__(self, items: List[WorkItem], broken: set):
+        self._lock = threading.Lock()
+        self._pending = list(items)
+        self._broken = broken
+        self.done: List[int] = []
+        self.released: List[int] = []
+
+    def claim(self, queue: str, worker: str, lease_seconds: float, max_attempts: int) -> Optional[WorkItem]:
+        with self._lock:
+            return self._pending.pop(0) if len(self._pending) > 0 else None
+
+    def heartbeat(self, item: WorkItem, worker: str, lease_seconds: float) -> bool:
+        return True
+
+    def complete(self, item: WorkItem, worker: str, rows_written: int) -> bool:
+        if item.id in self._broken:
+            raise ConnectionError("server closed the connection unexpectedly")
+        self.done.append(item.id)
+        return True
+
+    def release_failed(self, item: WorkItem, worker: str, error: str, max_attempts: int) -> bool:
+        if item.id in self._broken:
+            raise ConnectionError("server closed the connection unexpectedly")
+        self.released.append(item.id)
+        return True
+
+    def status_counts(self, queue: str) -> Dict[str, int]:
+        with self._lock:
+            return { "PENDING": len(self._pending), "LEASED": 0 }
+
+class RangeLoader:
+    '''
+    Stands in for the historical loader, failing the ranges starting on a
+    date in `failing`.
+    '''
+    def __init__(self, failing: set):
+        self._failing = failing
+
+    def load_ranges(self, ranges: List[DateWindow]) -> int:
+        if ranges[0].start_date in self._failing:
+            raise RuntimeError("provider unavailable")
+        return 1
+
+def _items(count: int) -> List[WorkItem]:
+    start: date = date(2024, 1, 1)
+    return [
+        WorkItem(id = index, queue = "historical", start_date = start + timedelta(days = index), end_date = start + timedelta(days = index), attempts = 1)
+        for index in range(count)
+    ]
+
+def _build_worker(repo: IWorkQueueRepo, loader: RangeLoader, concurrency: int) -> BackfillWorker:
+    return BackfillWorker(
+        logger = logging.getLogger("test_backfill_worker"),
+        repo = repo,
+        loader = loader,
+        queue = "historical",
+        worker_id = "test",
+        concurrency = concurrency
+    )
+
+def test_unrecorded_outcomes_do_not_stop_the_pool():
+    items: List[WorkItem] = _items(count = 8)
+    repo = InMemoryWorkQueueRepo(items = items, broken = { 1, 2 })
+    loader = RangeLoader(failing = { items[2].start_date, items[3].start_date })
+    _build_worker(repo = repo, loader = loader, concurrency = 2).run()
+    # Item 1 failed to complete and item 2 failed to release, both stay leased.
+    assert sorted(repo.done) == [0, 4, 5, 6, 7]
+    assert repo.released == [3]
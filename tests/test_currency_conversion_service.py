@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import pytest
+
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import BaseCurrency
+from src.repositories.ExchangeRateRepo import IExchangeRateRepo
+from src.services.CurrencyConversionService import CurrencyConversionError, CurrencyConversionService
+
+class StoredRatesRepo(IExchangeRateRepo):
+    '''
+    Answers `get_latest_on_or_before` from rates held in memory, counting the
+    queries.
+    '''
+    def __init__(self, stored: Dict[date, dict], source: str = "EXCHANGE_RATE_HOST"):
+        self._stored = stored
+        self._source = source
+        self.queries: List[date] = []
+
+    def get_latest_on_or_before(
+        self, on_date: date, source: str, base: str, lookback_days: int = 7
+    ) -> Optional[ExchangeRate]:
+        self.queries.append(on_date)
+        if source != self._source:
+            return None
+        for offset in range(lookback_days + 1):
+            day: date = on_date - timedelta(days = offset)
+            if day in self._stored:
+                return ExchangeRate(date = day, rates = self._stored[day], source = source, base = base)
+        return None
+
+FRIDAY: date = date(2024, 3, 8)
+SATURDAY: date = date(2024, 3, 9)
+
+def _build_service(stored: Dict[date, dict]) -> tuple:
+    repo = StoredRatesRepo(stored = stored)
+    return repo, CurrencyConversionService(repo = repo, base_currency = BaseCurrency.USD)
+
+def test_closed_day_falls_back_and_queries_once():
+    repo, service = _build_service(stored = { FRIDAY: { "EUR": 0.5, "JPY": 150.0 } })
+    assert service.convert(10.0, "EUR", "JPY", SATURDAY) == pytest.approx(3000.0)
+    assert service.convert(20.0, "EUR", "USD", SATURDAY) == pytest.approx(40.0)
+    assert repo.queries == [SATURDAY]
+    assert service.cache_info() == { "hits": 1, "misses": 1, "tables": 1, "fallbacks": 1 }
+
+def test_closed_day_shares_the_stored_day_table():
+    repo, service = _build_service(stored = { FRIDAY: { "EUR": 0.5 } })
+    service.convert(1.0, "USD", "EUR", FRIDAY)
+    service.convert(1.0, "USD", "EUR", SATURDAY)
+    service.convert(1.0, "USD", "EUR", SATURDAY)
+    assert repo.queries == [FRIDAY, SATURDAY]
+    assert service.cache_info()["tables"] == 1
+
+def test_clear_cache_picks_up_rates_written_later():
+    stored: Dict[date, dict] = { FRIDAY: { "EUR": 0.5 } }
+    repo, service = _build_service(stored = stored)
+    assert service.convert(1.0, "USD", "EUR", SATURDAY) == pytest.approx(0.5)
+    stored[SATURDAY] = { "EUR": 0.25 }
+    assert service.convert(1.0, "USD", "EUR", SATURDAY) == pytest.approx(0.5)
+    service.clear_cache()
+    assert service.convert(1.0, "USD", "EUR", SATURDAY) == pytest.approx(0.25)
+
+def test_missing_rates_raise():
+    _, service = _build_service(stored = {})
+    with pytest.raises(CurrencyConversionError):
+        service.convert(1.0, "USD", "EUR", SATURDAY)
@@ -0,0 +1,42 @@
+from datetime import date
+
+from src.services.DateWindowPlanner import DateWindow, plan_date_windows, subtract_date_ranges
+
+def test_plan_date_windows_covers_the_range_without_overlap():
+    windows = plan_date_windows(start_date = date(2024, 1, 1), end_date = date(2024, 1, 10), window_days = 4)
+    assert windows == [
+        DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 4)),
+        DateWindow(start_date = date(2024, 1, 5), end_date = date(2024, 1, 8)),
+        DateWindow(start_date = date(2024, 1, 9), end_date = date(2024, 1, 10))
+    ]
+
+def test_subtract_date_ranges_without_coverage_keeps_the_ranges():
+    ranges = [DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 31))]
+    assert subtract_date_ranges(ranges = ranges, covered = []) == ranges
+
+def test_subtract_date_ranges_splits_around_covered_ranges():
+    remaining = subtract_date_ranges(
+        ranges = [DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 31))],
+        covered = [(date(2024, 1, 5), date(2024, 1, 9)), (date(2024, 1, 20), date(2024, 2, 5))]
+    )
+    assert remaining == [
+        DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 4)),
+        DateWindow(start_date = date(2024, 1, 10), end_date = date(2024, 1, 19))
+    ]
+
+def test_subtract_date_ranges_drops_fully_covered_ranges():
+    remaining = subtract_date_ranges(
+        ranges = [
+            DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 10)),
+            DateWindow(start_date = date(2024, 3, 1), end_date = date(2024, 3, 2))
+        ],
+        covered = [(date(2023, 12, 1), date(2024, 1, 10))]
+    )
+    assert remaining == [DateWindow(start_date = date(2024, 3, 1), end_date = date(2024, 3, 2))]
+
+def test_subtract_date_ranges_handles_single_day_edges():
+    remaining = subtract_date_ranges(
+        ranges = [DateWindow(start_date = date(2024, 1, 1), end_date = date(2024, 1, 5))],
+        covered = [(date(2024, 1, 1), date(2024, 1, 1)), (date(2024, 1, 5), date(2024, 1, 5))]
+    )
+    assert remaining == [DateWindow(start_date = date(2024, 1, 2), end_date = date(2024, 1, 4))]
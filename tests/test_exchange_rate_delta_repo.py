@@ -0,0 +1,186 @@
+import copy
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from src.database import SQLDatabase
+from src.database.Errors import DatabaseQueryError
+from src.entities.ExchangeRate import ExchangeRate
+from src.enums import ConflictAction
+from src.repositories.ExchangeRateDeltaRepo import ExchangeRateDeltaRepo
+
+CODES: List[str] = ["EUR", "GBP", "JPY", "CAD", "CHF"]
+
+def _parse_array(literal: Optional[str]) -> Optional[list]:
+    '''
+    Postgres array literal to the list psycopg2 would respond with.
+    '''
+    if literal == None:
+        return None
+    if literal == "{}":
+        return []
+    return [None if x == "NULL" else (float(x) if "." in x or "e" in x else int(x)) for x in literal[1:-1].split(",")]
+
+class DeltaTablesDatabase(SQLDatabase):
+    '''
+    Holds `dbo.currency_codes` and `dbo.exchange_rate_deltas` in memory and
+    answers the statements the delta repository sends. A transaction works
+    on a copy that replaces the tables only when it commits.
+    '''
+    dialect = "postgres"
+
+    def __init__(self):
+        super().__init__(connection_details = None)
+        self.codes: List[str] = []
+        self.deltas: Dict[Tuple[date, str, str], dict] = {}
+
+    def _build_connection_string(self) -> str:
+        return "memory://"
+
+    def _create_engine(self):
+        raise NotImplementedError()
+
+    def select(self, query, args: dict = None) -> List[dict]:
+        sql: str = str(query)
+        if sql.startswith("SELECT id, code FROM dbo.currency_codes"):
+            return [{ "id": position + 1, "code": code } for position, code in enumerate(self.codes)]
+        if sql.startswith("SELECT pg_advisory_xact_lock"):
+            return [{ "locked": "" }]
+        if sql.startswith("SELECT date, keyframe, positions, rates, source, base FROM dbo.exchange_rate_deltas"):
+            rows: List[dict] = [
+                dict(row) for (day, source, base), row in self.deltas.items()
+                if source == args["source"] and base == args.get("base", base)
+                and args["start_date"] <= day <= args["end_date"]
+            ]
+            return sorted(rows, key = lambda x: (x["base"], x["date"]))
+        raise AssertionError("Unexpected select: {0}".format(sql))
+
+    def execute(self, query, args: dict = None) -> int:
+        sql: str = str(query)
+        if sql.startswith("INSERT INTO dbo.currency_codes"):
+            new_codes: List[str] = [args[key] for key in sorted(args, key = lambda x: int(x.split("_")[1]))]
+            self.codes.extend(code for code in new_codes if code not in self.codes)
+            return len(new_codes)
+        if sql.startswith("INSERT INTO dbo.exchange_rate_deltas"):
+            written: int = 0
+            for index in sorted({ int(key.rsplit("_", 1)[1]) for key in args }):
+                row: dict = self._delta_row(args = args, suffix = f"_{index}")
+                key: tuple = (row["date"], row["source"], row["base"])
+                if key in self.deltas and "DO NOTHING" in sql:
+                    continue
+                if key in self.deltas and "DO UPDATE" not in sql:
+                    raise RuntimeError("duplicate key value violates unique constraint")
+                self.deltas[key] = row
+                written = written + 1
+            return written
+        if sql.startswith("UPDATE dbo.exchange_rate_deltas"):
+            row: dict = self._delta_row(args = args)
+            self.deltas[(row["date"], row["source"], row["base"])] = row
+            return 1
+        raise AssertionError("Unexpected statement: {0}".format(sql))
+
+    def _delta_row(self, args: dict, suffix: str = "") -> dict:
+        return {
+            "date": args[f"date{suffix}"],
+            "keyframe": args[f"keyframe{suffix}"],
+            "positions": _parse_array(literal = args[f"positions{suffix}"]),
+            "rates": _parse_array(literal = args[f"rates{suffix}"]),
+            "source": args[f"source{suffix}"],
+            "base": args[f"base{suffix}"]
+        }
+
+    @contextmanager
+    def transaction(self) -> Iterator["DeltaTablesDatabase"]:
+        tx = DeltaTablesDatabase()
+        tx.codes, tx.deltas = list(self.codes), copy.deepcopy(self.deltas)
+        yield tx
+        self.codes, self.deltas = tx.codes, tx.deltas
+
+def _build_repo(keyframe_days: int = 7) -> Tuple[DeltaTablesDatabase, ExchangeRateDeltaRepo]:
+    sql_db = DeltaTablesDatabase()
+    return sql_db, ExchangeRateDeltaRepo(sql_db = sql_db, keyframe_days = keyframe_days)
+
+def _random_days(start_date: date, count: int, seed: int) -> Dict[date, dict]:
+    '''
+    Days where a few currencies move, some repeat the day before unchanged
+    and a currency is sometimes missing.
+    '''
+    generator = random.Random(seed)
+    days: Dict[date, dict] = {}
+    rates: dict = { code: round(generator.uniform(0.5, 150.0), 6) for code in CODES }
+    for offset in range(count):
+        rates = dict(rates)
+        for code in generator.sample(CODES, generator.randint(0, 2)):
+            rates[code] = round(generator.uniform(0.5, 150.0), 6)
+        if generator.random() < 0.1:
+            rates.pop(generator.choice(CODES), None)
+        days[start_date + timedelta(days = offset)] = rates
+    return days
+
+def _entities(days: Dict[date, dict]) -> List[ExchangeRate]:
+    return [ExchangeRate(date = day, rates = rates, source = "TEST", base = "USD") for day, rates in days.items()]
+
+def _read(repo: ExchangeRateDeltaRepo, start_date: date, end_date: date) -> Dict[date, dict]:
+    return {
+        entity.date: entity.rates
+        for entity in repo.get_exchange_rates_between_for_base(
+            start_date = start_date, end_date = end_date, source = "TEST", base = "USD"
+        )
+    }
+
+def test_round_trip_across_keyframe_windows():
+    sql_db, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 1, 1), count = 40, seed = 1)
+    assert repo.insert_exchange_rates(entities = _entities(days = days), batch_size = 9) == 40
+    assert _read(repo = repo, start_date = date(2024, 1, 1), end_date = date(2024, 2, 9)) == days
+    # The first stored day holds every rate, then one keyframe per window.
+    keyframes: List[date] = sorted(day for (day, _, _), row in sql_db.deltas.items() if row["keyframe"])
+    assert keyframes[0] == date(2024, 1, 1)
+    assert [(y - x).days for x, y in zip(keyframes[1:], keyframes[2:])] == [7] * (len(keyframes) - 2)
+
+def test_read_starting_mid_window():
+    _, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 1, 1), count = 30, seed = 2)
+    repo.insert_exchange_rates(entities = _entities(days = days))
+    expected: Dict[date, dict] = { day: rates for day, rates in days.items() if date(2024, 1, 10) <= day <= date(2024, 1, 20) }
+    assert _read(repo = repo, start_date = date(2024, 1, 10), end_date = date(2024, 1, 20)) == expected
+
+def test_gap_filled_mid_chain_re_encodes_the_next_day():
+    _, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 3, 1), count = 21, seed = 3)
+    missing: List[date] = [date(2024, 3, 5), date(2024, 3, 6), date(2024, 3, 13)]
+    repo.insert_exchange_rates(entities = _entities(days = { x: y for x, y in days.items() if x not in missing }))
+    repo.insert_exchange_rates(entities = _entities(days = { x: days[x] for x in missing }))
+    assert _read(repo = repo, start_date = date(2024, 3, 1), end_date = date(2024, 3, 21)) == days
+
+def test_out_of_order_batches():
+    _, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 5, 1), count = 45, seed = 4)
+    order: List[date] = list(days)
+    random.Random(5).shuffle(order)
+    for offset in range(0, len(order), 4):
+        repo.insert_exchange_rates(entities = _entities(days = { x: days[x] for x in order[offset:offset + 4] }))
+    assert _read(repo = repo, start_date = date(2024, 5, 1), end_date = date(2024, 6, 14)) == days
+
+def test_replacing_days_around_a_keyframe_boundary():
+    _, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 7, 1), count = 21, seed = 6)
+    repo.insert_exchange_rates(entities = _entities(days = days))
+    replaced: Dict[date, dict] = {
+        day: { "EUR": 1.0 + offset, "SEK": 10.0 } for offset, day in enumerate(list(days)[5:10])
+    }
+    assert repo.insert_exchange_rates(entities = _entities(days = replaced), on_conflict = ConflictAction.UPDATE) == 5
+    assert _read(repo = repo, start_date = date(2024, 7, 1), end_date = date(2024, 7, 21)) == { **days, **replaced }
+
+def test_conflicts_without_update_keep_the_stored_days():
+    _, repo = _build_repo(keyframe_days = 7)
+    days: Dict[date, dict] = _random_days(start_date = date(2024, 9, 1), count = 10, seed = 7)
+    repo.insert_exchange_rates(entities = _entities(days = days))
+    clashing: List[ExchangeRate] = _entities(days = { date(2024, 9, 4): { "EUR": 2.0 } })
+    assert repo.insert_exchange_rates(entities = clashing, on_conflict = ConflictAction.NOTHING) == 0
+    with pytest.raises(DatabaseQueryError):
+        repo.insert_exchange_rates(entities = clashing)
+    assert _read(repo = repo, start_date = date(2024, 9, 1), end_date = date(2024, 9, 10)) == days
@@ -0,0 +1,13 @@
+from typing import List
+
+from benchmarks import import_budget
+
+# The wall clock budget depends on the machine, it is checked by running
+# `python -m benchmarks.import_budget` rather than here.
+def test_heavy_dependencies_are_not_imported_at_startup():
+    modules: set = import_budget._measure()["modules"]
+    loaded: List[str] = [
+        name for name in import_budget.DEFERRED_MODULES
+        if any(x == name or x.startswith(name + ".") for x in modules)
+    ]
+    assert loaded == []
@@ -0,0 +1,22 @@
+from src.clients.AdaptiveExchangeRateHost import AimdConcurrencyLimiter
+from src.metrics import MetricsRegistry, metrics
+
+def test_gauge_renders_the_latest_value():
+    registry = MetricsRegistry(prefix = "test")
+    registry.set("queue_depth", 3, queue = "historical")
+    registry.set("queue_depth", 1, queue = "historical")
+    assert registry.render_prometheus().splitlines() == [
+        "# TYPE test_queue_depth gauge",
+        'test_queue_depth{queue="historical"} 1'
+    ]
+    assert registry.summary()["gauges"] == { "queue_depth": [{ "labels": { "queue": "historical" }, "value": 1 }] }
+
+def test_concurrency_limit_is_exported_as_a_gauge():
+    limiter = AimdConcurrencyLimiter(name = "test-provider", initial_limit = 4, backoff_ratio = 0.5)
+    started: float = limiter.acquire()
+    limiter.record_overload(started = started)
+    limiter.release()
+    rendered: str = metrics.render_prometheus()
+    assert "# TYPE exchange_rates_concurrency_limit gauge" in rendered
+    assert 'exchange_rates_concurrency_limit{provider="test-provider"} 2' in rendered.splitlines()
+    assert "exchange_rates_concurrency_limit_sum" not in rendered